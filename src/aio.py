@@ -0,0 +1,143 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import value_setter
+import file_management
+
+# Dedicated, bounded pool for blocking file_management calls; created on first use
+_executor = None
+_executor_lock = threading.Lock()
+# Submitted calls not yet finished, cancelled by shutdown() if they have not started
+_futures = set()
+
+# Per-(event loop, path) asyncio locks serializing writes; an asyncio.Lock belongs to one loop.
+# Entries are dropped when no writer is waiting. Writes from different loops are kept apart
+# by file_management's own locking.
+_path_locks = {}
+_path_locks_lock = threading.Lock()
+
+
+def _submit(func, *args):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=value_setter.aioWorkers, thread_name_prefix='aio-file')
+        future = _executor.submit(func, *args)
+        _futures.add(future)
+    future.add_done_callback(_forget)
+    return future
+
+
+def _forget(future):
+    with _executor_lock:
+        _futures.discard(future)
+
+
+def shutdown(wait=True):
+    """
+    Shuts the worker pool down, cancelling calls that have not started. A new pool is
+    created on the next call.
+
+    Parameters:
+        wait (bool): Wait for running operations to finish.
+    """
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+        queued = list(_futures)
+    # Same as shutdown(cancel_futures=True), which needs Python 3.9
+    for future in queued:
+        future.cancel()
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+async def _run(func, *args):
+    """
+    Runs `func(*args)` on the pool. Cancelling the caller drops the call if it has not started;
+    a call that is already running is waited for, so same-path writes never overlap.
+    """
+    future = _submit(func, *args)
+    waiter = asyncio.wrap_future(future)
+    try:
+        return await asyncio.shield(waiter)
+    except asyncio.CancelledError:
+        if not future.cancel():
+            try:
+                await waiter
+            except Exception:
+                pass
+        raise
+
+
+async def _run_write(filepath, func, *args):
+    key = (asyncio.get_running_loop(), file_management.storage.key(filepath))
+    with _path_locks_lock:
+        entry = _path_locks.get(key)
+        if entry is None:
+            entry = _path_locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+    try:
+        async with entry[0]:
+            return await _run(func, *args)
+    finally:
+        with _path_locks_lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _path_locks[key]
+
+
+async def get_json(filename, input=False, readonly=False):
+    """
+    Awaitable file_management.getJsonDict. Reads never wait for each other or for writes.
+
+    Parameters:
+        filename (str): The name of the JSON file.
+        input (bool): Whether to look in the inputs directory.
+        readonly (bool): Return the shared, read-only cached document.
+
+    Returns:
+        dict: The JSON data.
+    """
+    return await _run(file_management.getJsonDict, filename, input, readonly)
+
+
+async def update_json(new_data, filepath):
+    """
+    Awaitable file_management.updateJsonFile. Writes to the same path run one at a time
+    in call order; writes to different paths run in parallel.
+
+    Parameters:
+        new_data (dict): The new data to write to the JSON file.
+        filepath (str): The path to the JSON file.
+
+    Returns:
+        bool: True if the operation succeeds, False otherwise.
+    """
+    return await _run_write(filepath, file_management.updateJsonFile, new_data, filepath)
+
+
+async def patch_json(filepath, patch):
+    """
+    Awaitable file_management.patchJsonFile, serialized per path like update_json.
+
+    Parameters:
+        filepath (str): The path to the JSON file.
+        patch (dict | list): A merge patch or a list of JSON-Pointer operations.
+
+    Returns:
+        bool: True if the operation succeeds, False otherwise.
+    """
+    return await _run_write(filepath, file_management.patchJsonFile, filepath, patch)
+
+
+async def archive(fileName, archiveCount=10):
+    """
+    Awaitable file_management.archiveFiles, serialized with writes to the same path.
+
+    Parameters:
+        fileName (str): The full path of the file to archive.
+        archiveCount (int): The number of archive versions to keep (default is 10).
+    """
+    filepath = fileName[len(value_setter.mainDir):] if fileName.startswith(value_setter.mainDir) else fileName
+    return await _run_write(filepath, file_management.archiveFiles, fileName, archiveCount)
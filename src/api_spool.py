@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import random
+import atexit
+import sqlite3
+import threading
+import traceback
+from contextlib import contextmanager
+import requests
+import value_setter
+import logger as logger
+import external_management
+
+sp_log = logger.mainLog
+
+# Client errors that can succeed on a later attempt; other 4xx responses drop the update
+_RETRYABLE_4XX = frozenset({408, 409, 425, 429})
+
+
+class ApiSpool:
+    """
+    A durable outbound queue for post_data_to_api.
+
+    enqueue() stores the update in a SQLite database and returns at once; a background
+    flusher sends due updates in batches through an ApiClient and deletes them once the
+    API has acknowledged them. Only the latest update per (api_url, filepath) is kept, so
+    a document changed ten times while the API is down is sent once. Failed updates are
+    retried with exponential backoff; the spool survives process restarts.
+
+    Table:
+        spool(api_url, filepath, data, seq, created, attempts, next_attempt, last_error);
+        `created` is when the oldest still-unsent change to that document was queued.
+
+    Parameters:
+        dbPath (str): The database file (default value_setter.spoolPath).
+        client (ApiClient): The client used to send (default external_management.default_client()).
+        batchSize (int): Updates sent per batch (default value_setter.spoolBatchSize).
+        interval (float): Seconds between background flushes (default value_setter.spoolInterval).
+        maxBackoff (float): Cap on the retry delay in seconds (default value_setter.spoolMaxBackoff).
+    """
+
+    def __init__(self, dbPath=None, client=None, batchSize=None, interval=None, maxBackoff=None):
+        self.dbPath = dbPath if dbPath is not None else value_setter.spoolPath
+        self._client = client
+        self.batchSize = batchSize if batchSize is not None else value_setter.spoolBatchSize
+        self.interval = interval if interval is not None else value_setter.spoolInterval
+        self.maxBackoff = maxBackoff if maxBackoff is not None else value_setter.spoolMaxBackoff
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._lastSeq = 0
+        self._flushLock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._counters = {'enqueued': 0, 'coalesced': 0, 'sent': 0, 'retried': 0, 'dropped': 0}
+        with self._transaction() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS spool ('
+                         'api_url TEXT NOT NULL, filepath TEXT NOT NULL, data TEXT NOT NULL, seq INTEGER NOT NULL, '
+                         'created REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, next_attempt REAL NOT NULL, '
+                         'last_error TEXT, PRIMARY KEY (api_url, filepath))')
+            conn.execute('CREATE INDEX IF NOT EXISTS spool_due ON spool (next_attempt)')
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = external_management.default_client()
+        return self._client
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            dir_path = os.path.dirname(self.dbPath)
+            if dir_path and not os.path.isdir(dir_path):
+                os.makedirs(dir_path, exist_ok=True)
+            conn = sqlite3.connect(self.dbPath, isolation_level=None, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _nextSeq(self):
+        # Identifies one enqueued version, so a send never deletes a newer update for the same document
+        with self._lock:
+            self._lastSeq = max(time.time_ns(), self._lastSeq + 1)
+            return self._lastSeq
+
+    def enqueue(self, new_data, filepath, api_url):
+        """
+        Queues a document update, replacing any unsent update of the same document.
+
+        Parameters:
+            new_data (Any): The data to be sent to the API.
+            filepath (str): The file path associated with the data.
+            api_url (str): The URL of the API endpoint.
+        """
+        data = json.dumps(new_data)
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute('UPDATE spool SET data = ?, seq = ?, attempts = 0, next_attempt = ?, last_error = NULL '
+                                  'WHERE api_url = ? AND filepath = ?', (data, self._nextSeq(), now, api_url, filepath))
+            coalesced = cursor.rowcount > 0
+            if not coalesced:
+                conn.execute('INSERT INTO spool (api_url, filepath, data, seq, created, next_attempt) VALUES (?, ?, ?, ?, ?, ?)',
+                             (api_url, filepath, data, self._nextSeq(), now, now))
+        self._count('enqueued')
+        if coalesced:
+            self._count('coalesced')
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _delay(self, attempts):
+        return min(self.maxBackoff, self.interval * (2 ** attempts)) * random.uniform(0.5, 1.0)
+
+    def _flushBatch(self, due):
+        rows = self._connection().execute(
+            'SELECT api_url, filepath, data, seq, attempts FROM spool WHERE next_attempt <= ? ORDER BY created LIMIT ?',
+            (due, self.batchSize)).fetchall()
+        if not rows:
+            return 0
+        results = self.client.post_many([(json.loads(data), filepath, api_url) for api_url, filepath, data, _, _ in rows])
+        now = time.time()
+        with self._transaction() as conn:
+            for (api_url, filepath, _, seq, attempts), result in zip(rows, results):
+                key = (api_url, filepath, seq)
+                if not isinstance(result, Exception):
+                    conn.execute('DELETE FROM spool WHERE api_url = ? AND filepath = ? AND seq = ?', key)
+                    self._count('sent')
+                    continue
+                status = result.response.status_code if isinstance(result, requests.HTTPError) and result.response is not None else None
+                if status is not None and 400 <= status < 500 and status not in _RETRYABLE_4XX:
+                    sp_log.error(f'Dropping spooled update for {filepath} to {api_url}: {result}')
+                    conn.execute('DELETE FROM spool WHERE api_url = ? AND filepath = ? AND seq = ?', key)
+                    self._count('dropped')
+                else:
+                    sp_log.warning(f'Spooled update for {filepath} to {api_url} failed (attempt {attempts + 1}): {result}')
+                    conn.execute('UPDATE spool SET attempts = attempts + 1, next_attempt = ?, last_error = ? '
+                                 'WHERE api_url = ? AND filepath = ? AND seq = ?',
+                                 (now + self._delay(attempts), str(result)) + key)
+                    self._count('retried')
+        return len(rows)
+
+    def flush(self):
+        """
+        Sends every due update, in batches of `batchSize`.
+
+        Returns:
+            int: The number of updates attempted.
+        """
+        attempted = 0
+        with self._flushLock:
+            # Updates that fail during this flush are rescheduled after `due`, so they wait for the next one
+            due = time.time()
+            while True:
+                count = self._flushBatch(due)
+                attempted += count
+                if count < self.batchSize:
+                    return attempted
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            try:
+                self.flush()
+            except Exception as e:
+                sp_log.error(f'Error flushing API spool: {e}')
+                sp_log.error(traceback.format_exc())
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def start(self):
+        """
+        Starts the background flusher, which first sends anything left from earlier runs.
+        """
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._loop, name='api-spool', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        """
+        Stops the background flusher. Unsent updates stay in the spool for the next start.
+        """
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopping.set()
+            self._wake.set()
+            thread.join()
+
+    def stats(self):
+        """
+        Returns the queue depth and delivery counters.
+
+        Returns:
+            dict: depth, retrying (updates that failed at least once), oldest_age (seconds
+                since the oldest unsent change was queued, 0 when empty) and the enqueued,
+                coalesced, sent, retried and dropped counters of this process.
+        """
+        depth, retrying, oldest = self._connection().execute(
+            'SELECT COUNT(*), COALESCE(SUM(attempts > 0), 0), MIN(created) FROM spool').fetchone()
+        with self._lock:
+            counters = dict(self._counters)
+        return dict(counters, depth=depth, retrying=retrying,
+                    oldest_age=0.0 if oldest is None else max(0.0, time.time() - oldest))
+
+
+_spool = None
+_spool_lock = threading.Lock()
+
+def default_spool():
+    """
+    Returns the process-wide spool (value_setter.spoolPath) with its flusher running.
+    """
+    global _spool
+    with _spool_lock:
+        if _spool is None:
+            _spool = ApiSpool().start()
+        return _spool
@@ -0,0 +1,337 @@
+import os
+import json
+import time
+import zlib
+import hashlib
+import threading
+import traceback
+from tempfile import NamedTemporaryFile
+import value_setter
+import logger as logger
+
+as_log = logger.mainLog
+
+INDEX_NAME = 'index.json'
+
+
+class ArchiveStore:
+    """
+    Keeps the last `archiveCount` versions of each document without copying archives around.
+
+    Every document gets a directory `<archiveDir>/<relative path>.versions/` holding an
+    index and one object file per distinct content, named by its SHA-256. The index is a
+    fixed-size ring of slots plus a head pointer, so archiving a new version writes at most
+    one object and rewrites the small index; older versions are never moved. Identical
+    versions share one object, and with `compress=True` every version except the newest is
+    stored zlib-compressed.
+
+    Copies made by the old archiveFiles (`<archiveDir><path without extension><n>.<extension>`)
+    are listed and read as the document's versions until it is first archived here; that
+    archive imports them into the index, oldest first, and leaves the old files in place.
+
+    Parameters:
+        archiveDir (str): The archive root (default value_setter.archiveDir, looked up on each use).
+        mainDir (str): The live document root (default value_setter.mainDir, looked up on each use).
+        compress (bool): Compress versions once they are no longer the newest (default value_setter.archiveCompress).
+        compressLevel (int): zlib compression level.
+    """
+
+    def __init__(self, archiveDir=None, mainDir=None, compress=None, compressLevel=6):
+        self._archiveDir = archiveDir
+        self._mainDir = mainDir
+        self._compress = compress
+        self.compressLevel = compressLevel
+        self._lock = threading.Lock()
+
+    @property
+    def archiveDir(self):
+        return self._archiveDir if self._archiveDir is not None else value_setter.archiveDir
+
+    @property
+    def mainDir(self):
+        return self._mainDir if self._mainDir is not None else value_setter.mainDir
+
+    @property
+    def compress(self):
+        return self._compress if self._compress is not None else value_setter.archiveCompress
+
+    # -- paths -------------------------------------------------------------------
+
+    def relativePath(self, path):
+        """
+        Returns `path` relative to mainDir, accepting both relative and prefixed paths.
+        """
+        if path.startswith(self.mainDir):
+            return path[len(self.mainDir):]
+        return path
+
+    def versionDir(self, path):
+        return os.path.join(self.archiveDir, self.relativePath(path) + '.versions')
+
+    def legacyPaths(self, path):
+        """
+        Returns the files the old archiveFiles kept for `path`, newest (archive 0) first.
+        """
+        stem, _, ext = self.relativePath(path).rpartition('.')
+        paths = []
+        while True:
+            candidate = f'{self.archiveDir}{stem}{len(paths)}.{ext}'
+            if not os.path.isfile(candidate):
+                return paths
+            paths.append(candidate)
+
+    def _objectPath(self, versionDir, digest, compressed):
+        return os.path.join(versionDir, digest + ('.json.z' if compressed else '.json'))
+
+    # -- index -------------------------------------------------------------------
+
+    def _loadIndex(self, versionDir, archiveCount):
+        try:
+            with open(os.path.join(versionDir, INDEX_NAME)) as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return {'head': -1, 'slots': [None] * archiveCount, 'objects': {}}
+        if len(index['slots']) != archiveCount:
+            # Ring size changed: re-lay the versions out newest first
+            ordered = self._ordered(index)
+            dropped = ordered[archiveCount:]
+            ordered = ordered[:archiveCount]
+            index['slots'] = list(reversed(ordered)) + [None] * (archiveCount - len(ordered))
+            index['head'] = len(ordered) - 1
+            for slot in dropped:
+                self._release(versionDir, index, slot['hash'])
+        return index
+
+    def _saveIndex(self, versionDir, index):
+        tmp = NamedTemporaryFile(mode='w', dir=versionDir, prefix='.index-', suffix='.tmp', delete=False, encoding='utf-8')
+        try:
+            with tmp:
+                json.dump(index, tmp)
+            os.replace(tmp.name, os.path.join(versionDir, INDEX_NAME))
+        except BaseException:
+            os.remove(tmp.name)
+            raise
+
+    @staticmethod
+    def _ordered(index):
+        """Returns the occupied slots newest first."""
+        slots = index['slots']
+        count = len(slots)
+        head = index['head']
+        if head < 0 or not count:
+            return []
+        ordered = []
+        for i in range(count):
+            slot = slots[(head - i) % count]
+            if slot is None:
+                break
+            ordered.append(slot)
+        return ordered
+
+    # -- objects -----------------------------------------------------------------
+
+    def _writeObject(self, versionDir, digest, data, compressed):
+        target = self._objectPath(versionDir, digest, compressed)
+        tmp = NamedTemporaryFile(mode='wb', dir=versionDir, prefix='.obj-', suffix='.tmp', delete=False)
+        try:
+            with tmp:
+                tmp.write(zlib.compress(data, self.compressLevel) if compressed else data)
+            os.replace(tmp.name, target)
+        except BaseException:
+            os.remove(tmp.name)
+            raise
+
+    def _readObject(self, versionDir, digest, compressed):
+        with open(self._objectPath(versionDir, digest, compressed), 'rb') as f:
+            data = f.read()
+        return zlib.decompress(data) if compressed else data
+
+    def _release(self, versionDir, index, digest):
+        obj = index['objects'].get(digest)
+        if obj is None:
+            return
+        obj['refs'] -= 1
+        if obj['refs'] <= 0:
+            del index['objects'][digest]
+            try:
+                os.remove(self._objectPath(versionDir, digest, obj['compressed']))
+            except FileNotFoundError:
+                pass
+
+    def _compressObject(self, versionDir, index, digest):
+        obj = index['objects'].get(digest)
+        if obj is None or obj['compressed']:
+            return
+        data = self._readObject(versionDir, digest, False)
+        self._writeObject(versionDir, digest, data, True)
+        obj['compressed'] = True
+        os.remove(self._objectPath(versionDir, digest, False))
+
+    # -- public API --------------------------------------------------------------
+
+    def archive(self, path, archiveCount=10):
+        """
+        Archives the current content of a live document as version 0.
+
+        Parameters:
+            path (str): The document path (relative to mainDir or prefixed with it).
+            archiveCount (int): The number of versions to keep.
+
+        Returns:
+            bool: True if a version was recorded, False if there was nothing to archive.
+        """
+        livePath = self.mainDir + self.relativePath(path)
+        if archiveCount <= 0 or not os.path.isfile(livePath):
+            return False
+        with open(livePath, 'rb') as f:
+            data = f.read()
+        versionDir = self.versionDir(path)
+        with self._lock:
+            os.makedirs(versionDir, exist_ok=True)
+            migrate = not os.path.exists(os.path.join(versionDir, INDEX_NAME))
+            index = self._loadIndex(versionDir, archiveCount)
+            if migrate:
+                legacy = self.legacyPaths(path)
+                for legacyPath in reversed(legacy):
+                    with open(legacyPath, 'rb') as f:
+                        self._record(versionDir, index, f.read(), archiveCount, os.path.getmtime(legacyPath))
+                if legacy:
+                    as_log.info(f'Imported {len(legacy)} archived versions of {livePath} from archiveFiles copies')
+            digest, new = self._record(versionDir, index, data, archiveCount, time.time())
+            self._saveIndex(versionDir, index)
+        as_log.info(f'Archived {livePath} as {digest}' if new else f'Archived {livePath} as existing version {digest}')
+        return True
+
+    def _record(self, versionDir, index, data, archiveCount, when):
+        # Adds `data` as the newest version; returns its digest and whether a new object was written
+        digest = hashlib.sha256(data).hexdigest()
+        previous = self._ordered(index)[:1]
+        obj = index['objects'].get(digest)
+        new = obj is None
+        if new:
+            self._writeObject(versionDir, digest, data, False)
+            obj = index['objects'][digest] = {'size': len(data), 'compressed': False, 'refs': 0}
+        obj['refs'] += 1
+
+        head = (index['head'] + 1) % archiveCount
+        overwritten = index['slots'][head]
+        index['slots'][head] = {'hash': digest, 'time': when}
+        index['head'] = head
+        if overwritten is not None:
+            self._release(versionDir, index, overwritten['hash'])
+        if self.compress and obj['compressed']:
+            # The newest version is kept uncompressed for cheap restores
+            self._writeObject(versionDir, digest, self._readObject(versionDir, digest, True), False)
+            os.remove(self._objectPath(versionDir, digest, True))
+            obj['compressed'] = False
+        if self.compress and previous and previous[0]['hash'] != digest:
+            self._compressObject(versionDir, index, previous[0]['hash'])
+        return digest, new
+
+    def list_versions(self, path):
+        """
+        Lists the archived versions of a document from the index, newest first.
+
+        Parameters:
+            path (str): The document path.
+
+        Returns:
+            list: One dict per version with 'version', 'hash', 'size', 'compressed' and 'time'.
+                Versions still in old archiveFiles copies also carry their 'file'.
+        """
+        versionDir = self.versionDir(path)
+        try:
+            with open(os.path.join(versionDir, INDEX_NAME)) as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return self._legacyVersions(path)
+        versions = []
+        for n, slot in enumerate(self._ordered(index)):
+            obj = index['objects'][slot['hash']]
+            versions.append({
+                'version': n,
+                'hash': slot['hash'],
+                'size': obj['size'],
+                'compressed': obj['compressed'],
+                'time': slot['time'],
+            })
+        return versions
+
+    def _legacyVersions(self, path):
+        versions = []
+        for n, legacyPath in enumerate(self.legacyPaths(path)):
+            with open(legacyPath, 'rb') as f:
+                data = f.read()
+            versions.append({
+                'version': n,
+                'hash': hashlib.sha256(data).hexdigest(),
+                'size': len(data),
+                'compressed': False,
+                'time': os.path.getmtime(legacyPath),
+                'file': legacyPath,
+            })
+        return versions
+
+    def read(self, path, n=0):
+        """
+        Returns the raw bytes of archived version `n` of a document.
+
+        Raises:
+            IndexError: If the version does not exist.
+        """
+        versions = self.list_versions(path)
+        if not 0 <= n < len(versions):
+            raise IndexError(f'{path} has no archived version {n}')
+        version = versions[n]
+        if 'file' in version:
+            with open(version['file'], 'rb') as f:
+                return f.read()
+        return self._readObject(self.versionDir(path), version['hash'], version['compressed'])
+
+    def restore(self, path, n=0, archiveCount=10):
+        """
+        Replaces the live document with archived version `n`.
+
+        The current live content is archived first, so a restore can itself be undone.
+
+        Parameters:
+            path (str): The document path.
+            n (int): The version to restore, 0 being the most recent archive.
+            archiveCount (int): The number of versions to keep.
+
+        Returns:
+            bool: True if the operation succeeds, False otherwise.
+        """
+        try:
+            data = self.read(path, n)
+            livePath = self.mainDir + self.relativePath(path)
+            self.archive(path, archiveCount)
+            os.makedirs(os.path.dirname(livePath) or '.', exist_ok=True)
+            tmp = NamedTemporaryFile(mode='wb', dir=os.path.dirname(livePath) or '.', prefix='.restore-', suffix='.tmp', delete=False)
+            with tmp:
+                tmp.write(data)
+            os.replace(tmp.name, livePath)
+            as_log.info(f'Restored {livePath} from archived version {n}')
+        except Exception as e:
+            as_log.error(f'Error restoring {path} from archived version {n}: {e}')
+            as_log.error(traceback.format_exc())
+            return False
+        return True
+
+
+# Store used by file_management.archiveFiles; its directories follow value_setter
+archive_store = ArchiveStore()
+
+
+def list_versions(path):
+    """
+    Lists the archived versions of a document, newest first. See ArchiveStore.list_versions.
+    """
+    return archive_store.list_versions(path)
+
+
+def restore(path, n=0):
+    """
+    Replaces the live document with archived version `n`. See ArchiveStore.restore.
+    """
+    return archive_store.restore(path, n)
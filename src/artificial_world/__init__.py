@@ -0,0 +1,48 @@
+# ...existing code...
+"""ArtificialWorld package namespace."""
+
+__all__ = [
+    "artificial_intelligence",
+    "value_setter",
+    "file_management",
+    "object_management",
+    "logger",
+    "schedule_management",
+    "external_management",
+    "conversation_management",
+    "document_cache",
+    "archive_store",
+    "write_behind",
+    "json_patch",
+    "json_stream",
+    "storage_backend",
+    "lock_manager",
+    "aio",
+    "function_registry",
+    "scheduler",
+    "write_queue",
+    "notification_outbox",
+    "listener_cluster",
+    "api_spool",
+    "instrumentation",
+    "listener",
+    "audio",
+]
+
+# package version
+__version__ = "0.1.0"
+
+
+def __getattr__(name):
+    # Submodules are imported on first access (artificial_world.listener, from . import logger),
+    # so importing the package, e.g. for `aw-cli --version`, loads none of them
+    if name in __all__:
+        import importlib
+        module = importlib.import_module(name)
+        globals()[name] = module
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
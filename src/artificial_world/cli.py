@@ -1,23 +1,76 @@
+import os
+import sys
 import argparse
+import subprocess
 from . import __version__
-from . import artificial_intelligence
+
+def _startup_profile(modules, top=15):
+    """Imports `modules` in a fresh interpreter with -X importtime and prints where the time went."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + ', '.join(modules)],
+                            capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        print(result.stderr.splitlines()[-1] if result.stderr else 'Import failed')
+        return
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    total = sum(cumulative for _, depth, _, cumulative in imports if depth == 0)
+    print(f"Import time: {total / 1000:.1f} ms")
+    print("Requested modules (cumulative, first import only):")
+    for name, _, _, cumulative in imports:
+        if name in modules:
+            print(f"  {cumulative / 1000:8.1f} ms  {name}")
+    print(f"Slowest {top} imports (self time):")
+    for name, _, self_us, _ in sorted(imports, key=lambda i: -i[2])[:top]:
+        print(f"  {self_us / 1000:8.1f} ms  {name}")
 
 def main():
     """Simple CLI for ArtificialWorld."""
     parser = argparse.ArgumentParser(prog="aw-cli", description="ArtificialWorld CLI")
     parser.add_argument("--version", action="store_true", help="Print package version")
     parser.add_argument("--build-tool", nargs=2, metavar=('NAME','DESC'), help="Build a user tool (name desc)")
+    parser.add_argument("--migrate-sqlite", nargs='?', const='', metavar='DB',
+                        help="Import the mainDir/archiveDir tree into a SQLite database (default value_setter.sqlitePath)")
+    parser.add_argument("--stats", nargs='?', const='http://127.0.0.1:5000/metrics', metavar='URL',
+                        help="Print the instrumentation spans and counters of a running listener (default %(const)s)")
+    parser.add_argument("--startup-profile", nargs='*', metavar='MODULE',
+                        help="Report the import time breakdown of the given modules (default all package modules)")
     args = parser.parse_args()
 
     if args.version:
         print(__version__)
         return
 
+    if args.startup_profile is not None:
+        from . import __all__ as modules
+        _startup_profile(args.startup_profile or modules)
+        return
+
     if args.build_tool:
+        from . import artificial_intelligence
         name, desc = args.build_tool
         # example usage: prints built tool JSON-like dict
         tool = artificial_intelligence.build_user_tool(name, desc, args={})
         print(tool)
         return
 
+    if args.migrate_sqlite is not None:
+        from . import storage_backend
+        counts = storage_backend.migrateToSqlite(args.migrate_sqlite or None)
+        print(f"Imported {counts['documents']} documents and {counts['versions']} versions")
+        return
+
+    if args.stats is not None:
+        import json
+        import requests
+        response = requests.get(args.stats, params={'format': 'json'}, timeout=10)
+        response.raise_for_status()
+        print(json.dumps(response.json(), indent=2))
+        return
+
     parser.print_help()
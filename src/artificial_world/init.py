@@ -1,16 +0,0 @@
-# ...existing code...
-"""ArtificialWorld package namespace."""
-
-__all__ = [
-    "artificial_intelligence",
-    "value_setter",
-    "file_management",
-    "object_management",
-    "logger",
-    "schedule_management",
-    "external_management",
-    "conversation_management",
-]
-
-# package version
-__version__ = "0.1.0"
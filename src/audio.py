@@ -1,5 +1,20 @@
-import pyttsx3
+import os
+import atexit
 import re
+import sys
+import json
+import queue
+import shutil
+import hashlib
+import itertools
+import threading
+import traceback
+import subprocess
+from collections import OrderedDict
+import value_setter
+import logger as logger
+
+au_log = logger.mainLog
 
 def remove_unicode_escapes(text: str) -> str:
     """
@@ -10,26 +25,504 @@ def remove_unicode_escapes(text: str) -> str:
     # Remove actual surrogate characters (U+D800 to U+DFFF)
     return re.sub(r'[\ud800-\udfff]', '', text)
 
+
+class NoPlayerError(Exception):
+    """Raised by a driver's play() when this machine has no way to play rendered audio."""
+
+
+class Pyttsx3Driver:
+    """
+    Speaks through one long-lived pyttsx3 engine. The engine is created, and pyttsx3
+    imported, on first use; apart from stop(), methods are only called from the speech
+    worker thread, which owns the engine.
+
+    Rendered files are played with winsound on Windows and with the first of aplay, paplay
+    or afplay found elsewhere; without either, can_play() is False and play() raises
+    NoPlayerError.
+    """
+
+    _PLAYERS = (['aplay', '-q'], ['paplay'], ['afplay'])
+
+    def __init__(self):
+        self._engine = None
+        self._voices = None
+        self._player = None
+        self._process = None
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            import pyttsx3
+            self._engine = pyttsx3.init()
+        return self._engine
+
+    def voices(self):
+        """Returns the installed voice ids, enumerated once."""
+        if self._voices is None:
+            self._voices = [voice.id for voice in self.engine.getProperty('voices')]
+        return self._voices
+
+    def _configure(self, rate, volume, voice):
+        engine = self.engine
+        engine.setProperty('rate', rate)    # Speed percent (can go over 100)
+        engine.setProperty('volume', volume)  # Volume 0-1
+        engine.setProperty('voice', voice)  # Voice type
+        return engine
+
+    def speak(self, text, rate, volume, voice):
+        engine = self._configure(rate, volume, voice)
+        engine.say(text)
+        engine.runAndWait()
+
+    def render(self, text, rate, volume, voice, path):
+        engine = self._configure(rate, volume, voice)
+        engine.save_to_file(text, path)
+        engine.runAndWait()
+
+    def _findPlayer(self):
+        # Looked up once; False when there is none
+        if self._player is None:
+            self._player = next((p for p in self._PLAYERS if shutil.which(p[0])), False)
+        return self._player
+
+    def can_play(self):
+        """Returns whether rendered files can be played."""
+        return sys.platform == 'win32' or bool(self._findPlayer())
+
+    def play(self, path):
+        if sys.platform == 'win32':
+            import winsound
+            winsound.PlaySound(path, winsound.SND_FILENAME)
+            return
+        player = self._findPlayer()
+        if not player:
+            raise NoPlayerError('No audio player found')
+        with self._lock:
+            self._process = subprocess.Popen(player + [path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self._process.wait()
+
+    def stop(self):
+        """Cuts off the current speech or playback; may be called from any thread."""
+        if self._engine is not None:
+            self._engine.stop()
+        if sys.platform == 'win32':
+            import winsound
+            winsound.PlaySound(None, 0)
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                self._process.kill()
+
+
+class NullDriver:
+    """
+    A silent driver for tests and headless machines: records what would have been said in
+    `spoken` as (kind, text or path, rate, volume, voice) tuples and renders phrases as text files.
+    """
+
+    def __init__(self, voices=('default', 'alternate')):
+        self._voices = list(voices)
+        self.spoken = []
+
+    def voices(self):
+        return self._voices
+
+    def speak(self, text, rate, volume, voice):
+        self.spoken.append(('speak', text, rate, volume, voice))
+
+    def render(self, text, rate, volume, voice, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def can_play(self):
+        return True
+
+    def play(self, path):
+        self.spoken.append(('play', path))
+
+    def stop(self):
+        pass
+
+
+def createDriver(spec=None):
+    """
+    Creates a speech driver from its name.
+
+    Parameters:
+        spec (str): 'pyttsx3' or 'none' (default value_setter.ttsDriver).
+
+    Returns:
+        An object with voices(), speak(), render(), can_play(), play() and stop() methods.
+    """
+    spec = spec if spec is not None else value_setter.ttsDriver
+    if spec == 'pyttsx3':
+        return Pyttsx3Driver()
+    if spec == 'none':
+        return NullDriver()
+    raise ValueError(f'Unknown speech driver: {spec}')
+
+
+class PhraseCache:
+    """
+    An on-disk LRU cache of rendered phrases, so repeated announcements play without
+    being synthesized again.
+
+    Each phrase is one file named by the hash of (text, rate, volume, voice); volume is part
+    of the key because it is baked into the rendered audio. File modification times record
+    use, so the least recently played files are deleted first once the cache exceeds
+    `maxBytes`, and the order survives restarts.
+
+    Parameters:
+        directory (str): Where rendered files are kept (default value_setter.ttsCacheDir).
+        maxBytes (int): Size budget of the directory (default value_setter.ttsCacheBytes).
+        maxChars (int): Longer texts are spoken without caching (default value_setter.ttsCacheMaxChars).
+    """
+
+    def __init__(self, directory=None, maxBytes=None, maxChars=None):
+        self.directory = directory if directory is not None else value_setter.ttsCacheDir
+        self.maxBytes = maxBytes if maxBytes is not None else value_setter.ttsCacheBytes
+        self.maxChars = maxChars if maxChars is not None else value_setter.ttsCacheMaxChars
+        self._lock = threading.Lock()
+        self._entries = None
+        self._size = 0
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _index(self):
+        # Read from disk on first use, oldest first
+        if self._entries is None:
+            os.makedirs(self.directory, exist_ok=True)
+            found = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.wav') and '.tmp' not in entry.name and entry.is_file():
+                    stat = entry.stat()
+                    found.append((stat.st_mtime, entry.name[:-len('.wav')], stat.st_size))
+            self._entries = OrderedDict((key, size) for _, key, size in sorted(found))
+            self._size = sum(self._entries.values())
+        return self._entries
+
+    @staticmethod
+    def key(text, rate, volume, voice):
+        return hashlib.sha256(json.dumps([text, rate, volume, voice]).encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.wav')
+
+    def get(self, key):
+        """
+        Returns the file of a cached phrase, marking it as recently used, or None.
+        """
+        with self._lock:
+            entries = self._index()
+            if key not in entries:
+                self._stats['misses'] += 1
+                return None
+            path = self.path(key)
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                self._size -= entries.pop(key)
+                self._stats['misses'] += 1
+                return None
+            entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return path
+
+    def store(self, key, render):
+        """
+        Renders a phrase into the cache.
+
+        Parameters:
+            key (str): The phrase key (see key()).
+            render (callable): Writes the audio to the path it is given.
+
+        Returns:
+            str: The cached file.
+        """
+        path = self.path(key)
+        with self._lock:
+            self._index()
+        tmpPath = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp.wav'
+        try:
+            render(tmpPath)
+            os.replace(tmpPath, path)
+        finally:
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+        size = os.path.getsize(path)
+        with self._lock:
+            entries = self._index()
+            self._size += size - entries.pop(key, 0)
+            entries[key] = size
+            while self._size > self.maxBytes and len(entries) > 1:
+                oldKey, oldSize = entries.popitem(last=False)
+                self._size -= oldSize
+                self._stats['evictions'] += 1
+                try:
+                    os.remove(self.path(oldKey))
+                except FileNotFoundError:
+                    pass
+        return path
+
+    def clear(self):
+        """Deletes every cached phrase."""
+        with self._lock:
+            for key in list(self._index()):
+                try:
+                    os.remove(self.path(key))
+                except FileNotFoundError:
+                    pass
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        """
+        Returns hits, misses, evictions, entries and bytes.
+        """
+        with self._lock:
+            entries = self._index()
+            return dict(self._stats, entries=len(entries), bytes=self._size)
+
+
+class Utterance:
+    """
+    A queued piece of speech, returned by SpeechWorker.say().
+
+    status is 'queued', 'speaking', 'done', 'cancelled' or 'failed'.
+    """
+
+    __slots__ = ('text', 'rate', 'volume', 'voice_index', 'priority', 'status', 'error', '_done', '_worker')
+
+    def __init__(self, worker, text, rate, volume, voice_index, priority):
+        self.text = text
+        self.rate = rate
+        self.volume = volume
+        self.voice_index = voice_index
+        self.priority = priority
+        self.status = 'queued'
+        self.error = None
+        self._done = threading.Event()
+        self._worker = worker
+
+    def _finish(self, status, error=None):
+        self.status = status
+        self.error = error
+        self._done.set()
+
+    def cancel(self):
+        """Drops the utterance if it is still queued, or cuts it off if it is being spoken."""
+        self._worker.cancel(self)
+
+    def wait(self, timeout=None):
+        """Waits until the utterance has been spoken, cancelled or has failed. Returns False on timeout."""
+        return self._done.wait(timeout)
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+
+class SpeechWorker:
+    """
+    Speaks queued utterances from one background thread that owns the speech driver, so
+    the engine starts and enumerates its voices once, and callers do not wait for speech.
+
+    Utterances are spoken in priority order (lower numbers first), in order of arrival
+    within a priority. say(..., interrupt=True) cuts off the current utterance and drops
+    everything queued before speaking. Short phrases are rendered once into the
+    PhraseCache and played back from it afterwards; a driver that cannot play
+    files (can_play() is False) speaks directly, without rendering anything.
+
+    Parameters:
+        driver: A speech driver (default createDriver()), created on the worker thread.
+        cache (PhraseCache): Rendered-phrase cache (default PhraseCache()); False disables caching.
+    """
+
+    def __init__(self, driver=None, cache=None):
+        self._driver = driver
+        self.cache = PhraseCache() if cache is None else cache or None
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._current = None
+        self._thread = None
+        self._stats = {'spoken': 0, 'cancelled': 0, 'failed': 0}
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            self._driver = createDriver()
+        return self._driver
+
+    def say(self, text, rate=210, volume=1.0, voice_index=1, priority=0, interrupt=False):
+        """
+        Queues text to be spoken.
+
+        Parameters:
+            text (str): The text to be spoken.
+            rate (int): The speech rate.
+            volume (float): The volume level (max 1.0).
+            voice_index (int): The index of the voice to use.
+            priority (int): Lower numbers are spoken first.
+            interrupt (bool): Cut off the current utterance and drop the queued ones first.
+
+        Returns:
+            Utterance: A handle to wait for or cancel the speech.
+        """
+        utterance = Utterance(self, remove_unicode_escapes(text), rate, volume, voice_index, priority)
+        with self._lock:
+            if interrupt:
+                self._cancelQueued()
+                self._interruptCurrent()
+            self._queue.put((priority, next(self._seq), utterance))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='speech-worker', daemon=True)
+                self._thread.start()
+        return utterance
+
+    def _cancelQueued(self):
+        stops = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            utterance = item[2]
+            if utterance is None:
+                stops.append(item)
+            elif not utterance.done:
+                utterance._finish('cancelled')
+                self._stats['cancelled'] += 1
+        for item in stops:
+            self._queue.put(item)
+
+    def _interruptCurrent(self):
+        current = self._current
+        if current is not None and current.status == 'speaking':
+            current.status = 'cancelled'
+            self.driver.stop()
+
+    def cancel(self, utterance=None):
+        """
+        Cancels one utterance, or when None the current one and everything queued.
+        Queued utterances are skipped when their turn comes.
+        """
+        with self._lock:
+            if utterance is None:
+                self._cancelQueued()
+                self._interruptCurrent()
+            elif utterance is self._current:
+                self._interruptCurrent()
+            elif not utterance.done:
+                utterance._finish('cancelled')
+                self._stats['cancelled'] += 1
+
+    def _run(self):
+        while True:
+            _, _, utterance = self._queue.get()
+            if utterance is None:
+                return
+            with self._lock:
+                if utterance.done:
+                    continue
+                utterance.status = 'speaking'
+                self._current = utterance
+            try:
+                self._speak(utterance)
+            except Exception as e:
+                au_log.error(f'Error speaking text: {e}')
+                au_log.error(traceback.format_exc())
+                outcome, error = 'failed', e
+            else:
+                outcome, error = ('cancelled' if utterance.status == 'cancelled' else 'done'), None
+            with self._lock:
+                self._current = None
+                self._stats['spoken' if outcome == 'done' else outcome] += 1
+            utterance._finish(outcome, error)
+
+    def _speak(self, utterance):
+        driver = self.driver
+        voice = driver.voices()[utterance.voice_index]
+        settings = (utterance.rate, utterance.volume, voice)
+        if self.cache is not None and len(utterance.text) <= self.cache.maxChars and driver.can_play():
+            key = self.cache.key(utterance.text, *settings)
+            path = self.cache.get(key) or self.cache.store(key, lambda p: driver.render(utterance.text, *settings, p))
+            try:
+                if utterance.status == 'speaking':
+                    driver.play(path)
+                return
+            except NoPlayerError:
+                # The player went away since can_play(); speak this one directly
+                pass
+        driver.speak(utterance.text, *settings)
+
+    def stop(self, drain=True):
+        """
+        Stops the worker thread, after speaking what is queued unless `drain` is False.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if not drain:
+                self._cancelQueued()
+                self._interruptCurrent()
+            if thread is not None:
+                # Sorts after every utterance; without a thread nothing would take it off the queue
+                self._queue.put((float('inf'), next(self._seq), None))
+        if thread is not None:
+            thread.join()
+
+    def stats(self):
+        """
+        Returns spoken, cancelled and failed counts, the queue depth and the phrase cache stats.
+        """
+        with self._lock:
+            return dict(self._stats, queued=self._queue.qsize(),
+                        cache=self.cache.stats() if self.cache is not None else None)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+def default_worker():
+    """
+    Returns the process-wide SpeechWorker used by speak_text, created on first use.
+    What it has queued is spoken before the process exits.
+    """
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = SpeechWorker()
+            atexit.register(_worker.stop, drain=True)
+        return _worker
+
 def speak_text(text: str,
                rate: int = 210,
                volume: float = 1.0,
-               voice_index: int = 1) -> None:
+               voice_index: int = 1,
+               wait: bool = False,
+               priority: int = 0,
+               interrupt: bool = False) -> Utterance:
     """
     Speaks the provided text out loud using the system's TTS engine.
 
+    The text is queued on the shared speech worker (see SpeechWorker), which keeps one
+    engine running and replays repeated phrases from the rendered-phrase cache.
+
     Args:
         text (str): The text to be spoken.
         rate (int): The speech rate (default is 210).
         volume (float): The volume level (default is 1.0, max is 1.0).
         voice_index (int): The index of the voice to use (default is 1).
+        wait (bool): Return only once the text has been spoken (default is False).
+        priority (int): Lower numbers are spoken first (default is 0).
+        interrupt (bool): Cut off current and queued speech first (default is False).
+
+    Returns:
+        Utterance: A handle to wait for or cancel the speech.
 
     Example:
         speak_text("This is a test of the emergency broadcast system.")
     """
-    engine = pyttsx3.init()
-    voices = engine.getProperty('voices')
-    engine.setProperty('rate', rate)    # Speed percent (can go over 100)
-    engine.setProperty('volume', volume)  # Volume 0-1
-    engine.setProperty('voice', voices[voice_index].id)  # Voice type
-    engine.say(remove_unicode_escapes(text))
-    engine.runAndWait()
+    utterance = default_worker().say(text, rate, volume, voice_index, priority, interrupt)
+    if wait:
+        utterance.wait()
+    return utterance
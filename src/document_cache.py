@@ -0,0 +1,193 @@
+import threading
+from collections import OrderedDict
+
+
+class FrozenDict(dict):
+    """
+    A dict that refuses in-place modification.
+
+    Cached documents are shared between callers, so every container handed out by the
+    cache is frozen. Copying (copy.copy / copy.deepcopy / thaw) returns plain mutable objects.
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('cached JSON documents are read-only; use getJsonDict(..., readonly=False) for a private copy')
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return (dict, (thaw(self),))
+
+
+class FrozenList(list):
+    """
+    A list that refuses in-place modification. See FrozenDict.
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('cached JSON documents are read-only; use getJsonDict(..., readonly=False) for a private copy')
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = extend = insert = remove = pop = clear = sort = reverse = _readonly
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return (list, (thaw(self),))
+
+
+def freeze(data):
+    """
+    Recursively converts a parsed JSON value into its read-only equivalent.
+
+    Parameters:
+        data (Any): A value produced by json.load.
+
+    Returns:
+        Any: The same value with every dict/list replaced by FrozenDict/FrozenList.
+            Subtrees that are already frozen are reused as they are.
+    """
+    if isinstance(data, (FrozenDict, FrozenList)):
+        return data
+    if isinstance(data, dict):
+        return FrozenDict((k, freeze(v)) for k, v in data.items())
+    if isinstance(data, list):
+        return FrozenList(freeze(v) for v in data)
+    return data
+
+
+def thaw(data):
+    """
+    Recursively copies a (possibly frozen) JSON value into plain mutable dicts and lists.
+
+    Parameters:
+        data (Any): A JSON value.
+
+    Returns:
+        Any: A private, mutable copy of the value.
+    """
+    if isinstance(data, dict):
+        return {k: thaw(v) for k, v in data.items()}
+    if isinstance(data, list):
+        return [thaw(v) for v in data]
+    return data
+
+
+class DocumentCache:
+    """
+    Bounded LRU cache of parsed JSON documents.
+
+    Entries are keyed on the document path and validated against a caller supplied
+    signature (for files: mtime_ns, size and inode), so a document changed on disk by
+    another process is re-read on the next lookup. The cache is bounded by an
+    approximate byte budget (the on-disk size of each document).
+
+    Parameters:
+        max_bytes (int): The byte budget. Least recently used entries are evicted past it.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, path, signature):
+        """
+        Returns the cached document for `path` if its signature still matches.
+
+        Parameters:
+            path (str): The document path.
+            signature (tuple): The current signature of the document.
+
+        Returns:
+            FrozenDict: The cached, read-only document, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None:
+                if entry[0] == signature:
+                    self._entries.move_to_end(path)
+                    self.hits += 1
+                    return entry[1]
+                self._drop(path)
+            self.misses += 1
+            return None
+
+    def put(self, path, signature, data, size):
+        """
+        Stores a document in the cache and returns its frozen form.
+
+        Parameters:
+            path (str): The document path.
+            signature (tuple): The signature the document was read with.
+            data (Any): The parsed document.
+            size (int): The approximate size of the document in bytes.
+
+        Returns:
+            FrozenDict: The read-only document that is now cached.
+        """
+        frozen = freeze(data)
+        if size > self.max_bytes:
+            return frozen
+        with self._lock:
+            if path in self._entries:
+                self._drop(path)
+            self._entries[path] = (signature, frozen, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return frozen
+
+    def invalidate(self, path):
+        """
+        Removes `path` from the cache, if present.
+        """
+        with self._lock:
+            if path in self._entries:
+                self._drop(path)
+                self.invalidations += 1
+
+    def clear(self):
+        """
+        Empties the cache. Counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: hits, misses, evictions, invalidations, entries and bytes.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
+
+    def _drop(self, path):
+        self._bytes -= self._entries.pop(path)[2]
@@ -1,30 +1,270 @@
+import json
+import gzip
+import hashlib
+import time
+import random
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
+import value_setter
+import json_patch
+import instrumentation
 
-def post_data_to_api(new_data, filepath, api_url):
+# Responses worth another attempt; everything else is final
+_RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+class ApiClient:
+    """
+    Sends documents to listener APIs over pooled, kept-alive connections.
+
+    Requests go through one requests.Session whose adapter keeps up to `poolSize`
+    connections per host. Connection errors, timeouts and 429/5xx responses are retried
+    up to `retries` times with exponential backoff and full jitter; every attempt has a
+    connect and a read timeout. post_many() sends in parallel on a bounded thread pool
+    while allowing at most `perHost` requests to any one host at a time.
+
+    In delta mode the client remembers the last document acknowledged for each
+    (api_url, filepath) and sends only a merge patch plus the hash of that base version;
+    if the listener's copy differs (409) the full document is sent instead. Bodies over
+    `gzipThreshold` bytes are gzip-compressed.
+
+    Parameters:
+        timeout (tuple): (connect, read) timeouts in seconds (default value_setter.apiConnectTimeout / apiReadTimeout).
+        retries (int): Extra attempts after the first (default value_setter.apiRetries).
+        backoff (float): Base delay in seconds, doubled for every retry (default value_setter.apiBackoff).
+        maxBackoff (float): Cap on a single delay (default value_setter.apiMaxBackoff).
+        poolSize (int): Kept-alive connections per host (default value_setter.apiPoolSize).
+        maxWorkers (int): Threads used by post_many (default value_setter.apiMaxWorkers).
+        perHost (int): Concurrent requests per host (default value_setter.apiPerHost).
+        delta (bool): Send merge-patch deltas (default value_setter.apiDelta).
+        gzipThreshold (int): Compress bodies larger than this many bytes (default value_setter.apiGzipThreshold).
+        snapshots (int): Documents remembered for delta mode (default value_setter.apiDeltaSnapshots).
+    """
+
+    def __init__(self, timeout=None, retries=None, backoff=None, maxBackoff=None, poolSize=None, maxWorkers=None, perHost=None,
+                 delta=None, gzipThreshold=None, snapshots=None):
+        self.timeout = timeout if timeout is not None else (value_setter.apiConnectTimeout, value_setter.apiReadTimeout)
+        self.retries = retries if retries is not None else value_setter.apiRetries
+        self.backoff = backoff if backoff is not None else value_setter.apiBackoff
+        self.maxBackoff = maxBackoff if maxBackoff is not None else value_setter.apiMaxBackoff
+        self.maxWorkers = maxWorkers if maxWorkers is not None else value_setter.apiMaxWorkers
+        self.perHost = perHost if perHost is not None else value_setter.apiPerHost
+        self.delta = delta if delta is not None else value_setter.apiDelta
+        self.gzipThreshold = gzipThreshold if gzipThreshold is not None else value_setter.apiGzipThreshold
+        self.maxSnapshots = snapshots if snapshots is not None else value_setter.apiDeltaSnapshots
+        poolSize = poolSize if poolSize is not None else value_setter.apiPoolSize
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._lock = threading.Lock()
+        self._hostSlots = {}
+        self._executor = None
+        # (api_url, filepath) -> (hash, document) of the last acknowledged version
+        self._snapshots = OrderedDict()
+
+    def _slots(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            slots = self._hostSlots.get(host)
+            if slots is None:
+                slots = self._hostSlots[host] = threading.BoundedSemaphore(self.perHost)
+            return slots
+
+    def _delay(self, attempt):
+        return random.uniform(0, min(self.maxBackoff, self.backoff * (2 ** attempt)))
+
+    def request(self, method, url, **kwargs):
+        """
+        Sends a request with retries. Keyword arguments are passed to requests.Session.request.
+
+        Returns:
+            requests.Response: The final response; retryable statuses are returned as-is
+                once the retries are used up.
+
+        Raises:
+            requests.RequestException: If the last attempt failed to connect or timed out.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        slots = self._slots(url)
+        attempt = 0
+        while True:
+            try:
+                with slots:
+                    response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.retries:
+                    raise
+            else:
+                if response.status_code not in _RETRY_STATUS or attempt >= self.retries:
+                    return response
+                response.close()
+            instrumentation.count('api.retries')
+            time.sleep(self._delay(attempt))
+            attempt += 1
+
+    def _post_json(self, url, payload):
+        body = json.dumps(payload).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if len(body) > self.gzipThreshold:
+            body = gzip.compress(body, compresslevel=6)
+            headers['Content-Encoding'] = 'gzip'
+        return self.request('POST', url, data=body, headers=headers)
+
+    def _remember(self, key, documentHash, canonical):
+        with self._lock:
+            # A private copy, so later changes by the caller do not alter the base
+            self._snapshots[key] = (documentHash, json.loads(canonical))
+            self._snapshots.move_to_end(key)
+            while len(self._snapshots) > self.maxSnapshots:
+                self._snapshots.popitem(last=False)
+
+    def forget(self, api_url=None, filepath=None):
+        """
+        Drops delta-mode snapshots, so the next send of those documents is a full send.
+
+        Parameters:
+            api_url (str): Only snapshots for this API (default all).
+            filepath (str): Only snapshots for this path (default all).
+        """
+        with self._lock:
+            for key in [k for k in self._snapshots if api_url in (None, k[0]) and filepath in (None, k[1])]:
+                del self._snapshots[key]
+
+    @instrumentation.timed('api.post_data')
+    def post_data(self, new_data, filepath, api_url):
+        """
+        Sends a document update and raises for HTTP errors.
+
+        The body is {'data', 'path'}, or in delta mode {'patch', 'base', 'path'} once a previous
+        version has been acknowledged and a merge patch is smaller than the document.
+
+        Returns:
+            requests.Response: The response object returned by the API.
+        """
+        if not self.delta:
+            response = self._post_json(api_url, {'data': new_data, 'path': filepath})
+            response.raise_for_status()
+            return response
+
+        key = (api_url, filepath)
+        try:
+            canonical = json.dumps(new_data, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+            # Same as json_patch.document_hash(new_data), without serializing twice
+            documentHash = hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+        except TypeError:
+            # Mixed key types cannot be hashed canonically; send without delta tracking
+            canonical = None
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+        if snapshot is not None and canonical is not None:
+            baseHash, base = snapshot
+            try:
+                patch = json_patch.create_merge_patch(base, new_data)
+            except ValueError:
+                patch = None
+            if patch is not None and len(json.dumps(patch)) < len(canonical):
+                response = self._post_json(api_url, {'patch': patch, 'base': baseHash, 'path': filepath})
+                if response.status_code != 409:
+                    response.raise_for_status()
+                    self._remember(key, documentHash, canonical)
+                    instrumentation.count('api.delta_sent')
+                    return response
+                instrumentation.count('api.delta_conflicts')
+                # The listener's copy is not our base; fall back to the full document
+        response = self._post_json(api_url, {'data': new_data, 'path': filepath})
+        response.raise_for_status()
+        if canonical is not None:
+            self._remember(key, documentHash, canonical)
+        return response
+
+    def post_many(self, items):
+        """
+        Sends many document updates in parallel.
+
+        Parameters:
+            items (iterable): (new_data, filepath, api_url) tuples.
+
+        Returns:
+            list: One entry per item, in order: the requests.Response, or the exception
+                (requests.RequestException) that item ended with.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.maxWorkers, thread_name_prefix='api-client')
+            executor = self._executor
+        futures = [executor.submit(self.post_data, *item) for item in items]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def close(self):
+        """
+        Closes pooled connections and the post_many threads.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def default_client():
+    """
+    Returns the process-wide ApiClient used by post_data_to_api, created on first use.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ApiClient()
+        return _client
+
+@instrumentation.timed('api.post_data_to_api')
+def post_data_to_api(new_data, filepath, api_url, spool=None):
     """
     Sends data to a specified API endpoint via a POST request.
 
+    Uses the shared ApiClient (see default_client), so connections are reused and
+    transient failures are retried; use ApiClient.post_many to send many documents at once.
+    When spooling, the update is stored in the durable spool (see api_spool) and sent in the
+    background instead, surviving API outages and restarts.
+
     Args:
         new_data (Any): The data to be sent to the API.
         filepath (str): The file path associated with the data.
         api_url (str): The URL of the API endpoint.
+        spool (bool): Queue the update instead of sending it now (default value_setter.apiSpool).
 
     Returns:
-        requests.Response: The response object returned by the API.
+        requests.Response: The response object returned by the API, or None when spooled.
 
     Raises:
         requests.RequestException: If the request fails due to network issues or invalid responses.
     """
-    # Prepare the payload to be sent in the POST request
-    apiData = {
-        'data': new_data,
-        'path': filepath
-    }
+    if spool if spool is not None else value_setter.apiSpool:
+        import api_spool
+        api_spool.default_spool().enqueue(new_data, filepath, api_url)
+        return None
     try:
         # Send the POST request to the API endpoint with the JSON payload
-        response = requests.post(api_url, json=apiData)
-        response.raise_for_status()  # Raise an exception for HTTP errors
-        return response
+        return default_client().post_data(new_data, filepath, api_url)
     except requests.RequestException as e:
         # Log or handle exceptions as needed
         print(f"Error posting data to API: {e}")
@@ -1,67 +1,185 @@
-import os
-import shutil
 import json
 import traceback
-from tempfile import NamedTemporaryFile
+from contextlib import contextmanager
 import value_setter
 import logger as logger
+from document_cache import DocumentCache, freeze, thaw
+from write_behind import WriteBehindBuffer
+import json_patch
+import storage_backend
+import instrumentation
 
 fm_log = logger.mainLog
 
-def getJsonDict(filename, input=False):
+# Parsed documents shared by every getJsonDict caller in this process
+document_cache = DocumentCache(value_setter.documentCacheBytes)
+
+# Active WriteBehindBuffer while write-behind mode is enabled, see enableWriteBehind
+write_behind = None
+
+# Where documents are persisted (value_setter.storageBackend), see setStorageBackend
+storage = storage_backend.createBackend()
+
+# Files read with getJsonDict(..., input=True) always come from the inputs directory
+input_storage = storage_backend.FileSystemBackend(value_setter.inputsDir)
+
+def setStorageBackend(backend):
+    """
+    Switches the storage backend used by getJsonDict, updateJsonFile, patchJsonFile and archiveFiles.
+
+    Pending write-behind documents are flushed to the old backend first.
+
+    Parameters:
+        backend (StorageBackend | str): A backend instance, or 'filesystem' / 'sqlite'.
+
+    Returns:
+        StorageBackend: The new backend.
+    """
+    global storage
+    flush()
+    storage = storage_backend.createBackend(backend) if isinstance(backend, str) else backend
+    document_cache.clear()
+    fm_log.info(f'Storage backend set to {storage.name}')
+    return storage
+
+@instrumentation.timed('file.getJsonDict')
+def getJsonDict(filename, input=False, readonly=False):
     """
     Retrieves the JSON data from a file.
 
+    Documents are served from the in-process document cache while the file's
+    mtime, size and inode (or the backend's version) are unchanged, so repeated
+    lookups skip the parse.
+
     Parameters:
         filename (str): The name of the JSON file.
         input (bool): Whether to look in the inputs directory.
+        readonly (bool): Return the shared, read-only cached document instead of a private copy.
+            Faster, but the result (a dict subclass) raises TypeError on modification.
 
     Returns:
         dict: The JSON data.
     """
-    if input:
-        extfilename = value_setter.inputsDir + filename
-    else:
-        extfilename = value_setter.mainDir + filename
-    if not os.path.isfile(extfilename):
-        updateJsonFile({}, filename)
-    with open(extfilename) as f:
-        data = json.load(f)
-    return data
+    backend = input_storage if input else storage
+    cacheKey = backend.key(filename)
+    if write_behind is not None:
+        pending = write_behind.pending(cacheKey)
+        if pending is not None:
+            return freeze(pending[1]) if readonly else thaw(pending[1])
+    baseSignature = backend.signature(filename)
+    if baseSignature is None:
+        _writeJsonFile({}, filename)
+        baseSignature = backend.signature(filename)
+    data = _loadDocument(backend, filename, cacheKey, baseSignature)
+    return data if readonly else thaw(data)
+
+def _journalPath(filepath):
+    return filepath + '.journal'
+
+def _readJournal(backend, journalPath, baseSignature):
+    """
+    Returns the patches recorded in a journal, or None if the journal is missing or stale.
 
+    The journal's first line records the signature of the snapshot it applies to; a
+    journal left behind by an interrupted compaction no longer matches and is ignored.
+    """
+    try:
+        lines = backend.read(journalPath).splitlines()
+    except FileNotFoundError:
+        return None
+    if not lines:
+        return None
+    try:
+        header = json.loads(lines[0])
+    except ValueError:
+        return None
+    if tuple(header.get('base', ())) != tuple(baseSignature):
+        return None
+    patches = []
+    for line in lines[1:]:
+        try:
+            patches.append(json.loads(line))
+        except ValueError:
+            # A torn final line from an interrupted append
+            break
+    return patches
 
+def _loadDocument(backend, filepath, cacheKey, baseSignature):
+    """
+    Returns the frozen document at `filepath` with its patch journal replayed.
+    """
+    data = document_cache.get(cacheKey, baseSignature)
+    if data is None:
+        raw = backend.read(filepath)
+        data = document_cache.put(cacheKey, baseSignature, json.loads(raw), len(raw))
+    journalSignature = backend.signature(_journalPath(filepath))
+    if journalSignature is None:
+        return data
+    journalKey = cacheKey + '.journal'
+    signature = (baseSignature, journalSignature)
+    patched = document_cache.get(journalKey, signature)
+    if patched is None:
+        patches = _readJournal(backend, _journalPath(filepath), baseSignature)
+        if patches is None:
+            return data
+        patched = data
+        for patch in patches:
+            patched = json_patch.apply_patch(patched, patch)
+        patched = document_cache.put(journalKey, signature, patched, len(json.dumps(patches)))
+    return patched
+
+def lockStats():
+    """
+    Returns the writer lock wait-time metrics of the storage backend.
+
+    Returns:
+        dict: See LockManager.stats; empty for backends without document locks.
+    """
+    return storage.lockStats()
+
+def cacheStats():
+    """
+    Returns the hit/miss/eviction counters of the document cache.
+
+    Returns:
+        dict: The counters, see DocumentCache.stats.
+    """
+    return document_cache.stats()
+
+
+@instrumentation.timed('file.updateJsonFile')
 def updateJsonFile(new_data, filepath):
     """
     Updates a JSON file with new data.
 
+    In write-behind mode (see enableWriteBehind) the document is only staged and
+    written, together with one archive version, on the next flush.
+
     Parameters:
         new_data (dict): The new data to write to the JSON file.
         filepath (str): The path to the JSON file.
 
     Returns:
-        bool: True if the operation succeeds, False otherwise.
+        bool: True if the operation succeeds (or the write was staged), False otherwise.
+    """
+    if write_behind is not None:
+        write_behind.stage(storage.key(filepath), filepath, new_data)
+        return True
+    return _writeJsonFile(new_data, filepath)
+
+def _writeJsonFile(new_data, filepath):
+    """
+    Archives the current version and writes `new_data` to `filepath`.
     """
-    archiveFiles(value_setter.mainDir + filepath)
     try:
-        # Ensure the directory exists
-        if value_setter.mainDir in filepath:
-            dir_path = os.path.dirname(filepath)
-        else:
-            dir_path = os.path.dirname(value_setter.mainDir + filepath)
-        if not os.path.isdir(dir_path):
-            fm_log.info(f'Creating directory: {dir_path}')
-            os.makedirs(dir_path)
-
-        # Write to a temporary file first
-        tempfile = NamedTemporaryFile(mode='w', delete=False, encoding='utf-8', newline='')
-        with open(tempfile.name, 'w') as jsonFile:
-            json.dump(new_data, jsonFile)
-        jsonFile.close()
-        
-        # Replace the original file with the temporary file
-        shutil.copyfile(tempfile.name, value_setter.mainDir + filepath)
-        tempfile.close()
-        os.remove(tempfile.name)
+        value_setter.ensureDirs()
+        with storage.lock(filepath):
+            archiveFiles(value_setter.mainDir + filepath)
+            with storage.batch():
+                storage.write(filepath, json.dumps(new_data).encode('utf-8'))
+                # A full write supersedes any pending patches
+                storage.delete(_journalPath(filepath))
+        document_cache.invalidate(storage.key(filepath))
         fm_log.info(f'Updated JSON file: {filepath}')
     except Exception as e:
         fm_log.error(f'Error updating JSON file: {e}')
@@ -70,10 +188,128 @@ def updateJsonFile(new_data, filepath):
     else:
         return True
 
+def patchJsonFile(filepath, patch):
+    """
+    Applies a partial update to a JSON file without rewriting it.
+
+    The patch is validated against the current document and appended to the file's
+    journal (`<file>.journal`), which getJsonDict replays on load. Once the journal
+    holds more than value_setter.journalMaxEntries patches or value_setter.journalMaxBytes
+    bytes it is compacted into a full snapshot through updateJsonFile.
+
+    Parameters:
+        filepath (str): The path to the JSON file.
+        patch (dict | list): An RFC 7386 merge patch, or a list of JSON-Pointer operations
+            ({"op": "set", "path": "/a/b", "value": 1} / {"op": "delete", "path": "/a/c"}).
+
+    Returns:
+        bool: True if the operation succeeds, False otherwise.
+    """
+    cacheKey = storage.key(filepath)
+    try:
+        if write_behind is not None:
+            pending = write_behind.pending(cacheKey)
+            if pending is not None:
+                write_behind.stage(cacheKey, filepath, json_patch.apply_patch(pending[1], patch))
+                return True
+        with storage.lock(filepath):
+            current = getJsonDict(filepath, readonly=True)
+            patched = json_patch.apply_patch(current, patch)
+
+            journalPath = _journalPath(filepath)
+            baseSignature = storage.signature(filepath)
+            entries = _readJournal(storage, journalPath, baseSignature)
+            line = (json.dumps(patch, separators=(',', ':')) + '\n').encode('utf-8')
+            if entries is None:
+                entries = []
+                storage.write(journalPath, (json.dumps({'base': baseSignature}) + '\n').encode('utf-8') + line)
+            else:
+                storage.append(journalPath, line)
+            fm_log.info(f'Patched JSON file: {filepath}')
+
+            if len(entries) + 1 > value_setter.journalMaxEntries or len(storage.read(journalPath)) > value_setter.journalMaxBytes:
+                fm_log.info(f'Compacting journal for {filepath}')
+                return _writeJsonFile(patched, filepath)
+    except Exception as e:
+        fm_log.error(f'Error patching JSON file: {e}')
+        fm_log.error(traceback.format_exc())
+        return False
+    else:
+        return True
+
+def enableWriteBehind(interval=1.0, maxDirty=100):
+    """
+    Switches updateJsonFile to write-behind mode.
+
+    Only the latest pending document per path is kept; pending documents are written
+    every `interval` seconds, once `maxDirty` paths are pending, on flush() and at
+    interpreter exit. getJsonDict returns pending documents before they reach disk.
+
+    Parameters:
+        interval (float): Seconds between background flushes.
+        maxDirty (int): Number of pending paths that triggers an early flush.
+
+    Returns:
+        WriteBehindBuffer: The active buffer.
+    """
+    global write_behind
+    if write_behind is None:
+        buffer = WriteBehindBuffer(_writeJsonFile, interval, maxDirty, batch=lambda: storage.batch())
+        buffer.start()
+        write_behind = buffer
+        fm_log.info(f'Write-behind enabled (interval={interval}s, maxDirty={maxDirty})')
+    return write_behind
+
+def disableWriteBehind():
+    """
+    Flushes pending documents and switches updateJsonFile back to direct writes.
+    """
+    global write_behind
+    buffer, write_behind = write_behind, None
+    if buffer is not None:
+        buffer.stop()
+        fm_log.info('Write-behind disabled')
+
+def flush():
+    """
+    Writes every document pending in write-behind mode and waits for completion.
+
+    Returns:
+        bool: True if every write succeeded (or nothing was pending), False otherwise.
+    """
+    if write_behind is None:
+        return True
+    return write_behind.flush()
+
+@contextmanager
+def writeBehind(interval=1.0, maxDirty=100):
+    """
+    Enables write-behind mode for a block and flushes on exit.
+
+    Example:
+        with file_management.writeBehind():
+            for update in updates:
+                file_management.updateJsonFile(update, 'status.json')
+    """
+    enabled = write_behind is None
+    buffer = enableWriteBehind(interval, maxDirty)
+    try:
+        yield buffer
+    finally:
+        if enabled:
+            disableWriteBehind()
+        else:
+            buffer.flush()
+
+@instrumentation.timed('file.archiveFiles')
 def archiveFiles(fileName, archiveCount=10):
     """
     Archives the specified file by keeping up to `archiveCount` versions.
-    Older archives are shifted up by one index, and the latest file is saved as archive 0.
+    The current file becomes archive 0 and older versions move back by one.
+
+    Versions are kept by the storage backend; the filesystem backend uses
+    archive_store, where each distinct content is stored once and rotation only
+    rewrites a small ring index. Use listVersions / restoreVersion to read them back.
 
     Parameters:
         fileName (str): The full path of the file to archive.
@@ -83,38 +319,38 @@ def archiveFiles(fileName, archiveCount=10):
         - Uses value_setter.archiveDir and value_setter.mainDir for directory paths.
         - Logs all major actions and errors.
     """
-    maxArchives = archiveCount
-    # Shift existing archives up by one index, starting from the highest
-    while archiveCount >= 0:
-        # Build archive file names
-        base_name, ext = os.path.splitext(fileName)
-        ext = ext.lstrip('.')  # Remove leading dot
-        archiveFileName = value_setter.archiveDir + base_name + str(archiveCount) + '.' + ext
-        newArchiveFileName = value_setter.archiveDir + base_name + str(archiveCount + 1) + '.' + ext
-        if os.path.isfile(archiveFileName):
-            if archiveCount + 1 <= maxArchives:
-                try:
-                    shutil.copyfile(archiveFileName, newArchiveFileName)
-                    fm_log.info(f'Archived {archiveFileName} to {newArchiveFileName}')
-                except Exception as e:
-                    fm_log.error(f'Error archiving file {archiveFileName} to {newArchiveFileName}: {e}')
-        archiveCount -= 1
-
+    if fileName.startswith(value_setter.mainDir):
+        fileName = fileName[len(value_setter.mainDir):]
     try:
-        if os.path.isfile(fileName):
-            # Ensure the archive directory exists
-            relative_path = fileName.replace(value_setter.mainDir, '', 1)
-            dir_path = os.path.dirname(value_setter.archiveDir + relative_path)
-            if not os.path.isdir(dir_path):
-                fm_log.info(f'Creating archive directory: {dir_path}')
-                os.makedirs(dir_path)
-            # Archive the current file as archive 0
-            archive0 = value_setter.archiveDir + relative_path.rsplit('.', 1)[0] + '0.' + fileName.rsplit('.', 1)[1]
-            try:
-                shutil.copyfile(fileName, archive0)
-                fm_log.info(f'Archived {fileName} to {archive0}')
-            except Exception as e:
-                fm_log.error(f'Error archiving file {fileName} to {archive0}: {e}')
+        storage.archive(fileName, archiveCount)
     except Exception as e:
         fm_log.error(f'Error during archiving process for {fileName}: {e}')
         fm_log.error(traceback.format_exc())
+
+def listVersions(filepath):
+    """
+    Lists the archived versions of a JSON file, newest first.
+
+    Parameters:
+        filepath (str): The path to the JSON file.
+
+    Returns:
+        list: One dict per version with at least 'version', 'size' and 'time'.
+    """
+    return storage.list_versions(filepath)
+
+def restoreVersion(filepath, n=0):
+    """
+    Replaces a JSON file with one of its archived versions. The current content is archived first.
+
+    Parameters:
+        filepath (str): The path to the JSON file.
+        n (int): The version to restore, 0 being the most recent archive.
+
+    Returns:
+        bool: True if the operation succeeds, False otherwise.
+    """
+    flush()
+    restored = storage.restore(filepath, n)
+    document_cache.invalidate(storage.key(filepath))
+    return restored
@@ -0,0 +1,203 @@
+import time
+import threading
+from concurrent.futures import Future
+
+CACHE_POLICIES = ('render', 'ttl', 'never')
+
+
+class _Registration:
+    __slots__ = ('name', 'func', 'cache', 'ttl', 'value', 'expires', 'inflight', 'lookups', 'hits', 'evaluations')
+
+    def __init__(self, name, func, cache, ttl):
+        self.name = name
+        self.func = func
+        self.cache = cache
+        self.ttl = ttl
+        self.value = None
+        self.expires = 0.0
+        self.inflight = None
+        self.lookups = 0
+        self.hits = 0
+        self.evaluations = 0
+
+
+class FunctionRegistry:
+    """
+    Zero-argument functions available to {functionName} placeholders, each with a caching policy.
+
+    Policies:
+        - 'render': evaluated at most once per render; repeated placeholders reuse the result.
+        - 'ttl': the result is shared by all renders for `ttl` seconds. Concurrent renders that
+          miss at the same time share a single evaluation.
+        - 'never': evaluated for every placeholder.
+
+    Parameters:
+        clock (callable): Monotonic time source used for TTLs (default time.monotonic).
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._functions = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, func=None, cache='render', ttl=None):
+        """
+        Registers a placeholder function. Can be used as a decorator.
+
+        Parameters:
+            name (str): The placeholder name, as written between braces.
+            func (callable): The zero-argument function. Omit to use register() as a decorator.
+            cache (str): The caching policy: 'render', 'ttl' or 'never'.
+            ttl (float): Seconds a result stays valid with cache='ttl'.
+
+        Returns:
+            callable: The function.
+
+        Example:
+            @registry.register('weather', cache='ttl', ttl=300)
+            def weather():
+                ...
+        """
+        if cache not in CACHE_POLICIES:
+            raise ValueError(f"Unknown cache policy {cache!r}; expected one of {CACHE_POLICIES}")
+        if cache == 'ttl' and (ttl is None or ttl <= 0):
+            raise ValueError("cache='ttl' requires a positive ttl")
+        if func is None:
+            return lambda f: self.register(name, f, cache, ttl)
+        with self._lock:
+            self._functions[name] = _Registration(name, func, cache, ttl)
+        return func
+
+    def unregister(self, name):
+        """
+        Removes a placeholder function, if registered.
+        """
+        with self._lock:
+            self._functions.pop(name, None)
+
+    def get(self, name):
+        """
+        Returns the registration for `name`, or None.
+        """
+        return self._functions.get(name)
+
+    def invalidate(self, name=None):
+        """
+        Drops cached TTL results for one function, or for all of them.
+        """
+        with self._lock:
+            entries = self._functions.values() if name is None else [self._functions[name]] if name in self._functions else []
+            for entry in entries:
+                entry.expires = 0.0
+                entry.value = None
+
+    def call(self, entry, calls=None):
+        """
+        Returns the result of a registered function according to its caching policy.
+
+        Parameters:
+            entry: A registration returned by get().
+            calls (dict): The per-render memo; pass the same dict for every placeholder of one render.
+
+        Returns:
+            Any: The function's result. Exceptions from the function propagate and are not cached.
+        """
+        with self._lock:
+            entry.lookups += 1
+            if entry.cache != 'never' and calls is not None and entry.name in calls:
+                entry.hits += 1
+                return calls[entry.name]
+            if entry.cache == 'ttl':
+                if entry.expires > self.clock():
+                    entry.hits += 1
+                    value = entry.value
+                    if calls is not None:
+                        calls[entry.name] = value
+                    return value
+                future = entry.inflight
+                owner = future is None
+                if owner:
+                    future = entry.inflight = Future()
+                else:
+                    entry.hits += 1
+        if entry.cache != 'ttl':
+            return self._evaluate(entry, calls)
+        if not owner:
+            value = future.result()
+        else:
+            try:
+                value = self._evaluate(entry, calls)
+            except BaseException as e:
+                with self._lock:
+                    entry.inflight = None
+                future.set_exception(e)
+                raise
+            with self._lock:
+                entry.value = value
+                entry.expires = self.clock() + entry.ttl
+                entry.inflight = None
+            future.set_result(value)
+        if calls is not None:
+            calls[entry.name] = value
+        return value
+
+    def _evaluate(self, entry, calls):
+        with self._lock:
+            entry.evaluations += 1
+        value = entry.func()
+        if entry.cache == 'render' and calls is not None:
+            calls[entry.name] = value
+        return value
+
+    def stats(self):
+        """
+        Returns per-function lookup, hit and evaluation counts.
+
+        Returns:
+            dict: {'functions': {name: {...}}, 'lookups', 'hits', 'evaluations', 'hit_rate'}.
+        """
+        with self._lock:
+            functions = {
+                entry.name: {
+                    'cache': entry.cache,
+                    'lookups': entry.lookups,
+                    'hits': entry.hits,
+                    'evaluations': entry.evaluations,
+                    'hit_rate': entry.hits / entry.lookups if entry.lookups else 0.0,
+                }
+                for entry in self._functions.values()
+            }
+        lookups = sum(f['lookups'] for f in functions.values())
+        hits = sum(f['hits'] for f in functions.values())
+        return {
+            'functions': functions,
+            'lookups': lookups,
+            'hits': hits,
+            'evaluations': sum(f['evaluations'] for f in functions.values()),
+            'hit_rate': hits / lookups if lookups else 0.0,
+        }
+
+
+# Registry consulted by object_management.stringFormatter and executeFunctionInString
+registry = FunctionRegistry()
+
+
+def register(name, func=None, cache='render', ttl=None):
+    """
+    Registers a placeholder function in the default registry. See FunctionRegistry.register.
+    """
+    return registry.register(name, func, cache, ttl)
+
+
+def unregister(name):
+    """
+    Removes a placeholder function from the default registry.
+    """
+    registry.unregister(name)
+
+
+def stats():
+    """
+    Returns the default registry's hit-rate statistics. See FunctionRegistry.stats.
+    """
+    return registry.stats()
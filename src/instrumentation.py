@@ -0,0 +1,302 @@
+import json
+import time
+import threading
+import functools
+import value_setter
+
+# Sub-buckets per power of two in a Histogram; values are recorded within 1/16 (6%)
+_SUB_BUCKETS = 16
+_SUB_BITS = 4
+# Quantiles reported by summarize() and to_prometheus()
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+_enabled = value_setter.metricsEnabled
+
+
+def _bucket(value):
+    if value < 2 * _SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - _SUB_BITS - 1
+    return shift * _SUB_BUCKETS + (value >> shift)
+
+def _bucketBounds(index):
+    if index < 2 * _SUB_BUCKETS:
+        return index, index
+    shift = index // _SUB_BUCKETS - 1
+    mantissa = index - shift * _SUB_BUCKETS
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+class Histogram:
+    """
+    An HDR-style latency histogram of integer values (nanoseconds).
+
+    Buckets are log-linear: every power of two is split into 16 equal sub-buckets, so any
+    value from 1 ns to hours is kept to within 6% in a few hundred sparse buckets, and
+    histograms from different threads or processes merge by adding bucket counts.
+    """
+
+    __slots__ = ('count', 'total', 'min', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self.buckets = {}
+
+    def record(self, value):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        index = _bucket(value)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def merge(self, other):
+        if not other.count:
+            return self
+        self.count += other.count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        for index, n in list(other.buckets.items()):
+            self.buckets[index] = self.buckets.get(index, 0) + n
+        return self
+
+    def percentile(self, q):
+        """Returns the value at quantile `q` (0 to 1), or 0 when empty."""
+        if not self.count:
+            return 0
+        rank = max(1, round(q * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                low, high = _bucketBounds(index)
+                return min(max((low + high) // 2, self.min), self.max)
+        return self.max
+
+
+class _ThreadStats:
+    # Written only by its own thread, so recording needs no lock
+    __slots__ = ('spans', 'counters')
+
+    def __init__(self):
+        self.spans = {}
+        self.counters = {}
+
+
+_local = threading.local()
+_lock = threading.Lock()
+# (thread, stats) for threads that have recorded something
+_threads = []
+# Totals of threads that have exited
+_retired = _ThreadStats()
+
+
+def _retire():
+    # Fold the stats of exited threads into _retired so short-lived threads do not pile up
+    global _threads
+    alive = []
+    for thread, stats in _threads:
+        if thread.is_alive():
+            alive.append((thread, stats))
+        else:
+            _mergeStats(_retired, stats)
+    _threads = alive
+
+def _mergeStats(into, stats):
+    for name, histogram in list(stats.spans.items()):
+        into.spans.setdefault(name, Histogram()).merge(histogram)
+    for name, value in list(stats.counters.items()):
+        into.counters[name] = into.counters.get(name, 0) + value
+
+def _stats():
+    stats = getattr(_local, 'stats', None)
+    if stats is None:
+        stats = _local.stats = _ThreadStats()
+        with _lock:
+            _retire()
+            _threads.append((threading.current_thread(), stats))
+    return stats
+
+
+def enable():
+    """Starts recording spans and counters."""
+    global _enabled
+    _enabled = True
+
+def disable():
+    """Stops recording; span() and count() then cost about one function call."""
+    global _enabled
+    _enabled = False
+
+def is_enabled():
+    return _enabled
+
+def record(name, nanoseconds):
+    """Adds one duration, in nanoseconds, to the span `name`."""
+    if _enabled:
+        spans = _stats().spans
+        histogram = spans.get(name)
+        if histogram is None:
+            histogram = spans[name] = Histogram()
+        histogram.record(nanoseconds)
+
+def count(name, n=1):
+    """Adds `n` to the counter `name`."""
+    if _enabled:
+        counters = _stats().counters
+        counters[name] = counters.get(name, 0) + n
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.name, time.perf_counter_ns() - self.start)
+        if exc_type is not None:
+            count(self.name + '.errors')
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return None
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name):
+    """
+    Times a block as the span `name`; a span that raises also counts `<name>.errors`.
+
+        with instrumentation.span('file.getJsonDict'):
+            ...
+    """
+    return _Span(name) if _enabled else _NO_SPAN
+
+def timed(name):
+    """
+    Decorator timing every call of the function as the span `name`.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            except BaseException:
+                count(name + '.errors')
+                raise
+            finally:
+                record(name, time.perf_counter_ns() - start)
+        return wrapper
+    return decorator
+
+
+def collect():
+    """
+    Returns the totals of every thread in this process, in a form merge() can combine
+    with those of other processes.
+
+    Returns:
+        dict: {'spans': {name: Histogram}, 'counters': {name: int}}
+    """
+    total = _ThreadStats()
+    with _lock:
+        _retire()
+        _mergeStats(total, _retired)
+        for _, stats in _threads:
+            _mergeStats(total, stats)
+    return {'spans': total.spans, 'counters': total.counters}
+
+def merge(collected):
+    """
+    Combines results of collect(), e.g. from several listener processes. None entries are skipped.
+    """
+    total = _ThreadStats()
+    for part in collected:
+        if part is not None:
+            partStats = _ThreadStats()
+            partStats.spans, partStats.counters = part['spans'], part['counters']
+            _mergeStats(total, partStats)
+    return {'spans': total.spans, 'counters': total.counters}
+
+def reset():
+    """Clears everything recorded so far."""
+    global _retired
+    with _lock:
+        _retired = _ThreadStats()
+        for _, stats in _threads:
+            stats.spans.clear()
+            stats.counters.clear()
+
+
+def summarize(collected=None):
+    """
+    Returns spans and counters as plain data, durations in milliseconds.
+
+    Parameters:
+        collected (dict): A result of collect() or merge() (default collect()).
+
+    Returns:
+        dict: {'enabled', 'spans': {name: {count, total_ms, mean_ms, min_ms, max_ms, p50_ms, ...}}, 'counters'}
+    """
+    collected = collected if collected is not None else collect()
+    spans = {}
+    for name, histogram in sorted(collected['spans'].items()):
+        summary = {
+            'count': histogram.count,
+            'total_ms': histogram.total / 1e6,
+            'mean_ms': histogram.total / histogram.count / 1e6 if histogram.count else 0.0,
+            'min_ms': (histogram.min or 0) / 1e6,
+            'max_ms': histogram.max / 1e6,
+        }
+        for q in QUANTILES:
+            summary[f'p{q * 100:g}_ms'.replace('.', '_')] = histogram.percentile(q) / 1e6
+        spans[name] = summary
+    return {'enabled': _enabled, 'spans': spans, 'counters': dict(sorted(collected['counters'].items()))}
+
+def to_json(collected=None):
+    """Returns summarize() as a JSON string."""
+    return json.dumps(summarize(collected), indent=2)
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def to_prometheus(collected=None):
+    """
+    Returns the metrics in the Prometheus text exposition format: spans as the summary
+    aw_span_seconds{span=...} and counters as aw_events_total{name=...}.
+    """
+    collected = collected if collected is not None else collect()
+    lines = ['# HELP aw_span_seconds Duration of instrumented spans.', '# TYPE aw_span_seconds summary']
+    for name, histogram in sorted(collected['spans'].items()):
+        label = _label(name)
+        for q in QUANTILES:
+            lines.append(f'aw_span_seconds{{span="{label}",quantile="{q:g}"}} {histogram.percentile(q) / 1e9:.9f}')
+        lines.append(f'aw_span_seconds_sum{{span="{label}"}} {histogram.total / 1e9:.9f}')
+        lines.append(f'aw_span_seconds_count{{span="{label}"}} {histogram.count}')
+    lines += ['# HELP aw_events_total Instrumentation counters.', '# TYPE aw_events_total counter']
+    for name, value in sorted(collected['counters'].items()):
+        lines.append(f'aw_events_total{{name="{_label(name)}"}} {value}')
+    lines += ['# HELP aw_instrumentation_enabled Whether spans and counters are being recorded.',
+              '# TYPE aw_instrumentation_enabled gauge', f'aw_instrumentation_enabled {int(_enabled)}']
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,246 @@
+import json
+import hashlib
+
+
+def merge_patch(target, patch):
+    """
+    Applies an RFC 7386 JSON merge patch.
+
+    Parameters:
+        target (Any): The document to patch.
+        patch (Any): The merge patch. null members delete keys; objects merge recursively;
+            any other value replaces the target.
+
+    Returns:
+        Any: The patched document.
+    """
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+def _same(a, b):
+    """JSON equality: unlike ==, 1, 1.0 and true are different values."""
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_same(value, b[key]) for key, value in a.items())
+    if isinstance(a, list):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def _check_no_null_members(value):
+    if isinstance(value, dict):
+        for member in value.values():
+            if member is None:
+                raise ValueError('A merge patch cannot set an object member to null')
+            _check_no_null_members(member)
+
+
+def create_merge_patch(source, target):
+    """
+    Computes the RFC 7386 merge patch that turns `source` into `target`.
+
+    Parameters:
+        source (Any): The original document.
+        target (Any): The desired document.
+
+    Returns:
+        Any: A patch such that merge_patch(source, patch) == target; {} if two objects are equal.
+
+    Raises:
+        ValueError: If `target` cannot be reached with a merge patch, i.e. it is null or has an
+            object member whose value is null (merge patches use null to delete).
+    """
+    if target is None:
+        raise ValueError('A merge patch cannot produce null')
+    if not isinstance(source, dict) or not isinstance(target, dict):
+        _check_no_null_members(target)
+        return target
+    patch = {}
+    for key in source:
+        if key not in target:
+            patch[key] = None
+    for key, value in target.items():
+        if key not in source:
+            _check_no_null_members({key: value})
+            patch[key] = value
+        elif not _same(source[key], value):
+            if value is not None and isinstance(source[key], dict) and isinstance(value, dict):
+                patch[key] = create_merge_patch(source[key], value)
+            else:
+                _check_no_null_members({key: value})
+                patch[key] = value
+    return patch
+
+
+def document_hash(document):
+    """
+    Returns a hash identifying a document's content, used as the base version of a patch.
+
+    The hash is the SHA-256 of the document's canonical JSON (sorted keys, no whitespace),
+    so it does not depend on key order or formatting.
+
+    Parameters:
+        document (Any): A JSON-serializable document.
+
+    Returns:
+        str: The hex digest.
+    """
+    canonical = json.dumps(document, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def parse_pointer(pointer):
+    """
+    Splits an RFC 6901 JSON pointer into reference tokens.
+
+    Parameters:
+        pointer (str): The pointer, e.g. "/settings/voice~1rate". "" refers to the whole document.
+
+    Returns:
+        list: The unescaped tokens.
+
+    Raises:
+        ValueError: If the pointer is not empty and does not start with "/".
+    """
+    if pointer == '':
+        return []
+    if not isinstance(pointer, str) or not pointer.startswith('/'):
+        raise ValueError(f"Invalid JSON pointer: {pointer!r}")
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+
+def _array_index(container, token, allow_end):
+    if token == '-' and allow_end:
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token[0] == '0'):
+        raise ValueError(f"Invalid array index in JSON pointer: {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise ValueError(f"Array index out of range in JSON pointer: {token!r}")
+    return index
+
+
+def pointer_set(document, pointer, value):
+    """
+    Sets the value at a JSON pointer, creating missing intermediate objects.
+
+    On arrays an index replaces an element and "-" (or the current length) appends.
+
+    Parameters:
+        document (Any): The document to update.
+        pointer (str): The location to set.
+        value (Any): The new value.
+
+    Returns:
+        Any: The updated document.
+
+    Raises:
+        ValueError: If the pointer is invalid or traverses a scalar.
+    """
+    def _set(node, tokens):
+        if not tokens:
+            return value
+        token, rest = tokens[0], tokens[1:]
+        if isinstance(node, list):
+            index = _array_index(node, token, allow_end=not rest)
+            result = list(node)
+            if index == len(result):
+                result.append(_set(None, rest))
+            else:
+                result[index] = _set(result[index], rest)
+            return result
+        if node is None:
+            node = {}
+        if not isinstance(node, dict):
+            raise ValueError(f"JSON pointer {pointer!r} traverses a non-container value")
+        result = dict(node)
+        result[token] = _set(node.get(token), rest)
+        return result
+
+    return _set(document, parse_pointer(pointer))
+
+
+def pointer_delete(document, pointer):
+    """
+    Removes the value at a JSON pointer. Deleting a missing location is a no-op.
+
+    Parameters:
+        document (Any): The document to update.
+        pointer (str): The location to remove. The whole document cannot be removed.
+
+    Returns:
+        Any: The updated document.
+
+    Raises:
+        ValueError: If the pointer is invalid or empty.
+    """
+    tokens = parse_pointer(pointer)
+    if not tokens:
+        raise ValueError("Cannot delete the whole document with a JSON pointer")
+
+    def _delete(node, tokens):
+        token, rest = tokens[0], tokens[1:]
+        if isinstance(node, dict):
+            if token not in node:
+                return node
+            result = dict(node)
+            if rest:
+                result[token] = _delete(node[token], rest)
+            else:
+                del result[token]
+            return result
+        if isinstance(node, list):
+            if not token.isdigit() or int(token) >= len(node):
+                return node
+            result = list(node)
+            if rest:
+                result[int(token)] = _delete(node[int(token)], rest)
+            else:
+                del result[int(token)]
+            return result
+        return node
+
+    return _delete(document, tokens)
+
+
+def apply_patch(document, patch):
+    """
+    Applies a patch in either supported form.
+
+    Parameters:
+        document (Any): The document to update.
+        patch (dict | list): A merge patch (dict), or a list of pointer operations such as
+            {"op": "set", "path": "/a/b", "value": 1} and {"op": "delete", "path": "/a/c"}.
+
+    Returns:
+        Any: The updated document.
+
+    Raises:
+        ValueError: If the patch is malformed.
+    """
+    if isinstance(patch, dict):
+        return merge_patch(document, patch)
+    if not isinstance(patch, list):
+        raise ValueError(f"Unsupported patch type: {type(patch).__name__}")
+    for operation in patch:
+        if not isinstance(operation, dict) or 'path' not in operation:
+            raise ValueError(f"Invalid patch operation: {operation!r}")
+        op = operation.get('op')
+        if op == 'set':
+            if 'value' not in operation:
+                raise ValueError(f"Patch operation is missing 'value': {operation!r}")
+            document = pointer_set(document, operation['path'], operation['value'])
+        elif op == 'delete':
+            document = pointer_delete(document, operation['path'])
+        else:
+            raise ValueError(f"Unsupported patch operation: {op!r}")
+    return document
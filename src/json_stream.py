@@ -0,0 +1,235 @@
+import re
+import json
+import mmap
+
+_WHITESPACE = re.compile(rb'[ \t\n\r]*')
+_SCALAR = re.compile(rb'[^ \t\n\r,\]}]*')
+_STRING_END = re.compile(rb'["\\]')
+_STRUCTURE = re.compile(rb'["{}\[\]]')
+
+
+class _PathNode:
+    __slots__ = ('children', 'paths')
+
+    def __init__(self):
+        self.children = {}
+        self.paths = []  # requested paths ending at this node
+
+
+class _Scanner:
+    """
+    Walks a JSON document held in a growing buffer (file chunks) or a memory map.
+
+    Values outside the requested paths are skipped by scanning for structural bytes
+    only; nothing is decoded for them and the consumed part of the buffer is dropped.
+    """
+
+    def __init__(self, source, chunk_size):
+        self.chunk_size = chunk_size
+        self.mark = None
+        self.pos = 0
+        if isinstance(source, mmap.mmap):
+            self.f = None
+            self.buf = source
+            self.eof = True
+        else:
+            self.f = source
+            self.buf = bytearray()
+            self.eof = False
+
+    def fill(self):
+        if self.eof:
+            return False
+        data = self.f.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+        keep = self.pos if self.mark is None else self.mark
+        del self.buf[:keep]
+        self.pos -= keep
+        if self.mark is not None:
+            self.mark -= keep
+        self.buf += data
+        return True
+
+    def peek(self):
+        while True:
+            m = _WHITESPACE.match(self.buf, self.pos)
+            self.pos = m.end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos:self.pos + 1]
+            if not self.fill():
+                raise ValueError('Unexpected end of JSON document')
+
+    def expect(self, token):
+        if self.peek() != token:
+            raise ValueError(f'Expected {token!r} at offset {self.pos} of JSON document')
+        self.pos += 1
+
+    def skip_string(self):
+        # self.pos is just past the opening quote
+        while True:
+            m = _STRING_END.search(self.buf, self.pos)
+            if m is None or (m.group() == b'\\' and m.end() >= len(self.buf)):
+                self.pos = len(self.buf) if m is None else m.start()
+                if not self.fill():
+                    raise ValueError('Unterminated string in JSON document')
+                continue
+            if m.group() == b'"':
+                self.pos = m.end()
+                return
+            self.pos = m.end() + 1
+
+    def read_string(self):
+        self.expect(b'"')
+        self.mark = self.pos - 1
+        try:
+            self.skip_string()
+            return json.loads(self.buf[self.mark:self.pos])
+        finally:
+            self.mark = None
+
+    def skip_value(self):
+        first = self.peek()
+        if first == b'"':
+            self.pos += 1
+            self.skip_string()
+        elif first in (b'{', b'['):
+            depth = 0
+            while True:
+                m = _STRUCTURE.search(self.buf, self.pos)
+                if m is None:
+                    self.pos = len(self.buf)
+                    if not self.fill():
+                        raise ValueError('Unexpected end of JSON document')
+                    continue
+                self.pos = m.end()
+                token = m.group()
+                if token == b'"':
+                    self.skip_string()
+                elif token in (b'{', b'['):
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        return
+        else:
+            while True:
+                m = _SCALAR.match(self.buf, self.pos)
+                self.pos = m.end()
+                if self.pos < len(self.buf) or not self.fill():
+                    return
+
+    def read_value(self):
+        self.peek()
+        self.mark = self.pos
+        try:
+            self.skip_value()
+            return json.loads(self.buf[self.mark:self.pos])
+        finally:
+            self.mark = None
+
+
+def _build_tree(paths):
+    root = _PathNode()
+    for path in paths:
+        node = root
+        for key in path:
+            node = node.children.setdefault(key, _PathNode())
+        node.paths.append(path)
+    return root
+
+
+def _resolve(value, path):
+    for key in path:
+        if isinstance(value, dict):
+            value = value.get(key, None)
+        else:
+            return None
+    return value
+
+
+def _walk_object(scanner, node, depth, results):
+    scanner.expect(b'{')
+    if scanner.peek() == b'}':
+        scanner.pos += 1
+        return
+    while True:
+        key = scanner.read_string()
+        scanner.expect(b':')
+        child = node.children.get(key)
+        if child is None:
+            scanner.skip_value()
+        else:
+            # A repeated key replaces what an earlier occurrence found, as with json.load
+            _clear(child, results)
+            if child.paths:
+                # Decode the value once; deeper requested paths are resolved from it
+                _collect(child, scanner.read_value(), depth + 1, results)
+            elif scanner.peek() == b'{':
+                _walk_object(scanner, child, depth + 1, results)
+            else:
+                scanner.skip_value()
+        token = scanner.peek()
+        scanner.pos += 1
+        if token == b'}':
+            return
+        if token != b',':
+            raise ValueError(f'Expected , or }} at offset {scanner.pos - 1} of JSON document')
+
+
+def _collect(node, value, depth, results):
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        for path in current.paths:
+            results[path] = _resolve(value, path[depth:])
+        stack.extend(current.children.values())
+
+
+def _clear(node, results):
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        for path in current.paths:
+            results.pop(path, None)
+        stack.extend(current.children.values())
+
+
+def extract_paths(filename, paths, use_mmap=False, chunk_size=64 * 1024):
+    """
+    Reads the values at the given key paths from a JSON file without parsing the whole document.
+
+    The file is scanned incrementally and only the values at the requested paths are
+    decoded; everything else is skipped without decoding. The whole file is scanned, so
+    that when a key occurs more than once in an object the last occurrence wins, as with
+    json.load.
+
+    Parameters:
+        filename (str): The path of the JSON file.
+        paths (list): Key paths, each a tuple of object keys.
+        use_mmap (bool): Memory-map the file instead of reading it in chunks.
+        chunk_size (int): Read size when not memory-mapping.
+
+    Returns:
+        dict: Maps each path to its value, or None if it does not exist or runs through a non-object.
+    """
+    paths = [tuple(path) for path in paths]
+    results = {}
+    root = _build_tree(paths)
+    with open(filename, 'rb') as f:
+        if use_mmap and f.seek(0, 2) > 0:
+            source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            f.seek(0)
+            source = f
+        try:
+            scanner = _Scanner(source, chunk_size)
+            if root.paths:
+                _collect(root, scanner.read_value(), 0, results)
+            elif scanner.peek() == b'{':
+                _walk_object(scanner, root, 0, results)
+        finally:
+            if source is not f:
+                source.close()
+    return {path: results.get(path) for path in paths}
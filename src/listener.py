@@ -1,16 +1,68 @@
+import os
+import zlib
+import codecs
+import json
+import logging
+import threading
+import traceback
+import concurrent.futures
 import flask
-from notify_run import Notify
 import logger
+import value_setter
 import file_management
+import json_patch
+import write_queue
+import notification_outbox
+import instrumentation
+from object_management import JsonObjectExtractor
 
-notify = Notify(endpoint='https://notify.run/t7M6m7zJ3fos7p7X1lJY')
+# Error alerts are deduplicated, batched and sent in the background
+notify = notification_outbox.outbox
 
 # Initialize Flask app and logger
 app = flask.Flask(__name__)
 listenerLog = logger.mainLog
-listenerLog.info('Listener has started')
+
+# Slots for concurrent /api/bulk requests (backpressure)
+_bulk_slots = threading.BoundedSemaphore(value_setter.bulkMaxConcurrent)
+
+# Size of the reads from a streamed request body
+_BULK_CHUNK = 64 * 1024
+
+# Background writer for /api requests answered with 202, see _wants_async
+writes = write_queue.WriteQueue(file_management.updateJsonFile, value_setter.writeQueueWorkers, value_setter.writeQueueSize)
+
+def _wants_async():
+    return value_setter.listenerAsync or 'respond-async' in flask.request.headers.get('Prefer', '')
+
+# Set by listener_cluster when several listener processes share the port. Document operations
+# then run in the process that owns the path, see _route.
+router = None
+
+def _route(path, operation, *args):
+    """
+    Runs a document operation here, or in the process owning `path` when clustered.
+    If the owner does not answer in time the request ends with 504: the operation may
+    still be applied, so its outcome is unknown.
+    """
+    if router is None:
+        return _OPERATIONS[operation](*args)
+    return _call_owner(router.owner(path), operation, *args, path=path)
+
+def _call_owner(owner, operation, *args, path=None):
+    """Runs an operation in listener worker `owner`, ending the request with 504 if it does not answer in time."""
+    try:
+        return router.call(owner, operation, *args)
+    except concurrent.futures.TimeoutError:
+        subject = f' for {path}' if path is not None else ''
+        listenerLog.warning(f'Listener worker {owner} did not answer {operation}{subject} within {router.callTimeout}s')
+        body = {'error': f'Timed out waiting for listener worker {owner}; the outcome of the {operation} is unknown'}
+        if path is not None:
+            body['path'] = path
+        flask.abort(flask.make_response(flask.jsonify(body), 504))
 
 @app.route('/api', methods=['POST'])
+@instrumentation.timed('listener.api')
 def post_json():
     """
     Endpoint to update a JSON file with new data.
@@ -18,43 +70,375 @@ def post_json():
     This function receives a POST request with JSON data containing the path to the JSON file
     and the data to be updated. It updates the JSON file with the provided data and returns a response.
 
+    In asynchronous mode (value_setter.listenerAsync, or a 'Prefer: respond-async' header) the
+    payload is only validated and queued, and the response is 202 with a request id; poll
+    /api/status/<id> to confirm the write. A full queue answers 503. When clustered, a
+    request whose owning worker does not answer in time gets 504 (the update may still be applied).
+
+    Instead of 'data' the payload may carry a merge 'patch' and the 'base' hash
+    (json_patch.document_hash) of the version it was computed against. The patch is journaled
+    with file_management.patchJsonFile; if the stored document does not match 'base' the
+    response is 409 and the client should send the full document. Patches are always applied
+    synchronously. Bodies may be gzip-compressed (Content-Encoding: gzip).
+
     Returns:
         Response: A JSON response indicating the update status.
     """
     # Log the received request
     listenerLog.info('Received POST request to /api endpoint')
-    
+
     # Extract data from the request
-    new_data = flask.request.json
+    new_data = _request_json()
+    if isinstance(new_data, dict) and 'patch' in new_data:
+        return _patch_request(new_data)
+    if _wants_async():
+        return _queue_update(new_data)
     data = new_data['data']
     path = new_data['path']
-    
-    # Log the details of the request
-    listenerLog.info(f"Updating JSON file at path: {path} with data: {data}")
-    
+
+    # Log the details of the request; payloads only at debug level
+    listenerLog.info(f"Updating JSON file at path: {path}")
+    if listenerLog.isEnabledFor(logging.DEBUG):
+        listenerLog.debug(f"Data for {path}: {data}")
+
     # Update the JSON file
-    try:
-        with open(path, 'w') as f:
-            f.write(str(data))
-    except OSError as e:
-        listenerLog.error(f"Error updating JSON file: {e}")
-        response = False
-        notify.send(f"Error updating JSON file: {e}")
-    except Exception as e:
-        listenerLog.error(f"Error updating JSON file: {e}")
-        response = False
-    else:
-        response = True
-    response = file_management.updateJsonFile(data, path)
+    response = _route(path, 'update', data, path)
     response = {
         'update': response
     }
-    
+
     # Log the response
     listenerLog.info(f"Response: {response}")
 
     return flask.jsonify(response), 201
 
+def _decompressed_body(maxBytes):
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        body = decompressor.decompress(flask.request.get_data(), maxBytes + 1)
+    except zlib.error:
+        flask.abort(400, 'Invalid gzip body')
+    if len(body) > maxBytes:
+        flask.abort(413, f'Decompressed body exceeds {maxBytes} bytes')
+    return body
+
+def _request_json():
+    """Returns the parsed JSON body, decompressing it first if it is gzip-encoded."""
+    if flask.request.headers.get('Content-Encoding', '').lower() != 'gzip':
+        return flask.request.json
+    try:
+        return json.loads(_decompressed_body(value_setter.bulkMaxBytes))
+    except ValueError:
+        flask.abort(400, 'Invalid JSON body')
+
+def _patch_request(new_data):
+    path = new_data.get('path')
+    if not isinstance(path, str) or not path:
+        return flask.jsonify({'error': "Missing 'path'"}), 400
+    listenerLog.info(f"Patching JSON file at path: {path}")
+    if listenerLog.isEnabledFor(logging.DEBUG):
+        listenerLog.debug(f"Patch for {path}: {new_data['patch']}")
+    response = _route(path, 'patch', path, new_data['patch'], new_data.get('base'))
+    if response.get('conflict'):
+        listenerLog.info(f"Rejected patch for {path}: base version does not match")
+        return flask.jsonify(response), 409
+    listenerLog.info(f"Response: {response}")
+    return flask.jsonify(response), 201
+
+def _patch(path, patch, base=None):
+    """
+    Journals a patch after checking that the stored document is the version it was made for.
+
+    Returns:
+        dict: {'update': bool}, or {'update': False, 'conflict': True, 'hash': current hash}.
+    """
+    with file_management.storage.lock(path):
+        if base is not None:
+            currentHash = json_patch.document_hash(file_management.getJsonDict(path, readonly=True))
+            if currentHash != base:
+                return {'update': False, 'conflict': True, 'hash': currentHash}
+        updated = file_management.patchJsonFile(path, patch)
+    if not updated:
+        notify.send(f"Error patching JSON file: {path}")
+    return {'update': updated}
+
+def _update(data, path):
+    updated = file_management.updateJsonFile(data, path)
+    if not updated:
+        notify.send(f"Error updating JSON file: {path}")
+    return updated
+
+def _submit(path, data):
+    # The depth is that of the queue the update joined, i.e. the owning worker's
+    return writes.submit(path, data, path), writes.depth()
+
+def _status(requestId):
+    return writes.status(requestId), writes.depth()
+
+def _queue_update(new_data):
+    if not isinstance(new_data, dict) or 'data' not in new_data or not isinstance(new_data.get('path'), str):
+        return flask.jsonify({'error': "Expected an object with 'data' and 'path'"}), 400
+    path = new_data['path']
+    try:
+        if router is None:
+            requestId, depth = _submit(path, new_data['data'])
+        else:
+            # Ids carry the owning worker so /api/status can be answered by any worker
+            owner = router.owner(path)
+            localId, depth = _call_owner(owner, 'submit', path, new_data['data'], path=path)
+            requestId = f'{owner}.{localId}'
+    except write_queue.QueueFull:
+        listenerLog.warning(f'Rejected update for {path}: write queue is full')
+        return flask.jsonify({'error': 'Write queue is full'}), 503, {'Retry-After': '1'}
+    listenerLog.info(f'Queued update for {path} as {requestId}')
+    statusUrl = flask.url_for('get_status', request_id=requestId)
+    return flask.jsonify({'id': requestId, 'status': statusUrl, 'queue_depth': depth}), 202, {'Location': statusUrl}
+
+@app.route('/api/status/<request_id>', methods=['GET'])
+def get_status(request_id):
+    """
+    Endpoint reporting the state of a queued /api update.
+
+    Returns:
+        Response: {"id", "path", "state": "queued" | "running" | "done" | "failed", "submitted",
+            "finished", "error", "queue_depth"}, or 404 for an unknown or expired id. The
+        queue_depth is that of the worker owning the request; 504 if it does not answer in time.
+    """
+    if router is not None and '.' in request_id:
+        owner, _, localId = request_id.partition('.')
+        if owner.isdigit() and int(owner) < router.count:
+            status, depth = _call_owner(int(owner), 'status', localId)
+        else:
+            status, depth = None, writes.depth()
+        if status is not None:
+            status['id'] = request_id
+    else:
+        status, depth = _status(request_id)
+    if status is None:
+        return flask.jsonify({'error': 'Unknown request id', 'queue_depth': depth}), 404
+    status['queue_depth'] = depth
+    return flask.jsonify(status), 200
+
+@app.route('/api/queue', methods=['GET'])
+def get_queue():
+    """
+    Endpoint exposing the write queue gauges (depth, running, capacity, workers, completed, failed).
+    """
+    return flask.jsonify(writes.stats()), 200
+
+def _worker_stats():
+    return {
+        'pid': os.getpid(),
+        'write_queue': writes.stats(),
+        'locks': file_management.lockStats(),
+        'cache': file_management.cacheStats(),
+        'notifications': notify.stats(),
+    }
+
+@app.route('/api/cluster', methods=['GET'])
+def get_cluster():
+    """
+    Endpoint reporting the health and metrics of every listener process.
+
+    Returns:
+        Response: {"status": "ok" | "degraded", "workers": [...], "totals": {...}}; 503 when a
+            worker did not answer.
+    """
+    if router is None:
+        workers = [dict(_worker_stats(), worker=0)]
+    else:
+        workers = router.gather('stats')
+    answered = [w for w in workers if w is not None]
+    totals = {
+        'workers': len(workers),
+        'answered': len(answered),
+        'queue_depth': sum(w['write_queue']['depth'] for w in answered),
+        'writes_completed': sum(w['write_queue']['completed'] for w in answered),
+        'writes_failed': sum(w['write_queue']['failed'] for w in answered),
+    }
+    for key in ('requests', 'active', 'forwarded', 'served'):
+        totals[key] = sum(w.get('router', {}).get(key, 0) for w in answered)
+    healthy = len(answered) == len(workers)
+    return flask.jsonify({'status': 'ok' if healthy else 'degraded', 'workers': workers, 'totals': totals}), 200 if healthy else 503
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Endpoint exposing the instrumentation spans and counters of every listener process, in the
+    Prometheus text format, or as JSON with ?format=json (see instrumentation).
+    """
+    if router is None:
+        collected = instrumentation.collect()
+    else:
+        collected = instrumentation.merge(router.gather('metrics'))
+    if flask.request.args.get('format') == 'json':
+        return flask.jsonify(instrumentation.summarize(collected)), 200
+    return flask.Response(instrumentation.to_prometheus(collected), mimetype='text/plain; version=0.0.4'), 200
+
+class _BodyTooLarge(Exception):
+    pass
+
+def _read_updates(stream, maxBytes, gzipped=False):
+    """
+    Yields the text of each update object in a request body as the body arrives.
+
+    Works for NDJSON (one object per line) and for a JSON array of objects alike: the
+    extractor picks out top-level objects and skips the separators between them. With
+    `gzipped` the body is decompressed on the fly; `maxBytes` limits the decompressed size.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    extractor = JsonObjectExtractor()
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+    received = 0
+    while True:
+        chunk = stream.read(_BULK_CHUNK)
+        if not chunk:
+            break
+        if decompressor is not None:
+            try:
+                chunk = decompressor.decompress(chunk, maxBytes - received + 1)
+            except zlib.error as e:
+                raise ValueError(f'Invalid gzip body: {e}')
+            if decompressor.unconsumed_tail:
+                raise _BodyTooLarge(f'Request body exceeds {maxBytes} bytes')
+        received += len(chunk)
+        if received > maxBytes:
+            raise _BodyTooLarge(f'Request body exceeds {maxBytes} bytes')
+        yield from extractor.feed(decoder.decode(chunk))
+    yield from extractor.feed(decoder.decode(b'', final=True))
+    if extractor.pending:
+        raise ValueError('Request body ends inside an update')
+
+def _group_updates(texts, results):
+    """
+    Parses and validates updates, grouping the valid ones by path in arrival order.
+
+    Invalid updates get their error recorded in `results` right away.
+    """
+    groups = {}
+    for index, text in enumerate(texts):
+        results.append({'index': index})
+        try:
+            item = json.loads(text)
+        except ValueError as e:
+            results[index]['error'] = f'Invalid JSON: {e}'
+            continue
+        path = item.get('path')
+        if not isinstance(path, str) or not path:
+            results[index]['error'] = "Missing 'path'"
+            continue
+        results[index]['path'] = path
+        if ('data' in item) == ('patch' in item):
+            results[index]['error'] = "Expected exactly one of 'data' or 'patch'"
+            continue
+        groups.setdefault(path, []).append((index, item))
+    return groups
+
+_STORED = object()
+
+def _apply_group(path, items):
+    """
+    Folds every update for one path into a single document and writes it once.
+
+    'data' replaces the document; 'patch' (a merge patch or a list of pointer operations)
+    applies to the result of the updates before it, or to the stored document.
+
+    Returns:
+        dict: index -> {'update': bool} or {'error': str} for each item.
+    """
+    results = {index: {} for index, _ in items}
+    try:
+        with file_management.storage.lock(path):
+            # Until a 'data' item replaces it (possibly with null), patches apply to the stored document
+            document = _STORED
+            applied = []
+            for index, item in items:
+                try:
+                    if 'data' in item:
+                        document = item['data']
+                    else:
+                        if document is _STORED:
+                            document = file_management.getJsonDict(path, readonly=True)
+                        document = json_patch.apply_patch(document, item['patch'])
+                except Exception as e:
+                    results[index]['error'] = f'Invalid patch: {e}'
+                else:
+                    applied.append(index)
+            updated = file_management.updateJsonFile(document, path) if applied else False
+    except Exception as e:
+        listenerLog.error(f"Error applying bulk updates to {path}: {e}")
+        listenerLog.error(traceback.format_exc())
+        updated = False
+        applied = [index for index, _ in items if 'error' not in results[index]]
+    for index in applied:
+        results[index]['update'] = updated
+    if not updated and applied:
+        notify.send(f"Error updating JSON file: {path}")
+    return results
+
+@app.route('/api/bulk', methods=['POST'])
+@instrumentation.timed('listener.bulk')
+def post_bulk():
+    """
+    Endpoint to apply many updates in one request.
+
+    The body is NDJSON or a JSON array of update objects, each {"path": ..., "data": ...}
+    (replace the document, as /api does) or {"path": ..., "patch": ...} (a partial update,
+    see file_management.patchJsonFile). The body is parsed as it streams in (and
+    decompressed, with Content-Encoding: gzip); updates are grouped by path so every path
+    is written once, with its updates applied in order.
+
+    Limits: bodies over value_setter.bulkMaxBytes get 413, and when
+    value_setter.bulkMaxConcurrent bulk requests are already running the request gets 503
+    with Retry-After. Nothing is written for a rejected or unparseable body.
+
+    Returns:
+        Response: {"items": n, "paths": n, "results": [{"index", "path", "update" | "error"}, ...]}.
+    """
+    maxBytes = value_setter.bulkMaxBytes
+    length = flask.request.content_length
+    # For gzip bodies the limit applies to the decompressed size, checked while reading
+    if length is not None and length > maxBytes:
+        return flask.jsonify({'error': f'Request body exceeds {maxBytes} bytes'}), 413
+    if not _bulk_slots.acquire(blocking=False):
+        listenerLog.warning('Rejected /api/bulk request: too many bulk requests in progress')
+        return flask.jsonify({'error': 'Too many bulk requests in progress'}), 503, {'Retry-After': '1'}
+    try:
+        results = []
+        try:
+            gzipped = flask.request.headers.get('Content-Encoding', '').lower() == 'gzip'
+            groups = _group_updates(_read_updates(flask.request.stream, maxBytes, gzipped), results)
+        except _BodyTooLarge as e:
+            return flask.jsonify({'error': str(e)}), 413
+        except ValueError as e:
+            return flask.jsonify({'error': str(e)}), 400
+        listenerLog.info(f'Received {len(results)} bulk updates for {len(groups)} paths')
+        if listenerLog.isEnabledFor(logging.DEBUG):
+            listenerLog.debug(f'Bulk update paths: {list(groups)}')
+        for path, items in groups.items():
+            for index, outcome in _route(path, 'bulk', path, items).items():
+                results[index].update(outcome)
+        return flask.jsonify({'items': len(results), 'paths': len(groups), 'results': results}), 200
+    finally:
+        _bulk_slots.release()
+
+# Operations a clustered listener runs in the process owning the document
+_OPERATIONS = {
+    'update': _update,
+    'patch': _patch,
+    'bulk': _apply_group,
+    'submit': _submit,
+    'status': _status,
+    'stats': _worker_stats,
+    'metrics': instrumentation.collect,
+}
+
 if __name__ == '__main__':
-    # Run the Flask app
-    app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
+    listenerLog.info('Listener has started')
+    if value_setter.listenerWorkers > 1:
+        # Several processes sharing the port, see listener_cluster
+        import listener_cluster
+        listener_cluster.serve(value_setter.listenerWorkers, host='0.0.0.0', port=5000)
+    else:
+        # Run the Flask app
+        app.run(host='0.0.0.0', port=5000)
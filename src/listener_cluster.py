@@ -0,0 +1,286 @@
+import os
+import time
+import queue
+import zlib
+import pickle
+import signal
+import socket
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import Future, ThreadPoolExecutor
+import value_setter
+import logger as logger
+
+lc_log = logger.mainLog
+
+
+def shard(key, count):
+    """
+    Returns the worker (0 to count - 1) owning a document key.
+    """
+    return zlib.crc32(key.encode('utf-8')) % count
+
+
+class ClusterRouter:
+    """
+    Runs document operations in the listener process that owns the document.
+
+    Every document path hashes (crc32 of its storage key) to one of the workers; updates
+    received by any other worker are forwarded to the owner over its multiprocessing inbox
+    and the reply is sent back to the caller's inbox. Each document therefore only ever
+    changes in one process, in the order that process receives the updates, and its lock
+    and cache stay in that process.
+
+    Parameters:
+        index (int): This worker's number.
+        inboxes (list): One multiprocessing.Queue per worker, indexed by worker number.
+        operations (dict): Operation name -> callable, identical in every worker.
+        callTimeout (float): Seconds to wait for another worker's reply (default value_setter.listenerCallTimeout).
+        threads (int): Threads running operations received from other workers.
+    """
+
+    def __init__(self, index, inboxes, operations, callTimeout=None, threads=8):
+        self.index = index
+        self.count = len(inboxes)
+        self.inboxes = inboxes
+        self.operations = operations
+        self.callTimeout = callTimeout if callTimeout is not None else value_setter.listenerCallTimeout
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='cluster-call')
+        self._ids = itertools.count()
+        self._waiting = {}
+        self._cond = threading.Condition()
+        self._exit = threading.Event()
+        self._thread = None
+        self._counters = {'requests': 0, 'active': 0, 'forwarded': 0, 'served': 0, 'local': 0}
+
+    def owner(self, path):
+        """Returns the worker owning `path`."""
+        import file_management
+        return shard(file_management.storage.key(path), self.count)
+
+    def call(self, worker, operation, *args):
+        """
+        Runs an operation in `worker` and returns its result; exceptions are re-raised here.
+        """
+        if worker == self.index:
+            with self._cond:
+                self._counters['local'] += 1
+            return self._execute(operation, args)
+        return self._send(worker, operation, args).result(self.callTimeout)
+
+    def gather(self, operation, timeout=2.0):
+        """
+        Runs an operation in every worker.
+
+        Returns:
+            list: One result per worker, None for a worker that failed or did not answer in time.
+        """
+        futures = {worker: self._send(worker, operation, ()) for worker in range(self.count) if worker != self.index}
+        deadline = time.monotonic() + timeout
+        results = []
+        for worker in range(self.count):
+            try:
+                if worker == self.index:
+                    results.append(self._execute(operation, ()))
+                else:
+                    results.append(futures[worker].result(max(0.0, deadline - time.monotonic())))
+            except Exception as e:
+                lc_log.warning(f'Listener worker {worker} did not answer {operation}: {e}')
+                results.append(None)
+        return results
+
+    def _send(self, worker, operation, args):
+        future = Future()
+        with self._cond:
+            callId = next(self._ids)
+            self._waiting[callId] = future
+            self._counters['forwarded'] += 1
+        future.add_done_callback(lambda f: self._waiting.pop(callId, None))
+        self.inboxes[worker].put(('call', callId, self.index, operation, args))
+        return future
+
+    def _execute(self, operation, args):
+        if operation == 'stats':
+            with self._cond:
+                counters = dict(self._counters)
+            return dict(self.operations['stats'](), worker=self.index, router=counters)
+        return self.operations[operation](*args)
+
+    def _serve(self, callId, origin, operation, args):
+        try:
+            value, ok = self._execute(operation, args), True
+        except Exception as e:
+            value, ok = e, False
+            try:
+                pickle.dumps(e)
+            except Exception:
+                value = RuntimeError(f'{type(e).__name__}: {e}')
+        with self._cond:
+            self._counters['served'] += 1
+        self.inboxes[origin].put(('reply', callId, ok, value))
+
+    def _dispatch(self):
+        inbox = self.inboxes[self.index]
+        while True:
+            message = inbox.get()
+            kind = message[0]
+            if kind == 'call':
+                self._executor.submit(self._serve, *message[1:])
+            elif kind == 'reply':
+                _, callId, ok, value = message
+                future = self._waiting.get(callId)
+                if future is not None and not future.done():
+                    if ok:
+                        future.set_result(value)
+                    else:
+                        future.set_exception(value)
+            elif kind == 'exit':
+                self._exit.set()
+                return
+
+    def start(self):
+        """Starts the thread reading this worker's inbox."""
+        self._thread = threading.Thread(target=self._dispatch, name='cluster-inbox', daemon=True)
+        self._thread.start()
+        return self
+
+    def request_started(self):
+        """Counts an HTTP request in flight (Flask before_request hook)."""
+        with self._cond:
+            self._counters['requests'] += 1
+            self._counters['active'] += 1
+
+    def request_finished(self, exc=None):
+        """Counts an HTTP request as finished (Flask teardown_request hook)."""
+        with self._cond:
+            self._counters['active'] -= 1
+            self._cond.notify_all()
+
+    def wait_idle(self, timeout):
+        """Waits until no HTTP request is in flight. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._counters['active'] > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def wait_exit(self, timeout=None):
+        """Waits for the launcher's exit message; until then operations from other workers are still served."""
+        return self._exit.wait(timeout)
+
+    def close(self):
+        """Waits for operations received from other workers to finish."""
+        self._executor.shutdown(wait=True)
+
+
+def _worker_main(index, sock, inboxes, events, host, port):
+    # Ctrl-C reaches the whole process group; the launcher decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import listener
+    import file_management
+    from werkzeug.serving import make_server
+
+    router = ClusterRouter(index, inboxes, listener._OPERATIONS).start()
+    listener.router = router
+    listener.app.before_request(router.request_started)
+    listener.app.teardown_request(router.request_finished)
+    server = make_server(host, port, listener.app, threaded=True, fd=sock.fileno())
+    # shutdown() waits for serve_forever to return, so it cannot run in the signal handler itself
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown, daemon=True).start())
+    events.put(('ready', index, os.getpid()))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+    # Drain phase 1: no new requests; finish those in flight, which may still need other workers
+    if not router.wait_idle(value_setter.listenerDrainTimeout):
+        lc_log.warning(f'Listener worker {index} stopped with requests still in flight')
+    events.put(('drained', index, os.getpid()))
+    # Phase 2: keep serving other workers until every worker has drained
+    router.wait_exit()
+    router.close()
+    listener.writes.stop(drain=True)
+    file_management.flush()
+    listener.notify.stop()
+    lc_log.info(f'Listener worker {index} stopped')
+
+
+def serve(workers, host='0.0.0.0', port=5000):
+    """
+    Runs the listener in `workers` processes sharing one listening socket.
+
+    Updates are routed to the process owning the document (see ClusterRouter). A worker
+    that dies is restarted. SIGTERM or SIGINT drains gracefully: every worker stops
+    accepting, finishes its requests, then its queued writes, and exits.
+
+    Parameters:
+        workers (int): Number of listener processes.
+        host (str): The interface to listen on.
+        port (int): The port to listen on.
+    """
+    sock = socket.create_server((host, port), backlog=1024)
+    sock.set_inheritable(True)
+    context = multiprocessing.get_context()
+    inboxes = [context.Queue() for _ in range(workers)]
+    events = context.Queue()
+    processes = [None] * workers
+
+    def spawn(index):
+        process = context.Process(target=_worker_main, args=(index, sock, inboxes, events, host, port),
+                                  name=f'listener-{index}')
+        process.start()
+        processes[index] = process
+
+    stopping = threading.Event()
+    previous = {sig: signal.signal(sig, lambda signum, frame: stopping.set()) for sig in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        for index in range(workers):
+            spawn(index)
+        lc_log.info(f'Listener started with {workers} workers on {host}:{port}')
+        while not stopping.is_set():
+            try:
+                event = events.get(timeout=1.0)
+                lc_log.info(f'Listener worker {event[1]} {event[0]} (pid {event[2]})')
+            except queue.Empty:
+                pass
+            for index, process in enumerate(processes):
+                if not process.is_alive() and not stopping.is_set():
+                    lc_log.error(f'Listener worker {index} exited with code {process.exitcode}; restarting')
+                    spawn(index)
+        _drain(processes, inboxes, events)
+    finally:
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+        sock.close()
+    lc_log.info('Listener stopped')
+
+
+def _drain(processes, inboxes, events):
+    lc_log.info('Listener draining')
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    drained = set()
+    deadline = time.monotonic() + value_setter.listenerDrainTimeout + 5
+    while time.monotonic() < deadline:
+        if all(index in drained or not process.is_alive() for index, process in enumerate(processes)):
+            break
+        try:
+            event = events.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        if event[0] == 'drained':
+            drained.add(event[1])
+    for inbox in inboxes:
+        inbox.put(('exit',))
+    for index, process in enumerate(processes):
+        process.join(value_setter.listenerDrainTimeout)
+        if process.is_alive():
+            lc_log.error(f'Listener worker {index} did not stop; killing it')
+            process.kill()
+            process.join()
@@ -0,0 +1,138 @@
+import os
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+import value_setter
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks only coordinate threads of this process
+    fcntl = None
+
+
+class LockManager:
+    """
+    Per-document shared/exclusive locks that work across threads and processes.
+
+    Each document gets a lock file under `lockDir` (named by a hash of the document key)
+    locked with fcntl.flock; every acquisition opens its own file description, so threads
+    of one process exclude each other as well. Locks are re-entrant per thread: a thread
+    holding a document's lock can take it again (e.g. a patch that triggers a compaction).
+
+    Readers of files published with an atomic rename do not need a lock at all; shared
+    locks are for callers that must see a stable document across several reads.
+
+    Parameters:
+        lockDir (str): The directory for lock files (default value_setter.lockDir).
+    """
+
+    def __init__(self, lockDir=None):
+        self.lockDir = lockDir if lockDir is not None else value_setter.lockDir
+        self._local = threading.local()
+        self._statsLock = threading.Lock()
+        self._threadLocks = {}
+        self._stats = {
+            'shared': {'acquired': 0, 'contended': 0, 'wait_total': 0.0, 'wait_max': 0.0},
+            'exclusive': {'acquired': 0, 'contended': 0, 'wait_total': 0.0, 'wait_max': 0.0},
+        }
+
+    def _lockPath(self, key):
+        return os.path.join(self.lockDir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.lock')
+
+    def _held(self):
+        held = getattr(self._local, 'held', None)
+        if held is None:
+            held = self._local.held = {}
+        return held
+
+    def _record(self, mode, contended, waited):
+        with self._statsLock:
+            stats = self._stats[mode]
+            stats['acquired'] += 1
+            if contended:
+                stats['contended'] += 1
+                stats['wait_total'] += waited
+                stats['wait_max'] = max(stats['wait_max'], waited)
+
+    def _acquireFile(self, key, exclusive):
+        os.makedirs(self.lockDir, exist_ok=True)
+        fd = os.open(self._lockPath(key), os.O_RDWR | os.O_CREAT, 0o644)
+        flag = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        try:
+            try:
+                fcntl.flock(fd, flag | fcntl.LOCK_NB)
+                return fd, False, 0.0
+            except BlockingIOError:
+                start = time.perf_counter()
+                fcntl.flock(fd, flag)
+                return fd, True, time.perf_counter() - start
+        except BaseException:
+            os.close(fd)
+            raise
+
+    def _acquireThread(self, key):
+        with self._statsLock:
+            lock = self._threadLocks.setdefault(key, threading.Lock())
+        if lock.acquire(blocking=False):
+            return lock, False, 0.0
+        start = time.perf_counter()
+        lock.acquire()
+        return lock, True, time.perf_counter() - start
+
+    @contextmanager
+    def lock(self, key, exclusive=True):
+        """
+        Holds the lock of a document for the duration of the block.
+
+        Parameters:
+            key (str): The document key, e.g. StorageBackend.key(path).
+            exclusive (bool): Take the exclusive (writer) lock instead of a shared (reader) lock.
+        """
+        held = self._held()
+        if key in held:
+            entry = held[key]
+            if exclusive and not entry[1]:
+                raise RuntimeError(f'Cannot upgrade a shared lock to an exclusive lock: {key}')
+            entry[2] += 1
+            try:
+                yield
+            finally:
+                entry[2] -= 1
+            return
+
+        mode = 'exclusive' if exclusive else 'shared'
+        if fcntl is not None:
+            handle, contended, waited = self._acquireFile(key, exclusive)
+        else:
+            handle, contended, waited = self._acquireThread(key)
+        self._record(mode, contended, waited)
+        held[key] = [handle, exclusive, 1]
+        try:
+            yield
+        finally:
+            del held[key]
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+                os.close(handle)
+            else:
+                handle.release()
+
+    def shared(self, key):
+        """Shorthand for lock(key, exclusive=False)."""
+        return self.lock(key, exclusive=False)
+
+    def exclusive(self, key):
+        """Shorthand for lock(key, exclusive=True)."""
+        return self.lock(key, exclusive=True)
+
+    def stats(self):
+        """
+        Returns lock wait-time metrics.
+
+        Returns:
+            dict: For 'shared' and 'exclusive': acquired, contended (had to wait),
+                wait_total and wait_max in seconds.
+        """
+        with self._statsLock:
+            return {mode: dict(values) for mode, values in self._stats.items()}
@@ -1,11 +1,260 @@
+import os
+import queue
+import atexit
 import logging
-import concurrent_log_handler
+import logging.handlers
+import threading
 import value_setter
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Configure logging; the root logger is left to the application
 mainLog = logging.getLogger(__name__)
+mainLog.setLevel(logging.INFO)
+# mainLog writes to main.log only, not to the console through the root logger
+mainLog.propagate = False
 
-handler=concurrent_log_handler.ConcurrentRotatingFileHandler(value_setter.loggingDir+'main.log', 'a', maxBytes=50000, backupCount=5)
-handler.setLevel(logging.INFO)
-mainLog.addHandler(handler)
+OVERFLOW_POLICIES = ('block', 'drop-debug', 'count-dropped')
+
+
+class BatchFormatter(logging.Formatter):
+    """
+    Formats a record carrying a `batch` of records as their lines, so a file handler can
+    write many records with one lock, write and flush (see emitBatch).
+
+    Parameters:
+        inner (logging.Formatter): Formats each record (default logging.Formatter()).
+    """
+
+    def __init__(self, inner=None):
+        super().__init__()
+        self.inner = inner if inner is not None else logging.Formatter()
+
+    def format(self, record):
+        batch = getattr(record, 'batch', None)
+        if batch is None:
+            return self.inner.format(record)
+        return '\n'.join(self.inner.format(r) for r in batch)
+
+
+def emitBatch(handler, records):
+    """
+    Writes the records that pass a handler's level and filters as one record. The handler
+    needs a BatchFormatter.
+    """
+    records = [r for r in records if r.levelno >= handler.level and handler.filter(r)]
+    if not records:
+        return
+    combined = logging.makeLogRecord({'name': mainLog.name, 'levelno': max(r.levelno for r in records),
+                                      'msg': '', 'batch': records})
+    combined.levelname = logging.getLevelName(combined.levelno)
+    with handler.lock:
+        handler.emit(combined)
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on a bounded queue for a QueueListener to write.
+
+    Overflow policies, used when the queue is full:
+        block: wait for room.
+        drop-debug: drop records below WARNING; wait for room for the rest.
+        count-dropped: drop the record.
+    Dropped records are counted in `dropped` and reported in the log by the listener.
+
+    Parameters:
+        queue (queue.Queue): The bounded queue.
+        overflow (str): One of OVERFLOW_POLICIES.
+    """
+
+    def __init__(self, queue, overflow='block'):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f'Unknown log overflow policy: {overflow}')
+        super().__init__(queue)
+        self.overflow = overflow
+        self.dropped = 0
+        self._droppedLock = threading.Lock()
+
+    def handle(self, record):
+        # No handler lock: the queue is thread-safe, and a producer waiting for room must
+        # not hold up producers whose records would be dropped
+        rv = self.filter(record)
+        if rv:
+            self.emit(record)
+        return rv
+
+    def enqueue(self, record):
+        if self.overflow == 'block' or (self.overflow == 'drop-debug' and record.levelno >= logging.WARNING):
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._droppedLock:
+                self.dropped += 1
+
+
+class BatchingQueueListener:
+    """
+    Writes queued records from its own background thread, up to `batchSize` at a time.
+
+    Parameters:
+        queue (queue.Queue): The queue filled by a BoundedQueueHandler.
+        fileHandler (logging.Handler): Receives each batch in one write; needs a BatchFormatter.
+        handlers: Further handlers, which receive the records one by one.
+        queueHandler (BoundedQueueHandler): Whose dropped records are reported.
+        batchSize (int): Maximum records per write.
+    """
+
+    _STOP = object()
+
+    def __init__(self, queue, fileHandler, *handlers, queueHandler=None, batchSize=256):
+        self.queue = queue
+        self.fileHandler = fileHandler
+        self.handlers = handlers
+        self.queueHandler = queueHandler
+        self.batchSize = batchSize
+        self._reported = 0
+        self._thread = None
+
+    def start(self):
+        """Starts the writer thread."""
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Writes what is queued and stops the writer thread."""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            # The queue is bounded, so wait for room instead of failing when it is full
+            self.queue.put(self._STOP)
+            thread.join()
+
+    def _run(self):
+        q = self.queue
+        while True:
+            batch = [q.get()]
+            while len(batch) < self.batchSize:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = self._STOP in batch
+            records = [r for r in batch if r is not self._STOP]
+            dropped = self.queueHandler.dropped if self.queueHandler is not None else 0
+            if dropped > self._reported:
+                records.append(logging.makeLogRecord({'name': mainLog.name, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                                                      'msg': f'Logging queue full: dropped {dropped - self._reported} records'}))
+                self._reported = dropped
+            self._write(records)
+            for _ in batch:
+                q.task_done()
+            if stopping:
+                return
+
+    def _write(self, records):
+        emitBatch(self.fileHandler, records)
+        for record in records:
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+
+
+class _DeferredHandler(logging.Handler):
+    # Sits on mainLog until the first record, which starts the pipeline and is handed to it
+    def handle(self, record):
+        _ensurePipeline()
+        return _queueHandler.handle(record)
+
+
+_handler = None
+_queueHandler = None
+_listener = None
+_pipelineLock = threading.Lock()
+_deferred = _DeferredHandler()
+
+def _fileHandler():
+    # Forked listener workers write main.log too, so it needs a handler that locks and rotates
+    # across processes. concurrent_log_handler takes a noticeable share of startup, so it is imported here
+    global _handler
+    if _handler is None:
+        import concurrent_log_handler
+        value_setter.ensureDirs()
+        handler = concurrent_log_handler.ConcurrentRotatingFileHandler(value_setter.loggingDir+'main.log', 'a',
+                                                                       maxBytes=value_setter.logMaxBytes,
+                                                                       backupCount=value_setter.logBackupCount)
+        handler.setLevel(logging.INFO)
+        handler.setFormatter(BatchFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')))
+        _handler = handler
+    return _handler
+
+def __getattr__(name):
+    # `handler` (main.log) is opened on first use
+    if name == 'handler':
+        return _fileHandler()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _startPipeline():
+    global _queueHandler, _listener
+    records = queue.Queue(maxsize=value_setter.logQueueSize)
+    queueHandler = BoundedQueueHandler(records, value_setter.logOverflow)
+    listener = BatchingQueueListener(records, _fileHandler(), queueHandler=queueHandler,
+                                     batchSize=value_setter.logBatchSize)
+    for previous in (_deferred, _queueHandler):
+        if previous is not None:
+            mainLog.removeHandler(previous)
+    mainLog.addHandler(queueHandler)
+    _queueHandler, _listener = queueHandler, listener
+    listener.start()
+
+def _ensurePipeline():
+    with _pipelineLock:
+        if _queueHandler is None:
+            _startPipeline()
+            atexit.register(stop)
+
+def _afterFork():
+    global _pipelineLock, _queueHandler, _listener
+    # A forked child has no writer thread and may have copied the queue or lock mid-operation.
+    # Its own pipeline is started by its first record, so children that never log start no thread.
+    _pipelineLock = threading.Lock()
+    if _listener is not None:
+        mainLog.removeHandler(_queueHandler)
+        mainLog.addHandler(_deferred)
+        _queueHandler = _listener = None
+
+def flush():
+    """
+    Waits until every record logged so far has been written.
+    """
+    listener = _listener
+    if listener is not None:
+        listener.queue.join()
+
+def stop():
+    """
+    Writes the queued records and stops the writer thread. Called at exit; records logged
+    afterwards are written directly.
+    """
+    global _listener
+    with _pipelineLock:
+        listener, _listener = _listener, None
+        if listener is None:
+            return
+        mainLog.removeHandler(_queueHandler)
+        mainLog.addHandler(_handler)
+    # The queue handler is detached, so nothing is added behind the sentinel
+    listener.stop()
+    _handler.flush()
+
+def stats():
+    """
+    Returns the logging queue depth, capacity, overflow policy and the number of dropped records.
+    """
+    return {'depth': _queueHandler.queue.qsize() if _queueHandler is not None else 0,
+            'capacity': value_setter.logQueueSize, 'overflow': value_setter.logOverflow,
+            'dropped': _queueHandler.dropped if _queueHandler is not None else 0}
+
+# Nothing is opened until mainLog handles its first record
+mainLog.addHandler(_deferred)
+# Only POSIX can fork
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_afterFork)
@@ -0,0 +1,263 @@
+import sys
+import time
+import atexit
+import threading
+import traceback
+from collections import OrderedDict
+from datetime import datetime
+import value_setter
+import logger as logger
+
+no_log = logger.mainLog
+
+# Distinct messages listed in one digest; the rest are summarized as a count
+_DIGEST_LINES = 20
+# Distinct messages that may wait for the next send; further ones are dropped and counted
+_MAX_PENDING = 1000
+
+
+class NotifyRunSink:
+    """
+    Sends messages through notify.run. notify_run is imported on the first send, so the
+    dependency is only needed when an alert actually goes out.
+
+    Parameters:
+        endpoint (str): The notify.run channel endpoint (default value_setter.notifyEndpoint).
+    """
+
+    def __init__(self, endpoint=None):
+        self.endpoint = endpoint if endpoint is not None else value_setter.notifyEndpoint
+        self._notify = None
+
+    def send(self, message):
+        if self._notify is None:
+            from notify_run import Notify
+            self._notify = Notify(endpoint=self.endpoint)
+        self._notify.send(message)
+
+
+class FileSink:
+    """
+    Appends messages, with a timestamp, to a local file.
+
+    Parameters:
+        path (str): The file to append to.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, message):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}\n")
+
+
+class StdoutSink:
+    """
+    Prints messages to standard output.
+    """
+
+    def send(self, message):
+        print(message, file=sys.stdout, flush=True)
+
+
+class NullSink:
+    """
+    Discards messages.
+    """
+
+    def send(self, message):
+        pass
+
+
+def createSink(spec=None):
+    """
+    Creates a sink from its name.
+
+    Parameters:
+        spec (str): 'notify_run', 'stdout', 'file:<path>' or 'none' (default value_setter.notifySink).
+
+    Returns:
+        An object with a send(message) method.
+    """
+    spec = spec if spec is not None else value_setter.notifySink
+    if spec == 'notify_run':
+        return NotifyRunSink()
+    if spec == 'stdout':
+        return StdoutSink()
+    if spec == 'none':
+        return NullSink()
+    if spec.startswith('file:'):
+        return FileSink(spec[len('file:'):])
+    raise ValueError(f'Unknown notification sink: {spec}')
+
+
+class Outbox:
+    """
+    Delivers alerts from a background thread so callers never wait on the network.
+
+    send() only records the message. Identical messages within `window` seconds are sent
+    once, with a repeat count; messages arriving close together are combined into one
+    digest; and at most one message goes out every `minInterval` seconds.
+
+    Parameters:
+        sink: An object with send(message), or a zero-argument factory returning one. The
+            sink is created on the first delivery (default createSink()).
+        window (float): Deduplication window in seconds (default value_setter.notifyDedupWindow).
+        batchDelay (float): Seconds to wait for more messages before sending (default value_setter.notifyBatchDelay).
+        minInterval (float): Minimum seconds between two sends (default value_setter.notifyMinInterval).
+        clock (callable): Monotonic time source.
+    """
+
+    def __init__(self, sink=None, window=None, batchDelay=None, minInterval=None, clock=time.monotonic):
+        self._sink = sink if sink is not None and not isinstance(sink, type) and hasattr(sink, 'send') else None
+        self._sinkFactory = sink if self._sink is None and sink is not None else createSink
+        self.window = window if window is not None else value_setter.notifyDedupWindow
+        self.batchDelay = batchDelay if batchDelay is not None else value_setter.notifyBatchDelay
+        self.minInterval = minInterval if minInterval is not None else value_setter.notifyMinInterval
+        self.clock = clock
+        self._cond = threading.Condition()
+        # message -> repeat count, for messages waiting to be sent
+        self._pending = OrderedDict()
+        self._firstPending = None
+        # message -> time it was last queued, for deduplication
+        self._seen = {}
+        self._lastSend = None
+        self._thread = None
+        self._stopping = False
+        self._sending = False
+        self._stats = {'received': 0, 'deduplicated': 0, 'dropped': 0, 'sent': 0, 'failed': 0}
+
+    @property
+    def sink(self):
+        """The sink, created on first use."""
+        if self._sink is None:
+            self._sink = self._sinkFactory()
+        return self._sink
+
+    def send(self, message):
+        """
+        Queues an alert. Never blocks on delivery.
+
+        Parameters:
+            message (str): The alert text.
+        """
+        with self._cond:
+            now = self.clock()
+            self._stats['received'] += 1
+            if message in self._pending:
+                self._pending[message] += 1
+                self._stats['deduplicated'] += 1
+                return
+            seen = self._seen.get(message)
+            if seen is not None and now - seen < self.window:
+                self._stats['deduplicated'] += 1
+                return
+            if len(self._pending) >= _MAX_PENDING:
+                self._stats['dropped'] += 1
+                return
+            self._seen[message] = now
+            self._pending[message] = 1
+            if self._firstPending is None:
+                self._firstPending = now
+            if self._thread is None:
+                self._start()
+            self._cond.notify()
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._loop, name='notification-outbox', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _dueAt(self):
+        due = self._firstPending + self.batchDelay
+        if self._lastSend is not None:
+            due = max(due, self._lastSend + self.minInterval)
+        return due
+
+    def _takeDigest(self, now):
+        pending, self._pending = self._pending, OrderedDict()
+        self._firstPending = None
+        self._lastSend = now
+        # Forget messages whose window has passed so _seen stays small
+        self._seen = {m: t for m, t in self._seen.items() if now - t < self.window}
+        return _formatDigest(pending)
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._pending or self.clock() < self._dueAt():
+                    if self._stopping:
+                        return
+                    timeout = None if not self._pending else self._dueAt() - self.clock()
+                    self._cond.wait(timeout)
+                digest = self._takeDigest(self.clock())
+                self._sending = True
+            self._deliver(digest)
+            with self._cond:
+                self._sending = False
+                self._cond.notify_all()
+
+    def _deliver(self, digest):
+        try:
+            self.sink.send(digest)
+        except Exception as e:
+            no_log.error(f'Error sending notification: {e}')
+            no_log.error(traceback.format_exc())
+            outcome = 'failed'
+        else:
+            outcome = 'sent'
+        with self._cond:
+            self._stats[outcome] += 1
+
+    def flush(self):
+        """
+        Sends everything pending now, ignoring the batch delay and rate limit.
+        """
+        with self._cond:
+            while self._sending:
+                self._cond.wait()
+            digest = self._takeDigest(self.clock()) if self._pending else None
+        if digest is not None:
+            self._deliver(digest)
+
+    def stop(self):
+        """
+        Stops the sender thread after sending what is pending.
+        """
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join()
+        self.flush()
+        with self._cond:
+            self._stopping = False
+
+    def stats(self):
+        """
+        Returns delivery counters.
+
+        Returns:
+            dict: received, deduplicated, dropped, sent (digests), failed and pending.
+        """
+        with self._cond:
+            return dict(self._stats, pending=len(self._pending))
+
+
+def _formatDigest(pending):
+    if len(pending) == 1:
+        message, count = next(iter(pending.items()))
+        return message if count == 1 else f'{message} (x{count})'
+    lines = [f'{sum(pending.values())} alerts:']
+    for n, (message, count) in enumerate(pending.items()):
+        if n == _DIGEST_LINES:
+            lines.append(f'...and {len(pending) - n} more')
+            break
+        lines.append(f'- {message}' if count == 1 else f'- {message} (x{count})')
+    return '\n'.join(lines)
+
+
+# Process-wide outbox used for listener alerts
+outbox = Outbox()
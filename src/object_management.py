@@ -1,7 +1,18 @@
+import os
+import json
+import functools
+import logging
 import traceback
 import re
+from concurrent.futures import ThreadPoolExecutor
 import logger as logger
+import value_setter
 import file_management
+import json_stream
+import function_registry
+import conversation_management
+import instrumentation
+from document_cache import thaw
 
 mainLog = logger.mainLog
 
@@ -47,178 +58,531 @@ def makeTextJson(textStr):
         textStr (str): The text string to convert.
 
     Returns:
-        str: The JSON string.
+        str: The JSON string: the text from the first '{' to the last '}', or '' if there is none.
     """
-    while textStr[0] != '{' and len(textStr) > 0:
-        textStr = textStr[1:]
-    while textStr[-1] != '}' and len(textStr) > 0:
-        textStr = textStr[:-1]
-    return textStr
+    start = textStr.find('{')
+    end = textStr.rfind('}')
+    if start < 0 or end < start:
+        return ''
+    return textStr[start:end + 1]
 
-def getValuesFromJson(keys, jsonFilePath):
+_OBJECT_TOKENS = re.compile(r'[{}"]')
+_STRING_TOKENS = re.compile(r'["\\]')
+
+class JsonObjectExtractor:
     """
-    Retrieves values from a JSON file based on the provided keys.
+    Pulls complete top-level JSON objects out of text that arrives in chunks (e.g. streamed model output).
+
+    Text outside objects is ignored. Inside an object, brace depth is tracked while
+    respecting string literals and escapes, so each object is returned as soon as its
+    closing brace arrives. Every character is looked at once, and only the object
+    currently being read is buffered.
 
     Parameters:
-        keys (list): A list of string keys to retrieve values for. Nested keys should be provided as lists.
-        jsonFilePath (str): The path to the JSON file.
+        parse (bool): Return parsed objects (json.loads) instead of their text. Candidates that
+            are not valid JSON are then dropped.
 
-    Returns:
-        tuple: A tuple of values corresponding to the keys. If a key does not exist, the value will be None.
+    Example:
+        extractor = JsonObjectExtractor(parse=True)
+        for chunk in response_stream:
+            for tool_call in extractor.feed(chunk):
+                handle(tool_call)
     """
-    def get_nested_value(data, key_list):
+
+    def __init__(self, parse=False):
+        self.parse = parse
+        self.reset()
+
+    def reset(self):
         """
-        Helper function to retrieve nested values from a dictionary.
+        Discards any partially read object.
         """
-        for key in key_list:
-            if isinstance(data, dict):
-                data = data.get(key, None)
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._parts = []
+
+    @property
+    def pending(self):
+        """True while an object has been opened but not yet closed."""
+        return self._depth > 0
+
+    def feed(self, chunk):
+        """
+        Consumes the next piece of text.
+
+        Parameters:
+            chunk (str): The text received since the last call.
+
+        Returns:
+            list: The objects (text, or parsed with parse=True) completed by this chunk, in order.
+        """
+        completed = []
+        pos = 0
+        start = 0 if self._depth else None
+        size = len(chunk)
+        while pos < size:
+            if self._depth == 0:
+                pos = chunk.find('{', pos)
+                if pos < 0:
+                    break
+                start = pos
+                self._depth = 1
+                pos += 1
+            elif self._escape:
+                self._escape = False
+                pos += 1
+            elif self._in_string:
+                m = _STRING_TOKENS.search(chunk, pos)
+                if m is None:
+                    break
+                pos = m.end()
+                if m.group() == '\\':
+                    self._escape = True
+                else:
+                    self._in_string = False
             else:
-                return None
-        return data
+                m = _OBJECT_TOKENS.search(chunk, pos)
+                if m is None:
+                    break
+                pos = m.end()
+                token = m.group()
+                if token == '"':
+                    self._in_string = True
+                elif token == '{':
+                    self._depth += 1
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        self._parts.append(chunk[start:pos])
+                        text = ''.join(self._parts)
+                        self._parts = []
+                        start = None
+                        self._emit(text, completed)
+        if self._depth:
+            self._parts.append(chunk[start:])
+        return completed
 
-    # Load the JSON file
-    jsonData = file_management.getJsonDict(jsonFilePath)
-    
-    # Retrieve values for the keys, set to None if key does not exist
-    values = tuple(get_nested_value(jsonData, key) if isinstance(key, list) else jsonData.get(key, None) for key in keys)
-    
-    return values
+    def _emit(self, text, completed):
+        if not self.parse:
+            completed.append(text)
+            return
+        try:
+            completed.append(json.loads(text))
+        except ValueError:
+            mainLog.debug(f"JsonObjectExtractor: skipping text that is not valid JSON ({len(text)} chars)")
 
-def stringFormatter(string: str) -> str:
+class KeyPathExtractor:
     """
-    Replace placeholders in the input string:
-      - {functionName} -> call a zero-argument function with that name from globals() and substitute its return value
-      - [LOOKUP]        -> lookup value from globals() or JSON files with special prefix DICT.<file>.<key1>.<key2>...
-    
-    Behavior and improvements:
-      - Uses regular expressions with callback functions for efficient single-pass replacements.
-      - Performs iterative passes (up to max_passes) to resolve placeholders introduced by replacements,
-        preventing infinite loops by bounding iterations.
-      - Robustly handles missing functions/values and logs warnings/errors to mainLog.
-      - Supports nested dict lookups in JSON files and nested attribute/key access for globals variables.
-      - Normalizes replacement values to strings and strips newlines/tabs.
+    Extracts a fixed list of key paths from many JSON documents.
+
+    The key list is compiled once into a prefix tree, so paths sharing a prefix
+    (e.g. ['user', 'name'] and ['user', 'email']) walk that prefix only once per document.
+
+    Parameters:
+        keys (list): String keys and/or nested key paths given as lists, as for getValuesFromJson.
+
+    Example:
+        extractor = KeyPathExtractor(['status', ['user', 'name'], ['user', 'email']])
+        extractor.extract(document)            # -> ('ok', 'Ann', None)
+        extractor.extract_many(paths, workers=4)
     """
 
-    max_passes = 5  # limit to avoid infinite recursion loops
-    pass_num = 0
+    def __init__(self, keys):
+        self.keys = list(keys)
+        self.paths = [tuple(key) if isinstance(key, list) else (key,) for key in self.keys]
+        # Tree nodes are (children, result slots); walked depth-first by extract()
+        self._root = ({}, [])
+        for slot, path in enumerate(self.paths):
+            node = self._root
+            for key in path:
+                node = node[0].setdefault(key, ({}, []))
+            node[1].append(slot)
 
-    if not isinstance(string, str):
-        mainLog.debug("stringFormatter received non-str input; converting to str")
-        string = str(string)
+    def extract(self, document):
+        """
+        Returns the values at the key paths of one parsed document.
 
-    func_pattern = re.compile(r'\{([^{}]+)\}')
-    lookup_pattern = re.compile(r'\[([^\[\]]+)\]')
-
-    def _format_value(val):
-        """Normalize various types to a safe string representation."""
-        if val is None:
-            return ''
-        if isinstance(val, bool):
-            return str(val).lower()
-        if isinstance(val, (int, float)):
-            return str(val)
-        if isinstance(val, list):
-            return ', '.join(str(x) for x in val)
-        if isinstance(val, dict):
-            return ', '.join(f"{k}: {v}" for k, v in val.items())
-        # other types -> string, sanitize whitespace/newlines/tabs
-        s = str(val)
-        return s.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
+        Parameters:
+            document (dict): The document.
 
-    def _replace_function(match):
-        name = match.group(1).strip()
-        func_name = name.split('(')[0].strip()
-        func = globals().get(func_name)
+        Returns:
+            tuple: One value per key; None where the path does not exist or runs through a non-object.
+        """
+        values = [None] * len(self.paths)
+        stack = [(self._root, document)]
+        while stack:
+            (children, slots), value = stack.pop()
+            for slot in slots:
+                values[slot] = value
+            if children and isinstance(value, dict):
+                for key, child in children.items():
+                    if key in value:
+                        stack.append((child, value[key]))
+        return tuple(values)
+
+    def extract_file(self, jsonFilePath, stream=None, use_mmap=False):
+        """
+        Returns the values at the key paths of a JSON file. See getValuesFromJson for the arguments.
+
+        Returns:
+            tuple: One private (mutable) value per key.
+        """
+        if stream is not False:
+            streamed = self._stream(jsonFilePath, stream, use_mmap)
+            if streamed is not None:
+                return streamed
+        # Shared cached copy of the document; only the extracted values are copied
+        return tuple(thaw(value) for value in self.extract(file_management.getJsonDict(jsonFilePath, readonly=True)))
+
+    def extract_many(self, items, workers=None):
+        """
+        Extracts the key paths from several documents.
+
+        Parameters:
+            items (iterable): JSON file paths (as for getJsonDict) and/or parsed documents.
+            workers (int): Process files concurrently on a thread pool of this size.
+
+        Returns:
+            list: One tuple per item, in input order.
+        """
+        def _one(item):
+            return self.extract_file(item) if isinstance(item, str) else self.extract(item)
+
+        items = list(items)
+        if not workers or workers <= 1 or len(items) <= 1:
+            return [_one(item) for item in items]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_one, items))
+
+    def _stream(self, jsonFilePath, stream, use_mmap):
+        """
+        Streaming variant of extract_file. Returns None when the file must be parsed normally:
+        it is not a local file, is below the size threshold (unless stream=True), or has pending writes or patches.
+        """
+        filename = file_management.storage.localPath(jsonFilePath)
+        if filename is None:
+            return None
+        try:
+            size = os.path.getsize(filename)
+        except OSError:
+            return None
+        if not stream and size < value_setter.streamThresholdBytes:
+            return None
+        if os.path.exists(filename + '.journal'):
+            return None
+        if file_management.write_behind is not None and file_management.write_behind.pending(file_management.storage.key(jsonFilePath)) is not None:
+            return None
+        found = json_stream.extract_paths(filename, self.paths, use_mmap=use_mmap)
+        return tuple(found[path] for path in self.paths)
+
+@functools.lru_cache(maxsize=256)
+def _cachedExtractor(spec):
+    # spec holds (isPath, key) pairs, so a literal tuple key is not mistaken for a key path
+    return KeyPathExtractor([list(key) if isPath else key for isPath, key in spec])
+
+def _nestedValue(data, key_list):
+    for key in key_list:
+        if isinstance(data, dict):
+            data = data.get(key, None)
+        else:
+            return None
+    return data
+
+def getValuesFromJson(keys, jsonFilePath, stream=None, use_mmap=False):
+    """
+    Retrieves values from a JSON file based on the provided keys.
+
+    Parameters:
+        keys (list): A list of string keys to retrieve values for. Nested keys should be provided as lists.
+        jsonFilePath (str): The path to the JSON file.
+        stream (bool): Scan the file incrementally, decoding only the requested values
+            (see json_stream.extract_paths). Defaults to streaming files of at
+            least value_setter.streamThresholdBytes.
+        use_mmap (bool): When streaming, memory-map the file instead of reading it in chunks.
+
+    Returns:
+        tuple: A tuple of values corresponding to the keys. If a key does not exist, the value will be None.
+    """
+    keys = list(keys)
+    try:
+        extractor = _cachedExtractor(tuple((True, tuple(key)) if isinstance(key, list) else (False, key) for key in keys))
+    except TypeError:
+        # Unhashable keys can be neither cached nor put in the prefix tree; look them up one by one
+        jsonData = file_management.getJsonDict(jsonFilePath, readonly=True)
+        return tuple(thaw(_nestedValue(jsonData, key) if isinstance(key, list) else jsonData.get(key, None)) for key in keys)
+    return extractor.extract_file(jsonFilePath, stream, use_mmap)
+
+# Placeholder syntax understood by stringFormatter
+_FUNC_PATTERN = re.compile(r'\{([^{}]+)\}')
+_LOOKUP_PATTERN = re.compile(r'\[([^\[\]]+)\]')
+_MAX_PASSES = 5  # limit to avoid infinite recursion loops
+
+# Module names placeholders may resolve ({func} calls and [lookup] roots): those this module
+# had before its newer imports, so e.g. [os.sep] or [value_setter.mainDir] still render ''.
+# Further functions are made available through function_registry.
+_TEMPLATE_NAMES = frozenset({
+    '__name__', '__doc__', '__package__', '__loader__', '__spec__', '__file__', '__cached__', '__builtins__',
+    'traceback', 're', 'logger', 'file_management', 'mainLog',
+    'make_list_comma_separated', 'list2csv', 'makeTextJson', 'getValuesFromJson',
+    'stringFormatter', 'executeFunctionInString',
+})
+
+def _template_global(name):
+    return globals().get(name) if name in _TEMPLATE_NAMES else None
+
+# Timestamps are shared by every render within the same second
+function_registry.register('convo_timestamp', conversation_management.convo_timestamp, cache='ttl', ttl=1.0)
+
+def _format_value(val):
+    """Normalize various types to a safe string representation."""
+    if val is None:
+        return ''
+    if isinstance(val, bool):
+        return str(val).lower()
+    if isinstance(val, (int, float)):
+        return str(val)
+    if isinstance(val, list):
+        return ', '.join(str(x) for x in val)
+    if isinstance(val, dict):
+        return ', '.join(f"{k}: {v}" for k, v in val.items())
+    # other types -> string, sanitize whitespace/newlines/tabs
+    s = str(val)
+    return s.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
+
+def _call_placeholder(name, placeholder, calls=None):
+    """
+    Resolve {name}; returns the original placeholder text if the function is missing or fails.
+
+    Functions registered in function_registry are evaluated according to their caching policy,
+    with `calls` as the per-render memo; anything else is looked up among _TEMPLATE_NAMES and called.
+    """
+    func_name = name.split('(')[0].strip()
+    entry = function_registry.registry.get(func_name)
+    if entry is None:
+        func = _template_global(func_name)
         if not callable(func):
             mainLog.warning(f"stringFormatter: function '{func_name}' not found or not callable")
-            return match.group(0)  # leave the original placeholder intact
-        try:
-            result = func()
-            formatted = _format_value(result)
+            return placeholder  # leave the original placeholder intact
+    try:
+        result = function_registry.registry.call(entry, calls) if entry is not None else func()
+        formatted = _format_value(result)
+        if mainLog.isEnabledFor(logging.DEBUG):
             mainLog.debug(f"stringFormatter: replaced function {{{name}}} -> '{formatted}'")
-            return formatted
-        except Exception as e:
-            mainLog.error(f"stringFormatter: error calling function '{func_name}': {e}")
-            mainLog.error(traceback.format_exc())
-            return match.group(0)  # safe fallback
+        return formatted
+    except Exception as e:
+        mainLog.error(f"stringFormatter: error calling function '{func_name}': {e}")
+        mainLog.error(traceback.format_exc())
+        return placeholder  # safe fallback
 
-    def _resolve_dict_lookup(dict_name: str, keys):
-        """Load a JSON file and traverse nested keys."""
+def _resolve_dict_lookup(dict_name: str, keys, documents=None):
+    """Load a JSON file and traverse nested keys. `documents` memoizes loaded files within one render."""
+    jsonData = documents.get(dict_name) if documents is not None else None
+    if jsonData is None:
         try:
-            jsonData = file_management.getJsonDict(f"{dict_name}.json")
+            jsonData = file_management.getJsonDict(f"{dict_name}.json", readonly=True)
         except Exception as e:
             mainLog.error(f"stringFormatter: error loading JSON '{dict_name}.json': {e}")
             return None
-        data = jsonData
-        for k in keys:
-            if isinstance(data, dict):
-                data = data.get(k, None)
-            else:
-                return None
-        return data
+        if documents is not None:
+            documents[dict_name] = jsonData
+    data = jsonData
+    for k in keys:
+        if isinstance(data, dict):
+            data = data.get(k, None)
+        else:
+            return None
+    return data
 
-    def _resolve_global_lookup(parts):
-        """Resolve nested lookups in globals (dict keys or attributes)."""
-        obj = globals().get(parts[0])
+def _resolve_global_lookup(parts):
+    """Resolve nested lookups in module globals (dict keys or attributes), see _TEMPLATE_NAMES."""
+    obj = _template_global(parts[0])
+    if obj is None:
+        return None
+    for p in parts[1:]:
+        if isinstance(obj, dict):
+            obj = obj.get(p, None)
+        else:
+            # try attribute access
+            obj = getattr(obj, p, None)
         if obj is None:
             return None
-        for p in parts[1:]:
-            if isinstance(obj, dict):
-                obj = obj.get(p, None)
-            else:
-                # try attribute access
-                obj = getattr(obj, p, None)
-            if obj is None:
-                return None
-        return obj
-
-    def _replace_lookup(match):
-        content = match.group(1).strip()
-        try:
-            if content.startswith('DICT.'):
-                # DICT.filename.key1.key2...
-                rest = content[len('DICT.'):].strip()
-                parts = rest.split('.')
-                dict_name = parts[0]
-                keys = parts[1:] if len(parts) > 1 else []
-                val = _resolve_dict_lookup(dict_name, keys)
-            else:
-                parts = content.split('.')
-                val = _resolve_global_lookup(parts)
-            formatted = _format_value(val)
+    return obj
+
+def _parse_lookup(content):
+    """Split lookup text into ('DICT', filename, keys) or ('GLOBAL', parts)."""
+    if content.startswith('DICT.'):
+        # DICT.filename.key1.key2...
+        rest = content[len('DICT.'):].strip()
+        parts = rest.split('.')
+        return ('DICT', parts[0], parts[1:] if len(parts) > 1 else [])
+    return ('GLOBAL', content.split('.'))
+
+def _lookup_placeholder(content, placeholder, parsed=None, documents=None):
+    """Resolve [content]; returns the original placeholder text if resolution fails."""
+    try:
+        if parsed is None:
+            parsed = _parse_lookup(content)
+        if parsed[0] == 'DICT':
+            val = _resolve_dict_lookup(parsed[1], parsed[2], documents)
+        else:
+            val = _resolve_global_lookup(parsed[1])
+        formatted = _format_value(val)
+        if mainLog.isEnabledFor(logging.DEBUG):
             mainLog.debug(f"stringFormatter: replaced lookup [{content}] -> '{formatted}'")
-            return formatted
-        except Exception as e:
-            mainLog.error(f"stringFormatter: error resolving lookup '[{content}]': {e}")
-            mainLog.error(traceback.format_exc())
-            return match.group(0)  # safe fallback
+        return formatted
+    except Exception as e:
+        mainLog.error(f"stringFormatter: error resolving lookup '[{content}]': {e}")
+        mainLog.error(traceback.format_exc())
+        return placeholder  # safe fallback
+
+def _replace_lookup(match):
+    return _lookup_placeholder(match.group(1).strip(), match.group(0))
+
+def _format_passes(string, pass_num, previous, calls=None):
+    """The iterative multi-pass replacement of stringFormatter, resumable after `pass_num` passes."""
+    if calls is None:
+        calls = {}
+
+    def _replace_function(match):
+        return _call_placeholder(match.group(1).strip(), match.group(0), calls)
 
     # Iteratively replace until stable or max_passes reached
-    previous = None
-    while pass_num < max_passes and string != previous:
+    while pass_num < _MAX_PASSES and string != previous:
         previous = string
-        # Replace function placeholders
-        try:
-            string = func_pattern.sub(_replace_function, string)
-        except Exception as e:
-            mainLog.error(f"stringFormatter: error during function replacements: {e}")
-            mainLog.error(traceback.format_exc())
-            break
-        # Replace lookup placeholders
-        try:
-            string = lookup_pattern.sub(_replace_lookup, string)
-        except Exception as e:
-            mainLog.error(f"stringFormatter: error during lookup replacements: {e}")
-            mainLog.error(traceback.format_exc())
-            break
+        with instrumentation.span('format.pass'):
+            # Replace function placeholders
+            try:
+                string = _FUNC_PATTERN.sub(_replace_function, string)
+            except Exception as e:
+                mainLog.error(f"stringFormatter: error during function replacements: {e}")
+                mainLog.error(traceback.format_exc())
+                break
+            # Replace lookup placeholders
+            try:
+                string = _LOOKUP_PATTERN.sub(_replace_lookup, string)
+            except Exception as e:
+                mainLog.error(f"stringFormatter: error during lookup replacements: {e}")
+                mainLog.error(traceback.format_exc())
+                break
         pass_num += 1
 
-    if pass_num == max_passes:
+    if pass_num == _MAX_PASSES:
         mainLog.warning("stringFormatter: maximum passes reached; result may still contain unresolved placeholders")
 
     return string
 
+_LITERAL, _FUNCTION, _LOOKUP = 0, 1, 2
+
+class CompiledTemplate:
+    """
+    A stringFormatter template parsed once into literal, {func} and [lookup] segments.
+
+    render() evaluates every placeholder in a single pass over the segment list and
+    returns exactly what stringFormatter's regex passes would. Only when a substituted
+    value itself contains placeholder syntax does it hand over to the multi-pass loop.
+    """
+
+    __slots__ = ('source', 'segments', 'lookups_precompiled')
+
+    def __init__(self, source):
+        self.source = source
+        segments = []
+        funcs = list(_FUNC_PATTERN.finditer(source))
+        # Lookups are matched after function substitution. They can be pre-split only if no
+        # function placeholder contains brackets or sits inside a lookup.
+        masked = source
+        precompiled = True
+        for m in funcs:
+            if '[' in m.group(0) or ']' in m.group(0):
+                precompiled = False
+            masked = masked[:m.start()] + '\0' * (m.end() - m.start()) + masked[m.end():]
+        lookups = list(_LOOKUP_PATTERN.finditer(masked)) if precompiled else []
+        if any('\0' in m.group(0) for m in lookups):
+            precompiled = False
+            lookups = []
+        spans = sorted([(m.start(), m.end(), _FUNCTION, m) for m in funcs] +
+                       [(m.start(), m.end(), _LOOKUP, m) for m in lookups], key=lambda span: span[0])
+        pos = 0
+        for start, end, kind, m in spans:
+            if start > pos:
+                segments.append((_LITERAL, source[pos:start], None))
+            raw = source[start:end]
+            content = m.group(1).strip()
+            segments.append((kind, raw, content if kind == _FUNCTION else (content, _parse_lookup(content))))
+            pos = end
+        if pos < len(source):
+            segments.append((_LITERAL, source[pos:], None))
+        self.segments = tuple(segments)
+        self.lookups_precompiled = precompiled
+
+    def render(self) -> str:
+        """
+        Substitutes every placeholder.
+
+        Returns:
+            str: The same result stringFormatter(self.source) produces.
+        """
+        segments = self.segments
+        values = [raw if kind != _FUNCTION else None for kind, raw, _ in segments]
+        bracketed = False
+        calls = {}
+        # Functions first, then lookups, in the same order as a stringFormatter pass
+        for i, (kind, raw, arg) in enumerate(segments):
+            if kind == _FUNCTION:
+                value = _call_placeholder(arg, raw, calls)
+                if '[' in value or ']' in value:
+                    bracketed = True
+                values[i] = value
+        if self.lookups_precompiled and not bracketed:
+            documents = {}
+            for i, (kind, raw, arg) in enumerate(segments):
+                if kind == _LOOKUP:
+                    values[i] = _lookup_placeholder(arg[0], raw, arg[1], documents)
+            string = ''.join(values)
+        else:
+            # A substituted value may form new lookups with its neighbours; match them on the real text
+            string = _LOOKUP_PATTERN.sub(_replace_lookup, ''.join(values))
+        if string == self.source or (_FUNC_PATTERN.search(string) is None and _LOOKUP_PATTERN.search(string) is None):
+            return string
+        return _format_passes(string, 1, self.source, calls)
+
+@functools.lru_cache(maxsize=value_setter.templateCacheSize)
+def compile_template(template: str) -> CompiledTemplate:
+    """
+    Parses a stringFormatter template once; results are kept in a bounded LRU keyed by the template text.
+
+    Parameters:
+        template (str): The template.
+
+    Returns:
+        CompiledTemplate: The parsed template. Call render() for the formatted string.
+    """
+    return CompiledTemplate(template)
+
+@instrumentation.timed('format.stringFormatter')
+def stringFormatter(string: str) -> str:
+    """
+    Replace placeholders in the input string:
+      - {functionName} -> call a zero-argument function registered in function_registry (or, failing that,
+                          one of this module's functions) and substitute its return value
+      - [LOOKUP]        -> lookup value from module globals or JSON files with special prefix DICT.<file>.<key1>.<key2>...
+    
+    Behavior and improvements:
+      - Templates are parsed once (compile_template, LRU cached) and rendered in a single pass.
+      - Registered functions follow their caching policy; a function repeated within one render is evaluated once.
+      - Performs iterative passes (up to max_passes) to resolve placeholders introduced by replacements,
+        preventing infinite loops by bounding iterations.
+      - Robustly handles missing functions/values and logs warnings/errors to mainLog.
+      - Supports nested dict lookups in JSON files and nested attribute/key access for globals variables.
+      - Normalizes replacement values to strings and strips newlines/tabs.
+    """
+    if not isinstance(string, str):
+        mainLog.debug("stringFormatter received non-str input; converting to str")
+        string = str(string)
+
+    return compile_template(string).render()
+
 def executeFunctionInString(string):
     """
     This function replaces placeholders in the format {functionName} within the input string
@@ -230,15 +594,17 @@ def executeFunctionInString(string):
     Returns:
     str: The string with placeholders replaced by function results.
     """
+    calls = {}
     while '{' in string and '}' in string:
         try:
             # Extract the function name from the placeholder
             function_name = string.split('{')[1].split('}')[0]
-            # Get the function object from the global scope
-            function_result = globals().get(function_name.split('(')[0])
-            if function_result:
+            # Registered functions first, then the global scope
+            entry = function_registry.registry.get(function_name.split('(')[0])
+            function_result = _template_global(function_name.split('(')[0]) if entry is None else None
+            if entry is not None or function_result:
                 # Call the function and get the result
-                function_string = function_result()
+                function_string = function_registry.registry.call(entry, calls) if entry is not None else function_result()
                 # Replace the placeholder with the function result
                 string = string.replace(f'{{{function_name}}}', function_string)
             else:
@@ -1,5 +1,251 @@
+import functools
+from array import array
 from datetime import datetime
 
+MINUTES_PER_DAY = 24 * 60
+
+def _legacyAmpm(hour, minute):
+    ampm = 'am'
+    if hour >= 12:
+        if hour == 24:
+            ampm = 'am'
+        else:
+            ampm = 'pm'
+    if hour > 12:
+        hour -= 12
+    return str(hour) + ':' + str(minute).zfill(2) + ampm
+
+# Formatted forms of every minute of the day, indexed by minute-of-day
+_FORMAT_24 = tuple(f"{m // 60}:{str(m % 60).zfill(2)}" for m in range(MINUTES_PER_DAY))
+_FORMAT_AMPM = tuple(_legacyAmpm(m // 60, m % 60) for m in range(MINUTES_PER_DAY))
+
+# "H:MM" and "HH:MM" spellings of every minute of the day; anything else is parsed with split/int
+_PARSED = {}
+for _m in range(MINUTES_PER_DAY):
+    _PARSED[_FORMAT_24[_m]] = _m
+    _PARSED[f"{_m // 60:02d}:{_m % 60:02d}"] = _m
+del _m
+
+def _parseMinute(time):
+    """Returns minutes after midnight (wrapped) for "HH:MM", an int or a MinuteOfDay."""
+    if isinstance(time, MinuteOfDay):
+        return time.value
+    if isinstance(time, int):
+        return time % MINUTES_PER_DAY
+    m = _PARSED.get(time)
+    if m is None:
+        hour, mins = map(int, time.split(':'))
+        m = (hour * 60 + mins) % MINUTES_PER_DAY
+    return m
+
+def _nowMinute():
+    now = datetime.now()
+    return now.hour * 60 + now.minute
+
+
+@functools.total_ordering
+class MinuteOfDay:
+    """
+    A time of day with minute resolution, stored as minutes after midnight (0-1439).
+
+    There is exactly one instance per minute, so creating, parsing and comparing values
+    never allocates, and formatting is a table lookup. Arithmetic wraps around midnight
+    the way earlierTime / laterTime do.
+
+    Example:
+        t = MinuteOfDay.parse("23:50") + 20   # MinuteOfDay('0:10')
+        t.ampm()                              # '0:10am', as ampmTime("0:10")
+    """
+
+    __slots__ = ('value',)
+
+    def __new__(cls, value=0):
+        return _INSTANCES[value % MINUTES_PER_DAY]
+
+    @classmethod
+    def _make(cls, value):
+        obj = object.__new__(cls)
+        object.__setattr__(obj, 'value', value)
+        return obj
+
+    def __setattr__(self, name, value):
+        raise AttributeError('MinuteOfDay is immutable')
+
+    def __reduce__(self):
+        return (MinuteOfDay, (self.value,))
+
+    @classmethod
+    def parse(cls, time):
+        """
+        Parses "HH:MM" (hours may be unpadded; hour 24 and minute overflow wrap around).
+
+        Parameters:
+            time (str | int | MinuteOfDay): The time, or minutes after midnight.
+
+        Returns:
+            MinuteOfDay: The time of day.
+        """
+        return _INSTANCES[_parseMinute(time)]
+
+    @classmethod
+    def of(cls, hour, minute=0):
+        """Returns the MinuteOfDay for `hour`:`minute`."""
+        return _INSTANCES[(hour * 60 + minute) % MINUTES_PER_DAY]
+
+    @classmethod
+    def now(cls, clock=datetime.now):
+        """Returns the current time of day according to `clock`."""
+        now = clock()
+        return _INSTANCES[now.hour * 60 + now.minute]
+
+    @property
+    def hour(self):
+        return self.value // 60
+
+    @property
+    def minute(self):
+        return self.value % 60
+
+    def shift(self, minutes):
+        """Returns the time `minutes` later (earlier if negative), wrapping around midnight."""
+        return _INSTANCES[(self.value + minutes) % MINUTES_PER_DAY]
+
+    def __add__(self, minutes):
+        if isinstance(minutes, int):
+            return _INSTANCES[(self.value + minutes) % MINUTES_PER_DAY]
+        return NotImplemented
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        """`t - 15` is 15 minutes earlier; `a - b` is the minutes from b forward to a (0-1439)."""
+        if isinstance(other, MinuteOfDay):
+            return (self.value - other.value) % MINUTES_PER_DAY
+        if isinstance(other, int):
+            return _INSTANCES[(self.value - other) % MINUTES_PER_DAY]
+        return NotImplemented
+
+    def passed(self, now=None):
+        """
+        Checks whether this time has been reached today, as TimePassedYet does.
+
+        Parameters:
+            now (MinuteOfDay): The current time of day (default MinuteOfDay.now()).
+
+        Returns:
+            bool: True if the time has passed (or is the current minute), False otherwise.
+        """
+        return self.value <= (_nowMinute() if now is None else now.value)
+
+    def format(self):
+        """Returns the time as "H:MM" (24-hour, hour unpadded), like earlierTime / laterTime."""
+        return _FORMAT_24[self.value]
+
+    def ampm(self):
+        """Returns the time as ampmTime would format it, e.g. "2:30pm"."""
+        return _FORMAT_AMPM[self.value]
+
+    def __str__(self):
+        return _FORMAT_24[self.value]
+
+    def __repr__(self):
+        return f"MinuteOfDay('{_FORMAT_24[self.value]}')"
+
+    def __int__(self):
+        return self.value
+
+    __index__ = __int__
+
+    def __eq__(self, other):
+        if isinstance(other, MinuteOfDay):
+            return self.value == other.value
+        return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, MinuteOfDay):
+            return self.value < other.value
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.value)
+
+_INSTANCES = tuple(MinuteOfDay._make(m) for m in range(MINUTES_PER_DAY))
+
+
+class MinuteOfDayArray:
+    """
+    Many times of day packed into an array of unsigned shorts, with bulk operations.
+
+    Every operation is one pass over the array using the precomputed tables, which is far
+    cheaper than calling earlierTime / ampmTime / TimePassedYet once per time.
+
+    Parameters:
+        times (iterable): "HH:MM" strings, ints (minutes after midnight) or MinuteOfDay values.
+    """
+
+    __slots__ = ('values',)
+
+    def __init__(self, times=()):
+        self.values = times if isinstance(times, array) and times.typecode == 'H' else array('H', map(_parseMinute, times))
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return map(_INSTANCES.__getitem__, self.values)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return MinuteOfDayArray(self.values[index])
+        return _INSTANCES[self.values[index]]
+
+    def __repr__(self):
+        return f'MinuteOfDayArray({self.format()!r})'
+
+    def shift(self, minutes):
+        """
+        Returns every time shifted by `minutes` (negative for earlier), wrapping around midnight.
+
+        Returns:
+            MinuteOfDayArray: The shifted times.
+        """
+        n = minutes % MINUTES_PER_DAY
+        rotated = list(range(n, MINUTES_PER_DAY)) + list(range(n))
+        return MinuteOfDayArray(array('H', map(rotated.__getitem__, self.values)))
+
+    def passed(self, now=None):
+        """
+        Checks every time against the current time of day, as TimePassedYet does.
+
+        Parameters:
+            now (MinuteOfDay): The current time of day (default MinuteOfDay.now()).
+
+        Returns:
+            list: One bool per time.
+        """
+        current = _nowMinute() if now is None else now.value
+        return list(map(current.__ge__, self.values))
+
+    def format(self):
+        """Returns every time as "H:MM" (24-hour)."""
+        return list(map(_FORMAT_24.__getitem__, self.values))
+
+    def ampm(self):
+        """Returns every time formatted as ampmTime would."""
+        return list(map(_FORMAT_AMPM.__getitem__, self.values))
+
+
+def _shiftTime(curtime, mins):
+    m = _PARSED.get(curtime)
+    if m is None:
+        # Split the input time string into hours and minutes
+        hour, minute = map(int, curtime.split(':'))
+        m = hour * 60 + minute
+    if isinstance(mins, int):
+        return _FORMAT_24[(m + mins) % MINUTES_PER_DAY]
+    total_mins = (m + mins) % (24 * 60)
+    return f"{total_mins // 60}:{str(total_mins % 60).zfill(2)}"
+
 def earlierTime(curtime: str, earlierMins: int) -> str:
     """
     Calculates the time that is a specified number of minutes earlier than the given time,
@@ -15,22 +261,9 @@ def earlierTime(curtime: str, earlierMins: int) -> str:
     Notes:
         - If the subtraction goes past midnight, the time wraps around to the previous day.
         - Input is assumed to be valid and in correct format.
+        - Use MinuteOfDay to chain calculations without going through strings.
     """
-    # Split the input time string into hours and minutes
-    hour, mins = map(int, curtime.split(':'))
-
-    # Convert the current time to total minutes
-    total_mins = hour * 60 + mins
-
-    # Subtract the specified number of minutes and wrap around 24 hours if needed
-    total_mins = (total_mins - earlierMins) % (24 * 60)
-
-    # Calculate the new hour and minute values
-    new_hour = total_mins // 60
-    new_min = total_mins % 60
-
-    # Return the formatted time string
-    return f"{new_hour}:{str(new_min).zfill(2)}"
+    return _shiftTime(curtime, -earlierMins)
 
 def laterTime(curtime: str, laterMins: int) -> str:
     """
@@ -47,22 +280,9 @@ def laterTime(curtime: str, laterMins: int) -> str:
     Notes:
         - If the addition goes past midnight, the time wraps around to the next day.
         - Input is assumed to be valid and in correct format.
+        - Use MinuteOfDay to chain calculations without going through strings.
     """
-    # Split the input time string into hours and minutes
-    hour, mins = map(int, curtime.split(':'))
-
-    # Convert the current time to total minutes
-    total_mins = hour * 60 + mins
-
-    # Add the specified number of minutes and wrap around 24 hours if needed
-    total_mins = (total_mins + laterMins) % (24 * 60)
-
-    # Calculate the new hour and minute values
-    new_hour = total_mins // 60
-    new_min = total_mins % 60
-
-    # Return the formatted time string
-    return f"{new_hour}:{str(new_min).zfill(2)}"
+    return _shiftTime(curtime, laterMins)
 
 def ampmTime(militaryTime):
     """
@@ -74,17 +294,12 @@ def ampmTime(militaryTime):
     Returns:
         str: The time in AM/PM format.
     """
-    hour = int(militaryTime.split(':')[0])
-    minute = int(militaryTime.split(':')[1])
-    ampm = 'am'
-    if hour >= 12:
-        if hour == 24:
-            ampm = 'am'
-        else:
-            ampm = 'pm'
-    if hour > 12:
-        hour -= 12
-    return str(hour) + ':' + str(minute).zfill(2) + ampm
+    m = _PARSED.get(militaryTime)
+    if m is not None:
+        return _FORMAT_AMPM[m]
+    # Hour 24, out-of-range minutes and "HH:MM:SS" keep their historical formatting
+    parts = militaryTime.split(':')
+    return _legacyAmpm(int(parts[0]), int(parts[1]))
 
 def TimePassedYet(timesrch):
     """
@@ -96,6 +311,9 @@ def TimePassedYet(timesrch):
     Returns:
         bool: True if the time has passed, False otherwise.
     """
+    m = _PARSED.get(timesrch)
+    if m is not None:
+        return m <= _nowMinute()
     curtime = datetime.now()
     TimePassed = False
     if int(timesrch.split(':')[0]) < int(curtime.hour):
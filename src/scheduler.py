@@ -0,0 +1,277 @@
+import heapq
+import itertools
+import threading
+import traceback
+from datetime import datetime, timedelta, time as dtime
+from concurrent.futures import ThreadPoolExecutor
+import value_setter
+import logger as logger
+from schedule_management import MinuteOfDay, MINUTES_PER_DAY
+
+sc_log = logger.mainLog
+
+DAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+WEEKDAYS = frozenset(range(5))
+
+# Upper bound on one sleep, so wall-clock adjustments (DST, NTP) are noticed
+_MAX_WAIT = 60.0
+
+
+def _weekdays(days):
+    """
+    Converts day names ("Monday") or numbers (0 = Monday) to a frozenset of weekday numbers.
+    """
+    result = set()
+    for day in days:
+        result.add(day if isinstance(day, int) else DAY_NAMES.index(day.capitalize()))
+    return frozenset(result)
+
+
+class Job:
+    """
+    A scheduled callback. Returned by Scheduler.once / daily / on_days; pass it to Scheduler.cancel.
+
+    Attributes:
+        time (str): The firing time in "HH:MM" format, offset applied.
+        next_run (datetime): The next deadline, or None once a one-shot job fired or the job was cancelled.
+    """
+
+    __slots__ = ('id', 'name', 'minute', 'dayShift', 'days', 'repeat', 'callback', 'args', 'kwargs',
+                 'next_run', 'cancelled', 'time')
+
+    def __init__(self, id, name, at, offset, days, repeat, callback, args, kwargs):
+        base = MinuteOfDay.parse(at)
+        total = base.value + offset
+        self.id = id
+        self.name = name or getattr(callback, '__name__', repr(callback))
+        # Offsets follow earlierTime / laterTime: the clock time wraps around midnight. For
+        # day-of-week rules the shifted job keeps the base day, e.g. Monday 00:10 - 20 minutes
+        # fires at 23:50 on Sunday.
+        self.minute = total % MINUTES_PER_DAY
+        self.dayShift = total // MINUTES_PER_DAY
+        self.days = days
+        self.repeat = repeat
+        self.callback = callback
+        self.args = args
+        self.kwargs = kwargs
+        self.next_run = None
+        self.cancelled = False
+        self.time = (base + offset).format()
+
+    def _next(self, after):
+        """Returns the first deadline strictly after `after` that matches the job's rule."""
+        when = dtime(self.minute // 60, self.minute % 60)
+        day = after.date()
+        for _ in range(8):
+            candidate = datetime.combine(day, when)
+            if candidate > after and (self.days is None or
+                                      (day - timedelta(days=self.dayShift)).weekday() in self.days):
+                return candidate
+            day += timedelta(days=1)
+        return None
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.name!r} at {self.time} next={self.next_run}>'
+
+
+class Scheduler:
+    """
+    Runs callbacks at times of day without polling.
+
+    Jobs sit in a min-heap ordered by their next deadline; the scheduler thread sleeps until
+    the earliest one (or until a job is added or cancelled) and hands due callbacks to a
+    worker pool, so a slow callback never delays the others. Deadlines missed while the
+    process was busy or suspended fire once, then the job moves to its next occurrence.
+
+    Parameters:
+        clock (callable): Returns the current naive local datetime (default datetime.now).
+            Inject a fake clock and call run_pending() for deterministic tests.
+        workers (int): Size of the callback pool (default value_setter.schedulerWorkers).
+        executor (Executor): Use this executor instead of creating a pool.
+    """
+
+    def __init__(self, clock=datetime.now, workers=None, executor=None):
+        self.clock = clock
+        self.workers = workers if workers is not None else value_setter.schedulerWorkers
+        self._executor = executor
+        self._ownsExecutor = executor is None
+        self._heap = []
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    def once(self, at, callback, *args, offset=0, name=None, **kwargs):
+        """
+        Runs `callback(*args, **kwargs)` the next time the clock reaches `at`.
+
+        Parameters:
+            at (str | int | MinuteOfDay): The time in "HH:MM" 24-hour format, or minutes after midnight.
+            callback (callable): The function to call.
+            offset (int): Minutes added to `at` (negative for earlier), wrapping around midnight.
+            name (str): A name for logs (default the callback's name).
+
+        Returns:
+            Job: The scheduled job.
+        """
+        return self._add(at, offset, None, False, callback, args, kwargs, name)
+
+    def daily(self, at, callback, *args, offset=0, name=None, **kwargs):
+        """
+        Runs `callback(*args, **kwargs)` every day at `at`. See once() for the parameters.
+        """
+        return self._add(at, offset, None, True, callback, args, kwargs, name)
+
+    def on_days(self, days, at, callback, *args, offset=0, name=None, **kwargs):
+        """
+        Runs `callback(*args, **kwargs)` at `at` on the given days of the week.
+
+        Parameters:
+            days (iterable): Day names as returned by get_current_day ("Monday") or
+                numbers (0 = Monday); WEEKDAYS is Monday to Friday.
+            at, callback, offset, name: See once().
+
+        Returns:
+            Job: The scheduled job.
+        """
+        return self._add(at, offset, _weekdays(days), True, callback, args, kwargs, name)
+
+    def _add(self, at, offset, days, repeat, callback, args, kwargs, name):
+        job = Job(next(self._ids), name, at, offset, days, repeat, callback, args, kwargs)
+        with self._cond:
+            job.next_run = job._next(self.clock())
+            self._jobs[job.id] = job
+            heapq.heappush(self._heap, (job.next_run, job.id, job))
+            self._cond.notify()
+        sc_log.info(f'Scheduled {job.name} at {job.time}, next run {job.next_run}')
+        return job
+
+    def cancel(self, job):
+        """
+        Cancels a job. Cancelling a job that already finished is a no-op.
+
+        Parameters:
+            job (Job | int): The job or its id.
+        """
+        with self._cond:
+            job = self._jobs.pop(job if isinstance(job, int) else job.id, None)
+            if job is None:
+                return
+            # Cancelled entries are skipped when they reach the top of the heap
+            job.cancelled = True
+            job.next_run = None
+            self._cond.notify()
+
+    def jobs(self):
+        """
+        Returns the scheduled jobs, earliest deadline first.
+        """
+        with self._cond:
+            return sorted(self._jobs.values(), key=lambda job: job.next_run)
+
+    def next_deadline(self):
+        """
+        Returns the earliest deadline, or None if nothing is scheduled.
+        """
+        with self._cond:
+            self._dropCancelled()
+            return self._heap[0][0] if self._heap else None
+
+    def _dropCancelled(self):
+        heap = self._heap
+        while heap and heap[0][2].cancelled:
+            heapq.heappop(heap)
+
+    def _popDue(self, now):
+        due = []
+        heap = self._heap
+        while True:
+            self._dropCancelled()
+            if not heap or heap[0][0] > now:
+                return due
+            _, _, job = heapq.heappop(heap)
+            due.append(job)
+            job.next_run = job._next(now) if job.repeat else None
+            if job.next_run is None:
+                self._jobs.pop(job.id, None)
+            else:
+                heapq.heappush(heap, (job.next_run, job.id, job))
+
+    def _getExecutor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='scheduler')
+        return self._executor
+
+    def _invoke(self, job):
+        try:
+            return job.callback(*job.args, **job.kwargs)
+        except Exception as e:
+            sc_log.error(f'Scheduled job {job.name} failed: {e}')
+            sc_log.error(traceback.format_exc())
+
+    def run_pending(self):
+        """
+        Dispatches every job whose deadline has passed according to the clock.
+
+        Returns:
+            list: One Future per dispatched callback.
+        """
+        with self._cond:
+            due = self._popDue(self.clock())
+        executor = self._getExecutor() if due else None
+        futures = []
+        for job in due:
+            sc_log.debug(f'Running scheduled job {job.name}')
+            futures.append(executor.submit(self._invoke, job))
+        return futures
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+                deadline = self.next_deadline()
+                wait = _MAX_WAIT if deadline is None else (deadline - self.clock()).total_seconds()
+                if wait > 0:
+                    self._cond.wait(min(wait, _MAX_WAIT))
+                    continue
+            self.run_pending()
+
+    def start(self):
+        """
+        Starts the background thread that waits for deadlines. Returns the scheduler.
+        """
+        with self._cond:
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, wait=True):
+        """
+        Stops the background thread and, if the scheduler created it, the worker pool.
+
+        Parameters:
+            wait (bool): Wait for running callbacks to finish.
+        """
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._cond.notify()
+        if thread is not None:
+            thread.join()
+        if self._ownsExecutor and self._executor is not None:
+            executor, self._executor = self._executor, None
+            executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+# Process-wide scheduler; call scheduler.start() to run jobs in the background
+scheduler = Scheduler()
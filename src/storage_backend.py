@@ -0,0 +1,402 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import traceback
+from contextlib import contextmanager, nullcontext
+from tempfile import NamedTemporaryFile
+import value_setter
+import logger as logger
+import archive_store
+import json_patch
+from lock_manager import LockManager
+
+sb_log = logger.mainLog
+
+
+class StorageBackend:
+    """
+    Interface between file_management and the place documents are persisted.
+
+    Paths are document paths relative to the storage root, e.g. 'indicators/status.json'.
+    Data is passed as bytes; file_management does the JSON encoding and caching.
+    """
+
+    name = 'abstract'
+
+    def key(self, path):
+        """Returns a process-wide unique key for `path`, used by the document cache."""
+        raise NotImplementedError
+
+    def localPath(self, path):
+        """Returns the filesystem path of a document, or None if it is not stored as a file."""
+        return None
+
+    def signature(self, path):
+        """Returns a value that changes whenever the document changes, or None if it does not exist."""
+        raise NotImplementedError
+
+    def read(self, path):
+        """Returns the document's bytes. Raises FileNotFoundError if it does not exist."""
+        raise NotImplementedError
+
+    def write(self, path, data):
+        """Replaces the document with `data`."""
+        raise NotImplementedError
+
+    def append(self, path, data):
+        """Appends `data` to the document, creating it if needed."""
+        raise NotImplementedError
+
+    def delete(self, path):
+        """Removes the document if it exists."""
+        raise NotImplementedError
+
+    def archive(self, path, archiveCount=10):
+        """Records the current content of the document as archived version 0."""
+        raise NotImplementedError
+
+    def list_versions(self, path):
+        """Lists archived versions newest first, as dicts with at least 'version', 'size' and 'time'."""
+        raise NotImplementedError
+
+    def restore(self, path, n=0):
+        """Replaces the document with archived version `n`. Returns True on success."""
+        raise NotImplementedError
+
+    @contextmanager
+    def batch(self):
+        """Groups the writes made inside the block, where the backend supports it."""
+        yield self
+
+    def lock(self, path):
+        """Returns a context manager that excludes other writers of `path` (threads and processes)."""
+        return nullcontext()
+
+    def lockStats(self):
+        """Returns lock wait-time metrics, see LockManager.stats."""
+        return {}
+
+
+class FileSystemBackend(StorageBackend):
+    """
+    One JSON file per document under `rootDir`, archived through archive_store.
+
+    Documents are published with an atomic rename, so readers never see a partial
+    write and need no lock; writers serialize on per-document fcntl locks.
+
+    Parameters:
+        rootDir (str): The document root (default value_setter.mainDir).
+        store (ArchiveStore): The archive store (default archive_store.archive_store).
+        locks (LockManager): The writer lock manager (default: one using value_setter.lockDir).
+    """
+
+    name = 'filesystem'
+
+    def __init__(self, rootDir=None, store=None, locks=None):
+        self.rootDir = rootDir if rootDir is not None else value_setter.mainDir
+        self.store = store if store is not None else archive_store.archive_store
+        self.locks = locks if locks is not None else LockManager()
+
+    def key(self, path):
+        return os.path.abspath(self.rootDir + path)
+
+    def localPath(self, path):
+        return self.rootDir + path
+
+    def signature(self, path):
+        try:
+            stat = os.stat(self.rootDir + path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def read(self, path):
+        with open(self.rootDir + path, 'rb') as f:
+            return f.read()
+
+    def write(self, path, data):
+        target = self.rootDir + path
+        dir_path = os.path.dirname(target)
+        if dir_path and not os.path.isdir(dir_path):
+            sb_log.info(f'Creating directory: {dir_path}')
+            # Another writer (thread or listener worker) may create it at the same time
+            os.makedirs(dir_path, exist_ok=True)
+        # Write to a temporary file next to the target, then atomically rename it into place
+        tempfile = NamedTemporaryFile(mode='wb', dir=dir_path or '.', prefix='.' + os.path.basename(target) + '.',
+                                      suffix='.tmp', delete=False)
+        try:
+            with tempfile:
+                tempfile.write(data)
+            os.replace(tempfile.name, target)
+        except BaseException:
+            os.remove(tempfile.name)
+            raise
+
+    def append(self, path, data):
+        with open(self.rootDir + path, 'ab') as f:
+            f.write(data)
+
+    def delete(self, path):
+        try:
+            os.remove(self.rootDir + path)
+        except FileNotFoundError:
+            pass
+
+    def archive(self, path, archiveCount=10):
+        return self.store.archive(path, archiveCount)
+
+    def list_versions(self, path):
+        return self.store.list_versions(path)
+
+    def restore(self, path, n=0):
+        with self.lock(path):
+            return self.store.restore(path, n)
+
+    def lock(self, path):
+        return self.locks.exclusive(self.key(path))
+
+    def lockStats(self):
+        return self.locks.stats()
+
+
+# Connections inherited from a parent process, kept open but never used again
+_inherited = []
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Stores documents and archived versions in one SQLite database (WAL mode).
+
+    Tables:
+        - documents(path, data, version, updated): the live documents.
+        - versions(path, seq, data, created): archived versions, highest seq newest.
+
+    Each thread of each process opens its own connection on first use, so a backend created
+    before listener_cluster forks its workers is safe to use in them. Writes made inside
+    `batch()` share a single transaction, so bulk updates pay for one commit instead of one
+    per document.
+
+    SQLite allows one writer at a time, so lock(path) holds the write lock of the whole
+    database: any locked section blocks writers of every other path until it ends.
+
+    Parameters:
+        dbPath (str): The database file (default value_setter.sqlitePath).
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, dbPath=None):
+        self.dbPath = dbPath if dbPath is not None else value_setter.sqlitePath
+        self._local = threading.local()
+        self._versionLock = threading.Lock()
+        self._lastVersion = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            if conn is not None:
+                # Inherited through fork; closing it could disturb the parent's locks, so it is only dropped from use
+                _inherited.append(conn)
+            dir_path = os.path.dirname(self.dbPath)
+            if dir_path and not os.path.isdir(dir_path):
+                os.makedirs(dir_path, exist_ok=True)
+            conn = sqlite3.connect(self.dbPath, isolation_level=None, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS documents ('
+                         'path TEXT PRIMARY KEY, data BLOB NOT NULL, version INTEGER NOT NULL, updated REAL NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS versions ('
+                         'path TEXT NOT NULL, seq INTEGER NOT NULL, data BLOB NOT NULL, created REAL NOT NULL, '
+                         'PRIMARY KEY (path, seq))')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        # A nested level is a savepoint, so its failure undoes only its own writes
+        conn = self._connection()
+        depth = self._local.depth
+        conn.execute('BEGIN IMMEDIATE' if depth == 0 else f'SAVEPOINT level{depth}')
+        self._local.depth += 1
+        try:
+            yield conn
+        except BaseException:
+            self._local.depth -= 1
+            if depth == 0:
+                conn.execute('ROLLBACK')
+            else:
+                conn.execute(f'ROLLBACK TO level{depth}')
+                conn.execute(f'RELEASE level{depth}')
+            raise
+        self._local.depth -= 1
+        conn.execute('COMMIT' if depth == 0 else f'RELEASE level{depth}')
+
+    def _nextVersion(self):
+        # Versions only need to differ between writes; time_ns keeps them unique across processes too
+        with self._versionLock:
+            self._lastVersion = max(time.time_ns(), self._lastVersion + 1)
+            return self._lastVersion
+
+    def key(self, path):
+        return f'sqlite:{os.path.abspath(self.dbPath)}:{path}'
+
+    def signature(self, path):
+        row = self._connection().execute('SELECT version FROM documents WHERE path = ?', (path,)).fetchone()
+        return None if row is None else (row[0],)
+
+    def read(self, path):
+        row = self._connection().execute('SELECT data FROM documents WHERE path = ?', (path,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(path)
+        return bytes(row[0])
+
+    def write(self, path, data):
+        with self._transaction() as conn:
+            conn.execute('INSERT OR REPLACE INTO documents (path, data, version, updated) VALUES (?, ?, ?, ?)',
+                         (path, sqlite3.Binary(data), self._nextVersion(), time.time()))
+
+    def append(self, path, data):
+        with self._transaction() as conn:
+            row = conn.execute('SELECT data FROM documents WHERE path = ?', (path,)).fetchone()
+            current = bytes(row[0]) if row is not None else b''
+            conn.execute('INSERT OR REPLACE INTO documents (path, data, version, updated) VALUES (?, ?, ?, ?)',
+                         (path, sqlite3.Binary(current + data), self._nextVersion(), time.time()))
+
+    def delete(self, path):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM documents WHERE path = ?', (path,))
+
+    def archive(self, path, archiveCount=10):
+        with self._transaction() as conn:
+            row = conn.execute('SELECT data FROM documents WHERE path = ?', (path,)).fetchone()
+            if row is None or archiveCount <= 0:
+                return False
+            seq = conn.execute('SELECT COALESCE(MAX(seq), 0) + 1 FROM versions WHERE path = ?', (path,)).fetchone()[0]
+            conn.execute('INSERT INTO versions (path, seq, data, created) VALUES (?, ?, ?, ?)',
+                         (path, seq, row[0], time.time()))
+            conn.execute('DELETE FROM versions WHERE path = ? AND seq <= ?', (path, seq - archiveCount))
+        sb_log.info(f'Archived {path} as version {seq}')
+        return True
+
+    def list_versions(self, path):
+        rows = self._connection().execute(
+            'SELECT seq, length(data), created FROM versions WHERE path = ? ORDER BY seq DESC', (path,)).fetchall()
+        return [{'version': n, 'seq': seq, 'size': size, 'time': created} for n, (seq, size, created) in enumerate(rows)]
+
+    def restore(self, path, n=0):
+        try:
+            with self._transaction() as conn:
+                row = conn.execute('SELECT data FROM versions WHERE path = ? ORDER BY seq DESC LIMIT 1 OFFSET ?',
+                                   (path, n)).fetchone()
+                if row is None:
+                    raise IndexError(f'{path} has no archived version {n}')
+                data = bytes(row[0])
+                self.archive(path)
+                self.write(path, data)
+            sb_log.info(f'Restored {path} from archived version {n}')
+        except Exception as e:
+            sb_log.error(f'Error restoring {path} from archived version {n}: {e}')
+            sb_log.error(traceback.format_exc())
+            return False
+        return True
+
+    @contextmanager
+    def batch(self):
+        with self._transaction():
+            yield self
+
+    def lock(self, path):
+        # BEGIN IMMEDIATE takes SQLite's writer lock, which covers the whole database rather
+        # than `path`; nested writes join the transaction
+        return self._transaction()
+
+
+def createBackend(name=None):
+    """
+    Creates the storage backend named by value_setter.storageBackend ('filesystem' or 'sqlite').
+
+    Parameters:
+        name (str): Overrides value_setter.storageBackend.
+
+    Returns:
+        StorageBackend: The backend.
+    """
+    name = name or value_setter.storageBackend
+    if name == 'filesystem':
+        return FileSystemBackend()
+    if name == 'sqlite':
+        return SQLiteBackend()
+    raise ValueError(f"Unknown storage backend: {name!r}")
+
+
+def _replayJournal(fullPath, data):
+    """
+    Applies a still-valid patch journal next to `fullPath` to `data` (see file_management.patchJsonFile).
+    """
+    journalPath = fullPath + '.journal'
+    if not os.path.isfile(journalPath):
+        return data
+    stat = os.stat(fullPath)
+    with open(journalPath, 'rb') as f:
+        lines = f.read().splitlines()
+    try:
+        if not lines or tuple(json.loads(lines[0]).get('base', ())) != (stat.st_mtime_ns, stat.st_size, stat.st_ino):
+            return data
+    except ValueError:
+        return data
+    document = json.loads(data)
+    for line in lines[1:]:
+        try:
+            patch = json.loads(line)
+        except ValueError:
+            break
+        document = json_patch.apply_patch(document, patch)
+    return json.dumps(document).encode('utf-8')
+
+
+def migrateToSqlite(dbPath=None, mainDir=None, store=None):
+    """
+    Imports an existing filesystem tree (documents and their archived versions) into SQLite.
+
+    Every .json file under mainDir except the archive, logging, images and inputs directories
+    is imported as a document, with its patch journal folded in; the archive_store versions of
+    each document are imported oldest first. Running the migration again replaces documents and
+    appends their versions once more.
+
+    Parameters:
+        dbPath (str): The target database (default value_setter.sqlitePath).
+        mainDir (str): The document root to import (default value_setter.mainDir).
+        store (ArchiveStore): The archive store holding the versions (default archive_store.archive_store).
+
+    Returns:
+        dict: The number of 'documents' and 'versions' imported.
+    """
+    mainDir = mainDir if mainDir is not None else value_setter.mainDir
+    store = store if store is not None else archive_store.archive_store
+    backend = SQLiteBackend(dbPath)
+    skipped = {os.path.abspath(d) for d in (value_setter.archiveDir, value_setter.loggingDir,
+                                            value_setter.imagesDir, value_setter.inputsDir)}
+    counts = {'documents': 0, 'versions': 0}
+    with backend.batch() as batch:
+        for dirpath, dirnames, filenames in os.walk(mainDir):
+            dirnames[:] = [d for d in dirnames if os.path.abspath(os.path.join(dirpath, d)) not in skipped]
+            for filename in filenames:
+                if not filename.endswith('.json'):
+                    continue
+                fullPath = os.path.join(dirpath, filename)
+                path = os.path.relpath(fullPath, mainDir).replace(os.sep, '/')
+                versions = store.list_versions(path)
+                for version in reversed(versions):
+                    # Replay the history through the live row so seq order matches the archive order
+                    batch.write(path, store.read(path, version['version']))
+                    batch.archive(path, len(versions))
+                    counts['versions'] += 1
+                with open(fullPath, 'rb') as f:
+                    batch.write(path, _replayJournal(fullPath, f.read()))
+                counts['documents'] += 1
+    sb_log.info(f"Migrated {counts['documents']} documents and {counts['versions']} versions into {backend.dbPath}")
+    return counts
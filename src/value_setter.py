@@ -1,5 +1,6 @@
 import os
 import logging
+import threading
 
 if 'appdata' not in os.environ:
     mainDir = 'ArtificianWorld/'
@@ -8,6 +9,7 @@ if 'appdata' not in os.environ:
     imagesDir = mainDir + 'images/'
     archiveDir = mainDir + 'archive/'
     loggingDir = mainDir + 'logging/'
+    lockDir = mainDir + '.locks/'
 else:
     mainDir = os.environ['appdata'] + '\\ArtificialWorld\\'
     indicatorDir = mainDir + 'indicators\\'
@@ -15,13 +17,97 @@ else:
     imagesDir = mainDir + 'images\\'
     archiveDir = mainDir + 'archive\\'
     loggingDir = mainDir + 'logging\\'
+    lockDir = mainDir + '.locks\\'
 
-# Configure logging
-logging.basicConfig(
-    filename=os.path.join(mainDir, 'directory_creation.log'),
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Byte budget of the in-process JSON document cache used by file_management.getJsonDict
+documentCacheBytes = int(os.environ.get('AW_DOCUMENT_CACHE_BYTES', 64 * 1024 * 1024))
+# Store archived versions other than the newest zlib-compressed
+archiveCompress = os.environ.get('AW_ARCHIVE_COMPRESS', '0') == '1'
+# file_management.patchJsonFile compacts a journal into a snapshot past either limit
+journalMaxEntries = int(os.environ.get('AW_JOURNAL_MAX_ENTRIES', 100))
+journalMaxBytes = int(os.environ.get('AW_JOURNAL_MAX_BYTES', 1024 * 1024))
+# object_management.getValuesFromJson streams files of at least this size instead of parsing them
+streamThresholdBytes = int(os.environ.get('AW_STREAM_THRESHOLD_BYTES', 8 * 1024 * 1024))
+# Storage backend behind file_management: 'filesystem' (one file per document) or 'sqlite'
+storageBackend = os.environ.get('AW_STORAGE_BACKEND', 'filesystem')
+sqlitePath = os.environ.get('AW_SQLITE_PATH', mainDir + 'artificialworld.sqlite3')
+# Size of the thread pool behind the aio module
+aioWorkers = int(os.environ.get('AW_AIO_WORKERS', 8))
+# Number of parsed templates kept by object_management.compile_template
+templateCacheSize = int(os.environ.get('AW_TEMPLATE_CACHE_SIZE', 1024))
+# Size of the thread pool running scheduler callbacks
+schedulerWorkers = int(os.environ.get('AW_SCHEDULER_WORKERS', 4))
+# Largest request body accepted by the listener's /api/bulk endpoint
+bulkMaxBytes = int(os.environ.get('AW_BULK_MAX_BYTES', 16 * 1024 * 1024))
+# Concurrent /api/bulk requests; further requests are refused with 503 until one finishes
+bulkMaxConcurrent = int(os.environ.get('AW_BULK_MAX_CONCURRENT', 4))
+# Answer /api with 202 and write from a background queue (clients may also send 'Prefer: respond-async')
+listenerAsync = os.environ.get('AW_LISTENER_ASYNC', '0') == '1'
+# Writer threads and capacity of the listener's write queue
+writeQueueWorkers = int(os.environ.get('AW_WRITE_QUEUE_WORKERS', 4))
+writeQueueSize = int(os.environ.get('AW_WRITE_QUEUE_SIZE', 1000))
+# Where error alerts go: 'notify_run', 'stdout', 'file:<path>' or 'none'
+notifySink = os.environ.get('AW_NOTIFY_SINK', 'notify_run')
+notifyEndpoint = os.environ.get('AW_NOTIFY_ENDPOINT', 'https://notify.run/t7M6m7zJ3fos7p7X1lJY')
+# Identical alerts within this many seconds are sent once
+notifyDedupWindow = float(os.environ.get('AW_NOTIFY_DEDUP_WINDOW', 300))
+# Seconds to collect alerts into one digest, and the minimum gap between two sends
+notifyBatchDelay = float(os.environ.get('AW_NOTIFY_BATCH_DELAY', 2))
+notifyMinInterval = float(os.environ.get('AW_NOTIFY_MIN_INTERVAL', 30))
+# Listener processes sharing the port (see listener_cluster); 1 runs a single Flask process
+listenerWorkers = int(os.environ.get('AW_LISTENER_WORKERS', 1))
+# Seconds a stopping listener waits for in-flight requests, and for a reply from another worker
+listenerDrainTimeout = float(os.environ.get('AW_LISTENER_DRAIN_TIMEOUT', 30))
+listenerCallTimeout = float(os.environ.get('AW_LISTENER_CALL_TIMEOUT', 30))
+# external_management.ApiClient: timeouts in seconds, retries on 5xx/connection errors with
+# exponential backoff, pooled connections and parallel sends (overall and per host)
+apiConnectTimeout = float(os.environ.get('AW_API_CONNECT_TIMEOUT', 5))
+apiReadTimeout = float(os.environ.get('AW_API_READ_TIMEOUT', 30))
+apiRetries = int(os.environ.get('AW_API_RETRIES', 3))
+apiBackoff = float(os.environ.get('AW_API_BACKOFF', 0.5))
+apiMaxBackoff = float(os.environ.get('AW_API_MAX_BACKOFF', 10))
+apiPoolSize = int(os.environ.get('AW_API_POOL_SIZE', 16))
+apiMaxWorkers = int(os.environ.get('AW_API_MAX_WORKERS', 16))
+apiPerHost = int(os.environ.get('AW_API_PER_HOST', 8))
+# Send merge-patch deltas against the last acknowledged version, remembering up to apiDeltaSnapshots documents
+apiDelta = os.environ.get('AW_API_DELTA', '0') == '1'
+apiDeltaSnapshots = int(os.environ.get('AW_API_DELTA_SNAPSHOTS', 1024))
+# Request bodies larger than this many bytes are gzip-compressed
+apiGzipThreshold = int(os.environ.get('AW_API_GZIP_THRESHOLD', 16 * 1024))
+# Queue post_data_to_api calls in a durable spool (see api_spool) instead of sending them inline
+apiSpool = os.environ.get('AW_API_SPOOL', '0') == '1'
+spoolPath = os.environ.get('AW_SPOOL_PATH', mainDir + 'api_spool.sqlite3')
+# Updates sent per flush, seconds between flushes, and the cap on the retry delay of a failing update
+spoolBatchSize = int(os.environ.get('AW_SPOOL_BATCH_SIZE', 100))
+spoolInterval = float(os.environ.get('AW_SPOOL_INTERVAL', 1.0))
+spoolMaxBackoff = float(os.environ.get('AW_SPOOL_MAX_BACKOFF', 300))
+# Records waiting for the log writer thread, and what to do when that queue is full:
+# 'block', 'drop-debug' (drop records below WARNING) or 'count-dropped' (drop any record)
+logQueueSize = int(os.environ.get('AW_LOG_QUEUE_SIZE', 10000))
+logOverflow = os.environ.get('AW_LOG_OVERFLOW', 'block')
+# Records written per file lock, and main.log rotation size and number of backups
+logBatchSize = int(os.environ.get('AW_LOG_BATCH_SIZE', 256))
+logMaxBytes = int(os.environ.get('AW_LOG_MAX_BYTES', 10 * 1024 * 1024))
+logBackupCount = int(os.environ.get('AW_LOG_BACKUP_COUNT', 5))
+# Record instrumentation spans and counters from startup (instrumentation.enable() turns it on later)
+metricsEnabled = os.environ.get('AW_METRICS', '0') == '1'
+# Speech driver for audio.speak_text: 'pyttsx3' or 'none' (silent)
+ttsDriver = os.environ.get('AW_TTS_DRIVER', 'pyttsx3')
+# Rendered-phrase cache of audio.speak_text: directory, size budget, and the longest text cached
+ttsCacheDir = os.environ.get('AW_TTS_CACHE_DIR', os.path.join(mainDir, 'tts_cache'))
+ttsCacheBytes = int(os.environ.get('AW_TTS_CACHE_BYTES', 64 * 1024 * 1024))
+ttsCacheMaxChars = int(os.environ.get('AW_TTS_CACHE_MAX_CHARS', 200))
+
+def _directoryLog():
+    # Opened once mainDir exists; a basicConfig file handler would need it at import time
+    log = logging.getLogger('directory_creation')
+    if not log.handlers:
+        handler = logging.FileHandler(os.path.join(mainDir, 'directory_creation.log'))
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        log.addHandler(handler)
+        log.setLevel(logging.INFO)
+        log.propagate = False
+    return log
 
 def createDirs():
     """
@@ -35,23 +121,41 @@ def createDirs():
         - archiveDir: Directory for archived files.
         - loggingDir: Directory for log files.
 
-    Logs:
+    Logs (to mainDir/directory_creation.log):
         - Logs the creation of directories.
         - Logs warnings if a directory already exists.
         - Logs errors if directory creation fails.
     """
     dirs = [mainDir, indicatorDir, inputsDir, imagesDir, archiveDir, loggingDir]
+    messages = []
     for dir in dirs:
         dir_path = dir.strip('\\')  # Normalize directory path
         try:
             if not os.path.isdir(dir_path):
-                os.makedirs(dir_path)  # Use makedirs to create intermediate directories if needed
-                logging.info(f"Created required directory: {dir_path}")
+                os.makedirs(dir_path, exist_ok=True)  # Use makedirs to create intermediate directories if needed
+                messages.append((logging.INFO, f"Created required directory: {dir_path}"))
                 print(f"Created required directory: {dir_path}")
             else:
-                logging.warning(f"Directory already exists: {dir_path}")
+                messages.append((logging.WARNING, f"Directory already exists: {dir_path}"))
         except OSError as e:
-            logging.error(f"Failed to create directory {dir_path}: {e}")
+            messages.append((logging.ERROR, f"Failed to create directory {dir_path}: {e}"))
             print(f"Error: Could not create directory {dir_path}. Check logs for details.")
+    log = _directoryLog() if os.path.isdir(mainDir) else logging.getLogger('directory_creation')
+    for level, message in messages:
+        log.log(level, message)
+
+_dirsCreated = False
+_dirsLock = threading.Lock()
 
-createDirs()
+def ensureDirs():
+    """
+    Runs createDirs once per process, on the first call. Called before the first log record
+    or document write, so importing modules does not touch the disk.
+    """
+    global _dirsCreated
+    if _dirsCreated:
+        return
+    with _dirsLock:
+        if not _dirsCreated:
+            createDirs()
+            _dirsCreated = True
@@ -0,0 +1,161 @@
+import atexit
+import threading
+import traceback
+from contextlib import nullcontext
+import logger as logger
+from document_cache import thaw
+
+wb_log = logger.mainLog
+
+
+class WriteBehindBuffer:
+    """
+    Coalesces bursts of document writes, keeping only the latest pending version per path.
+
+    Staged documents are written by `writer(data, filepath)` when `interval` seconds have
+    passed, when `maxDirty` paths are pending, on an explicit flush(), when leaving a
+    `with` block, or at interpreter exit. Each flush writes every pending path once.
+
+    Parameters:
+        writer (callable): Called as writer(data, filepath) -> bool for each flushed document.
+        interval (float): Seconds between background flushes.
+        maxDirty (int): Number of pending paths that triggers an early flush.
+        batch (callable): Optional context manager factory wrapped around each flush,
+            e.g. a storage backend's batch() to commit a flush as one transaction.
+    """
+
+    def __init__(self, writer, interval=1.0, maxDirty=100, batch=None):
+        self.writer = writer
+        self.batch = batch
+        self.interval = interval
+        self.maxDirty = maxDirty
+        self._pending = {}
+        # Documents being written by the current flush; still served by pending() until written
+        self._inflight = {}
+        self._cond = threading.Condition()
+        self._flushLock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self.flushes = 0
+        self.written = 0
+        self.coalesced = 0
+
+    def stage(self, key, filepath, data):
+        """
+        Records `data` as the latest pending version of a document.
+
+        Parameters:
+            key (str): The normalized document path used for coalescing.
+            filepath (str): The path passed on to the writer.
+            data (Any): The document. A private copy is taken.
+        """
+        data = thaw(data)
+        with self._cond:
+            if key in self._pending:
+                self.coalesced += 1
+            self._pending[key] = (filepath, data)
+            if len(self._pending) >= self.maxDirty:
+                self._cond.notify()
+
+    def pending(self, key):
+        """
+        Returns the pending (filepath, data) for a document, or None if nothing is pending.
+        """
+        with self._cond:
+            pending = self._pending.get(key)
+            return pending if pending is not None else self._inflight.get(key)
+
+    def flush(self):
+        """
+        Writes every pending document now and waits for the writes to finish.
+
+        Returns:
+            bool: True if every write succeeded, False otherwise.
+        """
+        with self._flushLock:
+            with self._cond:
+                if not self._pending:
+                    # Nothing to write: do not open a batch (a write transaction with SQLite)
+                    return True
+                pending = self._inflight = self._pending
+                self._pending = {}
+            try:
+                with self.batch() if self.batch is not None else nullcontext():
+                    ok = self._write(pending)
+            finally:
+                # Only now are the writes visible in storage, including a batch's commit
+                with self._cond:
+                    self._inflight = {}
+            self.flushes += 1
+            return ok
+
+    def _write(self, pending):
+        ok = True
+        for key, (filepath, data) in pending.items():
+            try:
+                written = self.writer(data, filepath)
+            except Exception as e:
+                wb_log.error(f'Write-behind flush failed for {filepath}: {e}')
+                wb_log.error(traceback.format_exc())
+                written = False
+            if written:
+                self.written += 1
+            else:
+                ok = False
+                with self._cond:
+                    # Retry on the next flush unless a newer version was staged meanwhile
+                    self._pending.setdefault(key, (filepath, data))
+        return ok
+
+    def start(self):
+        """
+        Starts the background flusher thread and registers the exit-time flush.
+        """
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """
+        Stops the background thread after a final flush.
+        """
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._cond.notify()
+        if thread is not None:
+            thread.join()
+        atexit.unregister(self.stop)
+        self.flush()
+
+    def stats(self):
+        """
+        Returns the write-behind counters.
+
+        Returns:
+            dict: pending, flushes, written and coalesced.
+        """
+        with self._cond:
+            return {'pending': len(self._pending), 'flushes': self.flushes, 'written': self.written, 'coalesced': self.coalesced}
+
+    def _run(self):
+        backoff = False
+        while True:
+            with self._cond:
+                if not self._stopping and (backoff or len(self._pending) < self.maxDirty):
+                    self._cond.wait(self.interval)
+                if self._stopping:
+                    return
+            # After a failed flush wait a full interval instead of spinning on the retry
+            backoff = not self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
@@ -0,0 +1,212 @@
+import time
+import uuid
+import atexit
+import threading
+import traceback
+from collections import deque, OrderedDict
+import logger as logger
+
+wq_log = logger.mainLog
+
+
+class QueueFull(Exception):
+    """Raised by WriteQueue.submit when `maxSize` writes are already waiting."""
+
+
+class WriteQueue:
+    """
+    A bounded queue of document writes drained by a pool of worker threads.
+
+    Writes to the same path run one at a time in submission order; writes to different
+    paths run in parallel. Every submitted write gets an id whose state ('queued',
+    'running', 'done' or 'failed') can be looked up with status() until it ages out of
+    the last `retain` finished writes.
+
+    Parameters:
+        writer (callable): Called as writer(*args) -> bool for each write; False or an
+            exception marks the write failed.
+        workers (int): Number of worker threads, started on the first submit.
+        maxSize (int): Writes that may wait at once; submit raises QueueFull beyond that.
+        retain (int): Number of finished write statuses kept for status().
+    """
+
+    def __init__(self, writer, workers=4, maxSize=1000, retain=10000):
+        self.writer = writer
+        self.workers = workers
+        self.maxSize = maxSize
+        self.retain = retain
+        self._cond = threading.Condition()
+        # path -> deque of request ids waiting for that path
+        self._waiting = {}
+        # Paths with waiting writes and no running write, in the order they became ready
+        self._ready = deque()
+        self._running = set()
+        self._statuses = OrderedDict()
+        self._tasks = {}
+        self._depth = 0
+        self._threads = []
+        self._stopping = False
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, path, *args):
+        """
+        Queues writer(*args) behind any earlier writes to `path`.
+
+        Parameters:
+            path (str): The document the write goes to; writes are serialized per path.
+            *args: Arguments for the writer.
+
+        Returns:
+            str: The request id for status().
+
+        Raises:
+            QueueFull: If `maxSize` writes are already waiting.
+        """
+        requestId = uuid.uuid4().hex
+        with self._cond:
+            if self._stopping:
+                raise RuntimeError('WriteQueue is stopped')
+            if self._depth >= self.maxSize:
+                raise QueueFull(f'{self._depth} writes already queued')
+            if not self._threads:
+                self._start()
+            self._tasks[requestId] = args
+            self._statuses[requestId] = {'id': requestId, 'path': path, 'state': 'queued', 'submitted': time.time()}
+            waiting = self._waiting.get(path)
+            if waiting is None:
+                waiting = self._waiting[path] = deque()
+                if path not in self._running:
+                    self._ready.append(path)
+            waiting.append(requestId)
+            self._depth += 1
+            self._cond.notify()
+        return requestId
+
+    def status(self, requestId):
+        """
+        Returns the state of a submitted write.
+
+        Returns:
+            dict | None: {'id', 'path', 'state', 'submitted'} plus 'finished' and 'error' once
+                done, or None for an unknown (or aged-out) id.
+        """
+        with self._cond:
+            status = self._statuses.get(requestId)
+            return dict(status) if status is not None else None
+
+    def depth(self):
+        """Returns the number of writes waiting to start."""
+        return self._depth
+
+    def stats(self):
+        """
+        Returns queue gauges and counters.
+
+        Returns:
+            dict: depth (waiting), running, capacity, workers, completed and failed.
+        """
+        with self._cond:
+            return {
+                'depth': self._depth,
+                'running': len(self._running),
+                'capacity': self.maxSize,
+                'workers': self.workers,
+                'completed': self.completed,
+                'failed': self.failed,
+            }
+
+    def _start(self):
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'write-queue-{n}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        atexit.register(self.stop)
+
+    def _next(self):
+        """Waits for a ready path and claims its oldest write. Returns (path, id) or None when stopping."""
+        with self._cond:
+            while not self._ready:
+                if self._stopping:
+                    return None
+                self._cond.wait()
+            path = self._ready.popleft()
+            waiting = self._waiting[path]
+            requestId = waiting.popleft()
+            if not waiting:
+                del self._waiting[path]
+            self._running.add(path)
+            self._depth -= 1
+            self._statuses[requestId]['state'] = 'running'
+            return path, requestId
+
+    def _work(self):
+        while True:
+            claimed = self._next()
+            if claimed is None:
+                return
+            path, requestId = claimed
+            args = self._tasks.pop(requestId)
+            error = None
+            try:
+                ok = self.writer(*args)
+                if not ok:
+                    error = 'write failed'
+            except Exception as e:
+                wq_log.error(f'Queued write to {path} failed: {e}')
+                wq_log.error(traceback.format_exc())
+                error = str(e)
+            with self._cond:
+                self._running.discard(path)
+                if path in self._waiting:
+                    self._ready.append(path)
+                    self._cond.notify()
+                status = self._statuses[requestId]
+                status['state'] = 'failed' if error else 'done'
+                status['finished'] = time.time()
+                if error:
+                    status['error'] = error
+                    self.failed += 1
+                else:
+                    self.completed += 1
+                # Finished statuses move to the end; drop the oldest finished ones
+                self._statuses.move_to_end(requestId)
+                while len(self._statuses) > self.retain:
+                    oldest = next(iter(self._statuses))
+                    if self._statuses[oldest]['state'] in ('queued', 'running'):
+                        break
+                    del self._statuses[oldest]
+                self._cond.notify_all()
+
+    def join(self, timeout=None):
+        """
+        Waits until every submitted write has finished.
+
+        Returns:
+            bool: True if the queue drained, False on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._depth or self._running:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, drain=True):
+        """
+        Stops the workers, by default after the queued writes have finished.
+
+        Parameters:
+            drain (bool): Finish queued writes first; otherwise only running writes complete.
+        """
+        if drain:
+            self.join()
+        with self._cond:
+            self._stopping = True
+            self._ready.clear()
+            threads, self._threads = self._threads, []
+            self._cond.notify_all()
+        for thread in threads:
+            thread.join()
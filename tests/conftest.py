@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# The modules live flat in src/ and keep their data under a relative mainDir, so run every
+# test from a scratch directory with src/ importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+os.chdir(tempfile.mkdtemp(prefix='aw-tests-'))
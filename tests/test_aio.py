@@ -0,0 +1,80 @@
+import time
+import asyncio
+import threading
+import aio
+
+
+def test_shutdown_cancels_calls_that_have_not_started(monkeypatch):
+    monkeypatch.setattr(aio.value_setter, 'aioWorkers', 1)
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocking():
+        started.set()
+        release.wait(5)
+        return 'done'
+
+    running = aio._submit(blocking)
+    started.wait(5)
+    queued = [aio._submit(lambda: 'ran') for _ in range(3)]
+    aio.shutdown(wait=False)
+    release.set()
+    assert running.result(5) == 'done'
+    assert all(future.cancelled() for future in queued)
+    assert not aio._futures
+
+
+def _recording_writer(events, delay=0.1):
+    def write(name):
+        events.append(('start', name))
+        time.sleep(delay)
+        events.append(('end', name))
+        return True
+    return write
+
+
+def test_same_path_writes_are_serialized():
+    events = []
+    write = _recording_writer(events)
+
+    async def main():
+        await asyncio.gather(*(aio._run_write('same.json', write, n) for n in range(3)))
+
+    asyncio.run(main())
+    assert events == [(kind, n) for n in range(3) for kind in ('start', 'end')]
+    assert not aio._path_locks
+
+
+def test_different_path_writes_run_concurrently():
+    events = []
+    write = _recording_writer(events)
+
+    async def main():
+        await asyncio.gather(aio._run_write('a.json', write, 'a'), aio._run_write('b.json', write, 'b'))
+
+    asyncio.run(main())
+    assert [kind for kind, _ in events[:2]] == ['start', 'start']
+
+
+def test_writes_from_several_event_loops():
+    events = []
+    write = _recording_writer(events, delay=0.02)
+    errors = []
+
+    def loop_thread():
+        async def main():
+            for n in range(3):
+                await aio._run_write('shared.json', write, n)
+        try:
+            asyncio.run(main())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=loop_thread, daemon=True) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert not any(thread.is_alive() for thread in threads)
+    assert errors == [] and len(events) == 24
+    assert not aio._path_locks
@@ -0,0 +1,136 @@
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+import api_spool
+import external_management
+
+
+class StandIn:
+    """A local HTTP server standing in for a listener API; answers with `status`."""
+
+    def __init__(self):
+        self.status = 201
+        self.received = []
+        standIn = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                status = standIn.status(body) if callable(standIn.status) else standIn.status
+                if status < 300:
+                    standIn.received.append((body['path'], body['data']))
+                self.send_response(status)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'{}')
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/api'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def api():
+    standIn = StandIn()
+    yield standIn
+    standIn.close()
+
+
+@pytest.fixture
+def client():
+    with external_management.ApiClient(retries=0, backoff=0.01) as client:
+        yield client
+
+
+def make_spool(tmp_path, client, **kwargs):
+    kwargs.setdefault('interval', 0.05)
+    kwargs.setdefault('maxBackoff', 0.2)
+    return api_spool.ApiSpool(str(tmp_path / 'spool.sqlite3'), client, **kwargs)
+
+
+def test_coalesces_to_latest_update_per_document(tmp_path, api, client):
+    spool = make_spool(tmp_path, client)
+    for version in range(5):
+        spool.enqueue({'v': version}, 'a.json', api.url)
+    spool.enqueue({'v': 0}, 'b.json', api.url)
+    stats = spool.stats()
+    assert stats['depth'] == 2
+    assert stats['coalesced'] == 4
+
+    assert spool.flush() == 2
+    assert sorted(api.received) == [('a.json', {'v': 4}), ('b.json', {'v': 0})]
+    assert spool.stats()['depth'] == 0
+
+
+def test_failed_updates_back_off_and_are_retried(tmp_path, api, client):
+    spool = make_spool(tmp_path, client, interval=0.5, maxBackoff=5)
+    api.status = 503
+    spool.enqueue({'v': 1}, 'a.json', api.url)
+    assert spool.flush() == 1
+    stats = spool.stats()
+    assert stats == dict(stats, depth=1, retrying=1, retried=1)
+    # Still backing off, so an immediate flush sends nothing
+    assert spool.flush() == 0
+
+    api.status = 201
+    with spool._transaction() as conn:
+        conn.execute('UPDATE spool SET next_attempt = 0')
+    assert spool.flush() == 1
+    assert api.received == [('a.json', {'v': 1})]
+    assert spool.stats()['depth'] == 0
+
+
+def test_permanent_client_errors_are_dropped(tmp_path, api, client):
+    spool = make_spool(tmp_path, client)
+    api.status = lambda body: 404 if body['path'] == 'bad.json' else 201
+    spool.enqueue({'v': 1}, 'bad.json', api.url)
+    spool.enqueue({'v': 1}, 'good.json', api.url)
+    spool.flush()
+    stats = spool.stats()
+    assert stats['dropped'] == 1 and stats['sent'] == 1 and stats['depth'] == 0
+    assert api.received == [('good.json', {'v': 1})]
+
+
+def test_spool_survives_restart(tmp_path, api, client):
+    api.status = 503
+    spool = make_spool(tmp_path, client)
+    spool.enqueue({'v': 1}, 'a.json', api.url)
+    spool.flush()
+
+    api.status = 201
+    restarted = make_spool(tmp_path, client)
+    assert restarted.stats()['depth'] == 1
+    restarted.start()
+    try:
+        for _ in range(100):
+            if restarted.stats()['depth'] == 0:
+                break
+            threading.Event().wait(0.05)
+    finally:
+        restarted.stop()
+    assert api.received == [('a.json', {'v': 1})]
+
+
+def test_update_enqueued_during_send_is_kept(tmp_path, api, client):
+    spool = make_spool(tmp_path, client)
+    spool.enqueue({'v': 1}, 'a.json', api.url)
+
+    def status(body):
+        if body['data'] == {'v': 1}:
+            spool.enqueue({'v': 2}, 'a.json', api.url)
+        return 201
+    api.status = status
+    spool.flush()
+    assert spool.stats()['depth'] == 1
+    spool.flush()
+    assert api.received == [('a.json', {'v': 1}), ('a.json', {'v': 2})]
@@ -0,0 +1,77 @@
+import os
+import pytest
+import archive_store
+
+
+@pytest.fixture
+def dirs(tmp_path, monkeypatch):
+    mainDir = str(tmp_path / 'main') + '/'
+    archiveDir = mainDir + 'archive/'
+    os.makedirs(mainDir + 'indicators')
+    monkeypatch.setattr(archive_store.value_setter, 'mainDir', mainDir)
+    monkeypatch.setattr(archive_store.value_setter, 'archiveDir', archiveDir)
+    return mainDir, archiveDir
+
+
+def write(mainDir, path, text):
+    with open(mainDir + path, 'w') as f:
+        f.write(text)
+
+
+def test_keeps_the_last_versions_and_shares_identical_content(dirs):
+    mainDir, _ = dirs
+    store = archive_store.ArchiveStore()
+    for text in ('a', 'b', 'a', 'c'):
+        write(mainDir, 'indicators/s.json', text)
+        assert store.archive('indicators/s.json', archiveCount=3)
+    versions = store.list_versions(mainDir + 'indicators/s.json')
+    assert [store.read('indicators/s.json', v['version']) for v in versions] == [b'c', b'a', b'b']
+    # Four archives of three distinct contents, of which the ring keeps three
+    objects = [name for name in os.listdir(store.versionDir('indicators/s.json')) if name != 'index.json']
+    assert len(objects) == 3
+    with pytest.raises(IndexError):
+        store.read('indicators/s.json', 3)
+
+
+def test_compressed_versions_restore(dirs):
+    mainDir, _ = dirs
+    store = archive_store.ArchiveStore(compress=True)
+    for text in ('one', 'two'):
+        write(mainDir, 's.json', text)
+        store.archive('s.json')
+    assert [v['compressed'] for v in store.list_versions('s.json')] == [False, True]
+    write(mainDir, 's.json', 'three')
+    assert store.restore('s.json', 1)
+    with open(mainDir + 's.json') as f:
+        assert f.read() == 'one'
+    assert store.read('s.json', 0) == b'three'
+
+
+def test_directories_follow_value_setter(dirs, monkeypatch, tmp_path):
+    mainDir, archiveDir = dirs
+    write(mainDir, 's.json', 'x')
+    assert archive_store.archive_store.archive('s.json')
+    assert os.path.isdir(archiveDir + 's.json.versions')
+    otherMain = str(tmp_path / 'other') + '/'
+    os.makedirs(otherMain)
+    monkeypatch.setattr(archive_store.value_setter, 'mainDir', otherMain)
+    monkeypatch.setattr(archive_store.value_setter, 'archiveDir', otherMain + 'archive/')
+    write(otherMain, 's.json', 'y')
+    assert archive_store.archive_store.archive('s.json')
+    assert archive_store.archive_store.read('s.json') == b'y'
+
+
+def test_legacy_copies_are_read_then_imported(dirs):
+    mainDir, archiveDir = dirs
+    os.makedirs(archiveDir + 'indicators')
+    write(archiveDir, 'indicators/s0.json', 'newest legacy')
+    write(archiveDir, 'indicators/s1.json', 'oldest legacy')
+    store = archive_store.ArchiveStore()
+    versions = store.list_versions('indicators/s.json')
+    assert [v['size'] for v in versions] == [13, 13] and all('file' in v for v in versions)
+    assert store.read('indicators/s.json', 1) == b'oldest legacy'
+    write(mainDir, 'indicators/s.json', 'current')
+    assert store.archive('indicators/s.json')
+    versions = store.list_versions('indicators/s.json')
+    assert not any('file' in v for v in versions)
+    assert [store.read('indicators/s.json', v['version']) for v in versions] == [b'current', b'newest legacy', b'oldest legacy']
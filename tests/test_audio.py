@@ -0,0 +1,128 @@
+import time
+import threading
+import pytest
+import audio
+
+
+@pytest.fixture
+def driver():
+    return audio.NullDriver()
+
+
+@pytest.fixture
+def worker(driver, tmp_path):
+    w = audio.SpeechWorker(driver, audio.PhraseCache(str(tmp_path / 'tts'), maxChars=50))
+    yield w
+    w.stop(drain=False)
+
+
+def test_repeated_phrase_is_rendered_once(worker, driver, monkeypatch):
+    renders = []
+    render = driver.render
+    monkeypatch.setattr(driver, 'render', lambda *args: (renders.append(args[0]), render(*args)))
+    for _ in range(3):
+        assert worker.say('Good morning').wait(5)
+    assert renders == ['Good morning']
+    assert [kind for kind, *_ in driver.spoken] == ['play'] * 3
+    assert worker.stats()['cache']['hits'] == 2
+
+
+def test_long_text_is_spoken_directly(worker, driver):
+    text = 'x' * 60
+    u = worker.say(text)
+    assert u.wait(5) and u.status == 'done'
+    assert driver.spoken == [('speak', text, 210, 1.0, 'alternate')]
+
+
+def test_priority_order_and_cancel(worker, driver, monkeypatch):
+    release = threading.Event()
+    speak = driver.speak
+    monkeypatch.setattr(driver, 'speak', lambda *args: (release.wait(5), speak(*args)))
+    blocker = worker.say('b' * 60)
+    low = worker.say('l' * 60, priority=5)
+    high = worker.say('h' * 60, priority=0)
+    dropped = worker.say('d' * 60, priority=1)
+    dropped.cancel()
+    release.set()
+    for u in (blocker, low, high, dropped):
+        assert u.wait(5)
+    assert dropped.status == 'cancelled'
+    assert [text[0] for _, text, *_ in driver.spoken] == ['b', 'h', 'l']
+
+
+def test_interrupt_drops_queued_speech(worker, driver, monkeypatch):
+    release = threading.Event()
+    speak = driver.speak
+    monkeypatch.setattr(driver, 'speak', lambda *args: (release.wait(5), speak(*args)))
+    monkeypatch.setattr(driver, 'stop', release.set)
+    current = worker.say('c' * 60)
+    queued = worker.say('q' * 60)
+    while current.status != 'speaking':
+        time.sleep(0.01)
+    urgent = worker.say('u' * 60, interrupt=True)
+    assert urgent.wait(5) and urgent.status == 'done'
+    assert queued.status == 'cancelled'
+    assert current.wait(5) and current.status == 'cancelled'
+
+
+def test_unknown_voice_fails_the_utterance(worker):
+    u = worker.say('hello', voice_index=9)
+    assert u.wait(5) and u.status == 'failed'
+    assert isinstance(u.error, IndexError)
+
+
+def test_say_after_stop_without_a_thread(worker, driver):
+    worker.stop()
+    assert worker.say('one').wait(5)
+    two = worker.say('two')
+    assert two.wait(5) and two.status == 'done'
+
+
+def test_default_worker_drains_at_exit(monkeypatch):
+    registered = []
+    monkeypatch.setattr(audio, '_worker', None)
+    monkeypatch.setattr(audio.atexit, 'register', lambda func, *args, **kwargs: registered.append((func, kwargs)))
+    worker = audio.default_worker()
+    assert audio.default_worker() is worker
+    assert registered == [(worker.stop, {'drain': True})]
+
+
+class NoPlayerDriver(audio.NullDriver):
+    def can_play(self):
+        return False
+
+    def render(self, *args):
+        raise AssertionError('rendered without a player')
+
+
+def test_without_a_player_phrases_are_spoken_without_rendering(tmp_path):
+    driver = NoPlayerDriver()
+    cache = audio.PhraseCache(str(tmp_path / 'tts'), maxChars=50)
+    worker = audio.SpeechWorker(driver, cache)
+    try:
+        u = worker.say('Good morning')
+        assert u.wait(5) and u.status == 'done'
+        assert driver.spoken == [('speak', 'Good morning', 210, 1.0, 'alternate')]
+        assert cache.stats()['entries'] == 0
+    finally:
+        worker.stop()
+
+
+def test_player_missing_at_play_time_falls_back_to_speech(worker, driver, monkeypatch):
+    def play(path):
+        raise audio.NoPlayerError('No audio player found')
+    monkeypatch.setattr(driver, 'play', play)
+    u = worker.say('Good morning')
+    assert u.wait(5) and u.status == 'done'
+    assert driver.spoken == [('speak', 'Good morning', 210, 1.0, 'alternate')]
+
+
+def test_pyttsx3_driver_looks_for_a_player_once(monkeypatch):
+    lookups = []
+    monkeypatch.setattr(audio.sys, 'platform', 'linux')
+    monkeypatch.setattr(audio.shutil, 'which', lambda name: lookups.append(name))
+    driver = audio.Pyttsx3Driver()
+    assert not driver.can_play() and not driver.can_play()
+    with pytest.raises(audio.NoPlayerError):
+        driver.play('phrase.wav')
+    assert lookups == ['aplay', 'paplay', 'afplay']
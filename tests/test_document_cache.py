@@ -0,0 +1,72 @@
+import os
+import copy
+import pytest
+import document_cache
+import file_management
+
+
+def test_least_recently_used_documents_are_evicted_past_the_budget():
+    cache = document_cache.DocumentCache(max_bytes=10)
+    cache.put('a', 1, {'v': 'a'}, 4)
+    cache.put('b', 1, {'v': 'b'}, 4)
+    assert cache.get('a', 1) == {'v': 'a'}
+    cache.put('c', 1, {'v': 'c'}, 4)
+    assert cache.get('b', 1) is None
+    assert cache.get('a', 1) == {'v': 'a'}
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] == 8
+
+
+def test_changed_signature_is_a_miss():
+    cache = document_cache.DocumentCache(max_bytes=100)
+    cache.put('a', (1, 2), {'v': 1}, 4)
+    assert cache.get('a', (1, 3)) is None
+    assert cache.stats()['entries'] == 0
+    assert cache.stats()['misses'] == 1
+
+
+def test_documents_larger_than_the_budget_are_not_cached():
+    cache = document_cache.DocumentCache(max_bytes=10)
+    assert cache.put('a', 1, {'v': 1}, 11) == {'v': 1}
+    assert cache.get('a', 1) is None
+
+
+def test_cached_documents_are_read_only_and_copy_to_plain_containers():
+    frozen = document_cache.freeze({'a': [1, {'b': 2}]})
+    with pytest.raises(TypeError):
+        frozen['a'] = 1
+    with pytest.raises(TypeError):
+        frozen['a'].append(3)
+    with pytest.raises(TypeError):
+        frozen['a'][1]['b'] = 3
+    for copied in (copy.deepcopy(frozen), document_cache.thaw(frozen)):
+        assert type(copied) is dict and type(copied['a']) is list and type(copied['a'][1]) is dict
+        copied['a'][1]['b'] = 3
+    assert frozen == {'a': [1, {'b': 2}]}
+
+
+def test_getJsonDict_serves_repeated_reads_from_the_cache():
+    file_management.updateJsonFile({'n': 1}, 'cached.json')
+    before = file_management.cacheStats()['hits']
+    first = file_management.getJsonDict('cached.json')
+    second = file_management.getJsonDict('cached.json', readonly=True)
+    assert first == second == {'n': 1}
+    assert file_management.cacheStats()['hits'] > before
+    # The default result is a private copy
+    first['n'] = 2
+    assert file_management.getJsonDict('cached.json') == {'n': 1}
+
+
+def test_getJsonDict_rereads_a_file_changed_by_another_writer():
+    file_management.updateJsonFile({'n': 1}, 'external.json')
+    assert file_management.getJsonDict('external.json') == {'n': 1}
+    path = file_management.storage.localPath('external.json')
+    with open(path, 'w') as f:
+        f.write('{"n": 2, "changed": true}')
+    # A different size alone changes the signature
+    assert file_management.getJsonDict('external.json') == {'n': 2, 'changed': True}
+
+
+def test_getJsonDict_creates_a_missing_document():
+    assert file_management.getJsonDict('missing.json') == {}
+    assert os.path.exists(file_management.storage.localPath('missing.json'))
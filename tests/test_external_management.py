@@ -0,0 +1,197 @@
+import json
+import gzip
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+import requests
+import json_patch
+import external_management
+
+
+class StandIn:
+    """A local HTTP server recording each request; `respond(body)` picks the status code."""
+
+    def __init__(self, respond=None, delay=0.0):
+        self.respond = respond or (lambda body: 200)
+        self.delay = delay
+        self.requests = []
+        self.active = 0
+        self.maxActive = 0
+        self._lock = threading.Lock()
+        standIn = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                with standIn._lock:
+                    standIn.active += 1
+                    standIn.maxActive = max(standIn.maxActive, standIn.active)
+                raw = self.rfile.read(int(self.headers['Content-Length']))
+                encoding = self.headers.get('Content-Encoding')
+                body = json.loads(gzip.decompress(raw) if encoding == 'gzip' else raw)
+                standIn.requests.append({'body': body, 'encoding': encoding, 'size': len(raw)})
+                time.sleep(standIn.delay)
+                status = standIn.respond(body)
+                with standIn._lock:
+                    standIn.active -= 1
+                self.send_response(status)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'{}')
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/api'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_client(**kwargs):
+    kwargs.setdefault('backoff', 0.001)
+    kwargs.setdefault('delta', False)
+    return external_management.ApiClient(**kwargs)
+
+
+def test_transient_errors_are_retried():
+    statuses = [503, 502, 200]
+    standIn = StandIn(lambda body: statuses.pop(0))
+    try:
+        with make_client(retries=3) as client:
+            response = client.post_data({'a': 1}, 'notes.json', standIn.url)
+        assert response.status_code == 200
+        assert len(standIn.requests) == 3
+    finally:
+        standIn.close()
+
+
+def test_retries_give_up_with_the_last_response():
+    standIn = StandIn(lambda body: 503)
+    try:
+        with make_client(retries=2) as client:
+            with pytest.raises(requests.HTTPError):
+                client.post_data({'a': 1}, 'notes.json', standIn.url)
+        assert len(standIn.requests) == 3
+    finally:
+        standIn.close()
+
+
+def test_client_errors_are_not_retried():
+    standIn = StandIn(lambda body: 400)
+    try:
+        with make_client(retries=3) as client:
+            assert client.request('POST', standIn.url, data=b'{}').status_code == 400
+        assert len(standIn.requests) == 1
+    finally:
+        standIn.close()
+
+
+def test_connection_errors_are_retried_then_raised(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(external_management.time, 'sleep', sleeps.append)
+    standIn = StandIn()
+    url = standIn.url
+    standIn.close()
+    with make_client(retries=2, backoff=1, maxBackoff=3) as client:
+        with pytest.raises(requests.ConnectionError):
+            client.post_data({'a': 1}, 'notes.json', url)
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 1 and 0 <= sleeps[1] <= 2
+
+
+def test_post_many_keeps_order_and_limits_each_host():
+    standIn = StandIn(lambda body: 500 if body['path'] == 'bad.json' else 200, delay=0.05)
+    try:
+        items = [({'n': n}, f'{n}.json', standIn.url) for n in range(8)] + [({}, 'bad.json', standIn.url)]
+        with make_client(retries=0, maxWorkers=8, perHost=2) as client:
+            results = client.post_many(items)
+        assert [r.status_code for r in results[:8]] == [200] * 8
+        assert isinstance(results[8], requests.HTTPError)
+        assert standIn.maxActive <= 2
+    finally:
+        standIn.close()
+
+
+class DeltaListener(StandIn):
+    """Keeps the stored document and answers patches for another base with 409, like the listener."""
+
+    def __init__(self):
+        self.document = None
+        super().__init__(self._apply)
+
+    def _apply(self, body):
+        if 'data' in body:
+            self.document = body['data']
+            return 201
+        if json_patch.document_hash(self.document) != body['base']:
+            return 409
+        self.document = json_patch.merge_patch(self.document, body['patch'])
+        return 201
+
+
+def test_delta_mode_sends_patches_against_the_acknowledged_version():
+    standIn = DeltaListener()
+    document = {'name': 'sensor', 'readings': list(range(50)), 'state': 'idle'}
+    try:
+        with make_client(delta=True) as client:
+            client.post_data(document, 'sensor.json', standIn.url)
+            document['state'] = 'busy'
+            client.post_data(document, 'sensor.json', standIn.url)
+            document['state'] = 'idle'
+            document.pop('name')
+            client.post_data(document, 'sensor.json', standIn.url)
+        bodies = [r['body'] for r in standIn.requests]
+        assert 'data' in bodies[0]
+        assert bodies[1]['patch'] == {'state': 'busy'}
+        assert bodies[2]['patch'] == {'state': 'idle', 'name': None}
+        assert standIn.document == document
+    finally:
+        standIn.close()
+
+
+def test_delta_conflict_falls_back_to_the_full_document():
+    standIn = DeltaListener()
+    document = {'readings': list(range(50)), 'state': 'idle'}
+    try:
+        with make_client(delta=True) as client:
+            client.post_data(document, 'sensor.json', standIn.url)
+            # Another writer changes the listener's copy
+            standIn.document = {'other': True}
+            document['state'] = 'busy'
+            assert client.post_data(document, 'sensor.json', standIn.url).status_code == 201
+            client.forget(filepath='sensor.json')
+            client.post_data(document, 'sensor.json', standIn.url)
+        assert [list(r['body'])[0] for r in standIn.requests] == ['data', 'patch', 'data', 'data']
+        assert standIn.document == document
+    finally:
+        standIn.close()
+
+
+def test_patches_that_are_not_smaller_are_sent_as_documents():
+    standIn = DeltaListener()
+    try:
+        with make_client(delta=True) as client:
+            client.post_data({'a': 1}, 'small.json', standIn.url)
+            client.post_data({'b': 2}, 'small.json', standIn.url)
+        assert ['data' in r['body'] for r in standIn.requests] == [True, True]
+    finally:
+        standIn.close()
+
+
+def test_large_bodies_are_gzip_compressed():
+    standIn = StandIn()
+    try:
+        with make_client(gzipThreshold=100) as client:
+            client.post_data({'a': 1}, 'small.json', standIn.url)
+            client.post_data({'text': 'x' * 1000}, 'large.json', standIn.url)
+        assert [r['encoding'] for r in standIn.requests] == [None, 'gzip']
+        assert standIn.requests[1]['size'] < 100
+        assert standIn.requests[1]['body']['data'] == {'text': 'x' * 1000}
+    finally:
+        standIn.close()
@@ -0,0 +1,117 @@
+import time
+import threading
+import pytest
+import function_registry
+import object_management as om
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def counter():
+    calls = []
+
+    def func():
+        calls.append(1)
+        return len(calls)
+    return func, calls
+
+
+def test_render_policy_evaluates_once_per_render():
+    registry = function_registry.FunctionRegistry()
+    func, calls = counter()
+    registry.register('f', func)
+    entry = registry.get('f')
+    render = {}
+    assert [registry.call(entry, render) for _ in range(3)] == [1, 1, 1]
+    assert registry.call(entry, {}) == 2
+    assert len(calls) == 2
+
+
+def test_never_policy_evaluates_every_time():
+    registry = function_registry.FunctionRegistry()
+    func, calls = counter()
+    registry.register('f', func, cache='never')
+    render = {}
+    assert [registry.call(registry.get('f'), render) for _ in range(3)] == [1, 2, 3]
+
+
+def test_ttl_results_are_shared_until_they_expire():
+    clock = Clock()
+    registry = function_registry.FunctionRegistry(clock=clock)
+    func, calls = counter()
+    registry.register('f', func, cache='ttl', ttl=10)
+    entry = registry.get('f')
+    assert registry.call(entry, {}) == 1
+    clock.now += 9
+    assert registry.call(entry, {}) == 1
+    clock.now += 1
+    assert registry.call(entry, {}) == 2
+    registry.invalidate('f')
+    assert registry.call(entry, {}) == 3
+    stats = registry.stats()
+    assert stats['functions']['f']['evaluations'] == 3
+    assert stats['hits'] == 1 and stats['lookups'] == 4
+
+
+def test_concurrent_ttl_misses_share_one_evaluation():
+    registry = function_registry.FunctionRegistry()
+    started = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return 'value'
+
+    registry.register('slow', slow, cache='ttl', ttl=60)
+    entry = registry.get('slow')
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.call(entry))) for _ in range(4)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert results == ['value'] * 4
+    assert len(calls) == 1
+
+
+def test_errors_are_not_cached():
+    registry = function_registry.FunctionRegistry()
+    results = [ValueError('first call fails'), 'ok']
+
+    def flaky():
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    registry.register('flaky', flaky, cache='ttl', ttl=60)
+    with pytest.raises(ValueError):
+        registry.call(registry.get('flaky'))
+    assert registry.call(registry.get('flaky')) == 'ok'
+
+
+def test_invalid_policies_are_rejected():
+    registry = function_registry.FunctionRegistry()
+    with pytest.raises(ValueError):
+        registry.register('f', lambda: 1, cache='forever')
+    with pytest.raises(ValueError):
+        registry.register('f', lambda: 1, cache='ttl')
+
+
+def test_stringFormatter_calls_a_render_function_once(monkeypatch):
+    monkeypatch.setattr(function_registry, 'registry', function_registry.FunctionRegistry())
+    func, calls = counter()
+    function_registry.register('tick', func)
+    assert om.stringFormatter('{tick} and {tick}') == '1 and 1'
+    assert om.stringFormatter('{tick}') == '2'
+    assert function_registry.stats()['functions']['tick']['evaluations'] == 2
@@ -0,0 +1,105 @@
+import random
+import threading
+import pytest
+import instrumentation
+import listener
+import file_management
+
+
+@pytest.fixture
+def metrics():
+    instrumentation.reset()
+    instrumentation.enable()
+    yield instrumentation
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+def test_histogram_percentiles_are_within_the_bucket_precision():
+    values = [random.randint(1, 10 ** 9) for _ in range(10000)]
+    histogram = instrumentation.Histogram()
+    for value in values:
+        histogram.record(value)
+    values.sort()
+    for q in (0.5, 0.9, 0.99):
+        exact = values[round(q * len(values)) - 1]
+        assert abs(histogram.percentile(q) - exact) <= exact / 16
+    assert (histogram.min, histogram.max, histogram.count) == (values[0], values[-1], 10000)
+    assert instrumentation.Histogram().percentile(0.5) == 0
+
+
+def test_small_values_are_exact():
+    histogram = instrumentation.Histogram()
+    for value in range(1, 32):
+        histogram.record(value)
+    assert histogram.percentile(0.5) == 16
+
+
+def test_nothing_is_recorded_while_disabled():
+    instrumentation.reset()
+    assert not instrumentation.is_enabled()
+    with instrumentation.span('disabled.span'):
+        pass
+    instrumentation.count('disabled.counter')
+    assert instrumentation.collect() == {'spans': {}, 'counters': {}}
+
+
+def test_spans_and_counters_from_every_thread_are_collected(metrics):
+    def work():
+        for _ in range(10):
+            with metrics.span('work'):
+                metrics.count('items', 2)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    work()
+    collected = metrics.collect()
+    assert collected['spans']['work'].count == 50
+    assert collected['counters']['items'] == 100
+
+
+def test_failed_calls_are_counted_as_errors(metrics):
+    @metrics.timed('flaky')
+    def flaky():
+        raise ValueError('failed')
+
+    with pytest.raises(ValueError):
+        flaky()
+    with pytest.raises(KeyError):
+        with metrics.span('block'):
+            raise KeyError('missing')
+    summary = metrics.summarize()
+    assert summary['counters'] == {'block.errors': 1, 'flaky.errors': 1}
+    assert summary['spans']['flaky']['count'] == 1 and 'p99_9_ms' in summary['spans']['flaky']
+
+
+def test_results_of_several_processes_merge(metrics):
+    metrics.record('span', 1000)
+    metrics.count('counter')
+    merged = metrics.merge([metrics.collect(), None, metrics.collect()])
+    assert merged['spans']['span'].count == 2
+    assert merged['counters']['counter'] == 2
+
+
+def test_file_operations_are_timed(metrics):
+    file_management.updateJsonFile({'a': 1}, 'timed.json')
+    file_management.getJsonDict('timed.json')
+    spans = metrics.collect()['spans']
+    assert spans['file.updateJsonFile'].count == 1
+    assert spans['file.getJsonDict'].count == 1
+
+
+def test_metrics_endpoint(metrics, monkeypatch):
+    monkeypatch.setattr(listener, 'router', None)
+    metrics.record('a "quoted" span', 2_000_000)
+    metrics.count('events', 3)
+    http = listener.app.test_client()
+    text = http.get('/metrics').get_data(as_text=True)
+    assert 'aw_span_seconds_count{span="a \\"quoted\\" span"} 1' in text
+    assert 'aw_events_total{name="events"} 3' in text
+    assert 'aw_instrumentation_enabled 1' in text
+    summary = http.get('/metrics?format=json').get_json()
+    assert summary['spans']['a "quoted" span']['count'] == 1
@@ -0,0 +1,103 @@
+import pytest
+import json_patch
+import file_management
+from document_cache import freeze
+
+
+def test_merge_patch_merges_objects_and_deletes_null_members():
+    document = {'a': {'b': 1, 'c': 2}, 'd': [1, 2], 'e': 'x'}
+    patched = json_patch.merge_patch(document, {'a': {'b': None, 'f': 3}, 'd': [3], 'e': None})
+    assert patched == {'a': {'c': 2, 'f': 3}, 'd': [3]}
+    assert document == {'a': {'b': 1, 'c': 2}, 'd': [1, 2], 'e': 'x'}
+
+
+def test_pointer_operations():
+    document = freeze({'a': {'b/c': 1}, 'l': [1, 2]})
+    patched = json_patch.apply_patch(document, [
+        {'op': 'set', 'path': '/a/b~1c', 'value': 2},
+        {'op': 'set', 'path': '/x/y', 'value': True},
+        {'op': 'set', 'path': '/l/-', 'value': 3},
+        {'op': 'set', 'path': '/l/0', 'value': 0},
+        {'op': 'delete', 'path': '/missing/key'},
+        {'op': 'delete', 'path': '/l/1'},
+    ])
+    assert patched == {'a': {'b/c': 2}, 'x': {'y': True}, 'l': [0, 3]}
+
+
+@pytest.mark.parametrize('patch', [
+    'not a patch',
+    [{'op': 'move', 'path': '/a'}],
+    [{'op': 'set', 'path': 'a', 'value': 1}],
+    [{'op': 'set', 'path': '/a'}],
+    [{'op': 'set', 'path': '/l/5', 'value': 1}],
+    [{'op': 'set', 'path': '/s/t', 'value': 1}],
+    [{'op': 'delete', 'path': ''}],
+])
+def test_malformed_patches_are_rejected(patch):
+    with pytest.raises(ValueError):
+        json_patch.apply_patch({'l': [], 's': 'scalar'}, patch)
+
+
+def test_patchJsonFile_journals_and_compacts(monkeypatch):
+    monkeypatch.setattr(file_management.value_setter, 'journalMaxEntries', 3)
+    storage = file_management.storage
+    file_management.updateJsonFile({'count': 0, 'keep': True}, 'patched.json')
+    snapshot = storage.read('patched.json')
+    for count in range(1, 4):
+        assert file_management.patchJsonFile('patched.json', {'count': count})
+        assert file_management.getJsonDict('patched.json') == {'count': count, 'keep': True}
+        # The snapshot is left alone while the journal holds the patches
+        assert storage.read('patched.json') == snapshot
+    assert storage.signature('patched.json.journal') is not None
+    assert file_management.patchJsonFile('patched.json', [{'op': 'delete', 'path': '/keep'}])
+    # The fourth patch compacts the journal into a new snapshot
+    assert storage.signature('patched.json.journal') is None
+    assert file_management.getJsonDict('patched.json') == {'count': 3}
+
+
+def test_full_write_discards_the_journal():
+    file_management.updateJsonFile({'a': 1}, 'rewritten.json')
+    file_management.patchJsonFile('rewritten.json', {'b': 2})
+    file_management.updateJsonFile({'c': 3}, 'rewritten.json')
+    assert file_management.getJsonDict('rewritten.json') == {'c': 3}
+
+
+def test_stale_journal_is_ignored():
+    storage = file_management.storage
+    file_management.updateJsonFile({'a': 1}, 'stale.json')
+    file_management.patchJsonFile('stale.json', {'b': 2})
+    # Replace the snapshot behind the journal's back, as an interrupted compaction would
+    with open(storage.localPath('stale.json'), 'w') as f:
+        f.write('{"a": 10}')
+    assert file_management.getJsonDict('stale.json') == {'a': 10}
+
+
+def test_invalid_patch_leaves_the_document_unchanged():
+    file_management.updateJsonFile({'a': 1}, 'invalid.json')
+    assert file_management.patchJsonFile('invalid.json', [{'op': 'set', 'path': '/a/b', 'value': 1}]) is False
+    assert file_management.getJsonDict('invalid.json') == {'a': 1}
+
+
+@pytest.mark.parametrize('source, target', [
+    ({'a': 1, 'b': {'c': 2, 'd': 3}}, {'a': 1, 'b': {'c': 4}, 'e': [1]}),
+    ({'a': {'b': 1}}, {'a': 5}),
+    ({'a': 1}, {'a': 1.0}),
+    ({'a': [1, 2]}, {'a': [1, 2]}),
+    ([1], {'a': {}}),
+])
+def test_created_merge_patches_reproduce_the_target(source, target):
+    patch = json_patch.create_merge_patch(source, target)
+    assert json_patch.merge_patch(source, patch) == target
+    assert type(json_patch.merge_patch(source, patch).get('a')) is type(target.get('a'))
+
+
+def test_unreachable_targets_are_rejected():
+    with pytest.raises(ValueError):
+        json_patch.create_merge_patch({'a': 1}, {'a': None})
+    with pytest.raises(ValueError):
+        json_patch.create_merge_patch({'a': 1}, None)
+
+
+def test_document_hash_ignores_key_order_and_formatting():
+    assert json_patch.document_hash({'a': 1, 'b': [1, {'c': 2}]}) == json_patch.document_hash({'b': [1, {'c': 2}], 'a': 1})
+    assert json_patch.document_hash({'a': 1}) != json_patch.document_hash({'a': 2})
@@ -0,0 +1,57 @@
+import json
+import random
+import pytest
+import json_stream
+
+
+def resolve(document, path):
+    for key in path:
+        if not isinstance(document, dict):
+            return None
+        document = document.get(key)
+    return document
+
+
+def check(tmp_path, text, paths):
+    filename = tmp_path / 'document.json'
+    filename.write_text(text)
+    expected = {tuple(path): resolve(json.loads(text), path) for path in paths}
+    for use_mmap in (False, True):
+        for chunk_size in (1, 7, 64 * 1024):
+            assert json_stream.extract_paths(str(filename), paths, use_mmap=use_mmap, chunk_size=chunk_size) == expected
+
+
+def test_extracts_nested_paths(tmp_path):
+    document = {'a': {'b': [1, {'c': 'x'}], 'd': 'q"\\uote'}, 'e': None, 'big': ['skip'] * 100, 's': 'text \\"}]'}
+    check(tmp_path, json.dumps(document), [('a', 'b'), ('a', 'd'), ('e',), ('missing',), ('s',), ('a', 'b', 'c'), ('a',)])
+
+
+def test_duplicate_keys_keep_the_last_occurrence(tmp_path):
+    text = ('{"a": {"b": 1, "b": 2, "c": 3}, "x": 1, "a": {"b": 4}, "x": {"y": 5}, '
+            '"n": {"m": {"k": 1}}, "n": 7, "x": {"y": 6, "z": 0}}')
+    check(tmp_path, text, [('a', 'b'), ('a', 'c'), ('x',), ('x', 'y'), ('n', 'm', 'k'), ('n',)])
+
+
+def test_random_documents_match_json_load(tmp_path):
+    rng = random.Random(3)
+    keys = ['a', 'b', 'c']
+
+    def value(depth):
+        if depth > 2 or rng.random() < 0.3:
+            return json.dumps(rng.choice([1, 'v', None, [1, 2]]))
+        items = [f'"{rng.choice(keys)}": {value(depth + 1)}' for _ in range(rng.randint(0, 4))]
+        return '{' + ', '.join(items) + '}'
+
+    paths = [('a',), ('b', 'c'), ('a', 'a', 'b'), ('c', 'a')]
+    for _ in range(50):
+        text = value(0)
+        if not text.startswith('{'):
+            continue
+        check(tmp_path, text, paths)
+
+
+def test_invalid_document_raises(tmp_path):
+    filename = tmp_path / 'broken.json'
+    filename.write_text('{"a": [1, 2')
+    with pytest.raises(ValueError):
+        json_stream.extract_paths(str(filename), [('b',)])
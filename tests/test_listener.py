@@ -0,0 +1,171 @@
+import json
+import gzip
+import concurrent.futures
+import pytest
+import listener
+import file_management
+import json_patch
+
+
+class StandInRouter:
+    """Owns every path from worker 1, whose write queue holds 5 updates."""
+    count = 2
+    callTimeout = 0.1
+
+    def __init__(self, stalled=False):
+        self.stalled = stalled
+
+    def owner(self, path):
+        return 1
+
+    def call(self, worker, operation, *args):
+        if self.stalled:
+            raise concurrent.futures.TimeoutError()
+        if operation == 'submit':
+            return 'abc', 5
+        if operation == 'status':
+            return ({'path': 'notes.json', 'state': 'queued'} if args[0] == 'abc' else None), 5
+        raise AssertionError(operation)
+
+
+def client(monkeypatch, router):
+    monkeypatch.setattr(listener, 'router', router)
+    return listener.app.test_client()
+
+
+@pytest.fixture
+def stalled(monkeypatch):
+    return client(monkeypatch, StandInRouter(stalled=True))
+
+
+def test_owner_timeout_answers_504_with_unknown_outcome(stalled):
+    response = stalled.post('/api', json={'path': 'notes.json', 'data': {'a': 1}})
+    assert response.status_code == 504
+    assert 'unknown' in response.get_json()['error']
+
+
+def test_patch_owner_timeout_answers_504(stalled):
+    response = stalled.post('/api', json={'path': 'notes.json', 'patch': {'a': 2}, 'base': 'x'})
+    assert response.status_code == 504
+    assert response.get_json()['path'] == 'notes.json'
+
+
+def test_queued_update_and_status_owner_timeout_answer_504(stalled):
+    response = stalled.post('/api', json={'path': 'notes.json', 'data': {'a': 1}}, headers={'Prefer': 'respond-async'})
+    assert response.status_code == 504
+    assert stalled.get('/api/status/1.abc').status_code == 504
+
+
+def test_queue_depth_is_the_owning_workers(monkeypatch):
+    http = client(monkeypatch, StandInRouter())
+    assert listener.writes.depth() == 0
+    response = http.post('/api', json={'path': 'notes.json', 'data': {'a': 1}}, headers={'Prefer': 'respond-async'})
+    assert response.status_code == 202
+    assert response.get_json()['id'] == '1.abc' and response.get_json()['queue_depth'] == 5
+    status = http.get('/api/status/1.abc')
+    assert status.status_code == 200 and status.get_json()['queue_depth'] == 5
+    unknown = http.get('/api/status/1.zzz')
+    assert unknown.status_code == 404 and unknown.get_json()['queue_depth'] == 5
+
+
+def test_queued_update_without_cluster(monkeypatch):
+    http = client(monkeypatch, None)
+    response = http.post('/api', json={'path': 'queued.json', 'data': {'a': 1}}, headers={'Prefer': 'respond-async'})
+    assert response.status_code == 202
+    listener.writes.join(5)
+    status = http.get(response.headers['Location'])
+    assert status.status_code == 200 and 'queue_depth' in status.get_json()
+
+
+def bulk(http, *updates, **kwargs):
+    body = '\n'.join(json.dumps(update) for update in updates)
+    return http.post('/api/bulk', data=body, content_type='application/x-ndjson', **kwargs)
+
+
+def test_bulk_updates_are_grouped_by_path_and_applied_in_order(monkeypatch):
+    http = client(monkeypatch, None)
+    file_management.updateJsonFile({'a': 1}, 'bulk_b.json')
+    response = bulk(http, {'path': 'bulk_a.json', 'data': {'x': 1}}, {'path': 'bulk_b.json', 'patch': {'b': 2}},
+                    {'path': 'bulk_a.json', 'patch': {'y': 2}}, {'path': 'bulk_a.json'},
+                    {'path': 'bulk_b.json', 'patch': [{'op': 'bogus'}]})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['items'] == 5 and body['paths'] == 2
+    assert [('update' in r, 'error' in r) for r in body['results']] == [(True, False)] * 3 + [(False, True)] * 2
+    assert file_management.getJsonDict('bulk_a.json') == {'x': 1, 'y': 2}
+    assert file_management.getJsonDict('bulk_b.json') == {'a': 1, 'b': 2}
+
+
+def test_bulk_explicit_null_data_is_written_not_loaded(monkeypatch):
+    http = client(monkeypatch, None)
+    file_management.updateJsonFile({'a': 1}, 'bulk_null.json')
+    response = bulk(http, {'path': 'bulk_null.json', 'data': None}, {'path': 'bulk_null.json', 'patch': {'b': 2}})
+    assert response.status_code == 200
+    assert file_management.getJsonDict('bulk_null.json') == {'b': 2}
+
+
+def test_bulk_rejects_oversized_and_malformed_bodies(monkeypatch):
+    http = client(monkeypatch, None)
+    monkeypatch.setattr(listener.value_setter, 'bulkMaxBytes', 10)
+    assert bulk(http, {'path': 'big.json', 'data': 'x' * 20}).status_code == 413
+    monkeypatch.setattr(listener.value_setter, 'bulkMaxBytes', 1000)
+    assert http.post('/api/bulk', data='{"path": "a.json", ', content_type='application/x-ndjson').status_code == 400
+
+
+def test_queued_update_is_written_and_reported_done(monkeypatch):
+    http = client(monkeypatch, None)
+    response = http.post('/api', json={'path': 'queued_done.json', 'data': {'b': 2}}, headers={'Prefer': 'respond-async'})
+    assert response.status_code == 202
+    assert listener.writes.join(5)
+    assert http.get(response.headers['Location']).get_json()['state'] == 'done'
+    assert file_management.getJsonDict('queued_done.json') == {'b': 2}
+    assert http.get('/api/queue').get_json()['completed'] >= 1
+
+
+def test_full_write_queue_answers_503(monkeypatch):
+    http = client(monkeypatch, None)
+
+    def refuse(*args):
+        raise listener.write_queue.QueueFull('full')
+
+    monkeypatch.setattr(listener.writes, 'submit', refuse)
+    response = http.post('/api', json={'path': 'full.json', 'data': {}}, headers={'Prefer': 'respond-async'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_patch_is_applied_only_to_its_base_version(monkeypatch):
+    http = client(monkeypatch, None)
+    file_management.updateJsonFile({'a': 1}, 'delta.json')
+    base = json_patch.document_hash({'a': 1})
+    response = http.post('/api', json={'path': 'delta.json', 'patch': {'b': 2}, 'base': base})
+    assert response.status_code == 201
+    assert file_management.getJsonDict('delta.json') == {'a': 1, 'b': 2}
+    conflict = http.post('/api', json={'path': 'delta.json', 'patch': {'c': 3}, 'base': base})
+    assert conflict.status_code == 409
+    assert conflict.get_json()['hash'] == json_patch.document_hash({'a': 1, 'b': 2})
+    assert file_management.getJsonDict('delta.json') == {'a': 1, 'b': 2}
+
+
+def test_gzip_bodies_are_accepted(monkeypatch):
+    http = client(monkeypatch, None)
+    body = gzip.compress(json.dumps({'path': 'gzipped.json', 'data': {'a': 1}}).encode())
+    response = http.post('/api', data=body, content_type='application/json', headers={'Content-Encoding': 'gzip'})
+    assert response.status_code == 201
+    assert file_management.getJsonDict('gzipped.json') == {'a': 1}
+    updates = '\n'.join(json.dumps({'path': 'gzipped.json', 'patch': {'n': n}}) for n in range(3)).encode()
+    response = http.post('/api/bulk', data=gzip.compress(updates), content_type='application/x-ndjson',
+                         headers={'Content-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert file_management.getJsonDict('gzipped.json') == {'a': 1, 'n': 2}
+    invalid = http.post('/api', data=b'not gzip', content_type='application/json', headers={'Content-Encoding': 'gzip'})
+    assert invalid.status_code == 400
+
+
+def test_gzip_size_limit_applies_to_the_decompressed_body(monkeypatch):
+    http = client(monkeypatch, None)
+    monkeypatch.setattr(listener.value_setter, 'bulkMaxBytes', 1000)
+    body = gzip.compress(json.dumps({'path': 'bomb.json', 'data': 'x' * 5000}).encode())
+    assert len(body) < 1000
+    response = http.post('/api/bulk', data=body, content_type='application/x-ndjson', headers={'Content-Encoding': 'gzip'})
+    assert response.status_code == 413
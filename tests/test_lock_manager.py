@@ -0,0 +1,87 @@
+import os
+import time
+import threading
+import pytest
+import lock_manager
+
+
+@pytest.fixture
+def locks(tmp_path):
+    return lock_manager.LockManager(str(tmp_path / 'locks'))
+
+
+def _hold(locks, key, exclusive, events, name, delay=0.2):
+    with locks.lock(key, exclusive):
+        events.append(('start', name))
+        time.sleep(delay)
+        events.append(('end', name))
+
+
+def _run(*threads):
+    for thread in threads:
+        thread.start()
+        time.sleep(0.05)
+    for thread in threads:
+        thread.join(5)
+
+
+def test_writers_exclude_each_other_and_readers(locks):
+    events = []
+    _run(
+        threading.Thread(target=_hold, args=(locks, 'a.json', True, events, 'writer')),
+        threading.Thread(target=_hold, args=(locks, 'a.json', False, events, 'reader')),
+    )
+    assert events == [('start', 'writer'), ('end', 'writer'), ('start', 'reader'), ('end', 'reader')]
+    stats = locks.stats()
+    assert stats['shared']['contended'] == 1
+    assert stats['shared']['wait_max'] > 0
+
+
+def test_readers_share_the_lock(locks):
+    events = []
+    _run(
+        threading.Thread(target=_hold, args=(locks, 'a.json', False, events, 'first')),
+        threading.Thread(target=_hold, args=(locks, 'a.json', False, events, 'second')),
+    )
+    assert events[:2] == [('start', 'first'), ('start', 'second')]
+    assert locks.stats()['shared'] == {'acquired': 2, 'contended': 0, 'wait_total': 0.0, 'wait_max': 0.0}
+
+
+def test_different_documents_do_not_contend(locks):
+    events = []
+    _run(
+        threading.Thread(target=_hold, args=(locks, 'a.json', True, events, 'a')),
+        threading.Thread(target=_hold, args=(locks, 'b.json', True, events, 'b')),
+    )
+    assert events[:2] == [('start', 'a'), ('start', 'b')]
+
+
+def test_locks_are_reentrant_per_thread(locks):
+    with locks.exclusive('a.json'):
+        with locks.exclusive('a.json'):
+            with locks.shared('a.json'):
+                pass
+    with locks.shared('b.json'):
+        with pytest.raises(RuntimeError):
+            with locks.exclusive('b.json'):
+                pass
+    assert locks.stats()['exclusive']['acquired'] == 1
+
+
+@pytest.mark.skipif(lock_manager.fcntl is None or not hasattr(os, 'fork'), reason='needs fcntl and fork')
+def test_processes_exclude_each_other(locks, tmp_path):
+    marker = tmp_path / 'marker'
+    with locks.exclusive('a.json'):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                # A separate manager, as in an unrelated process; blocks until the parent releases
+                with lock_manager.LockManager(locks.lockDir).exclusive('a.json'):
+                    ok = marker.exists()
+            except BaseException:
+                ok = False
+            os._exit(0 if ok else 1)
+        time.sleep(0.2)
+        marker.write_text('released')
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
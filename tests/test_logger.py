@@ -0,0 +1,106 @@
+import io
+import os
+import sys
+import queue
+import logging
+import subprocess
+import pytest
+import logger
+
+
+def make_listener(maxsize=10, overflow='block', batchSize=256):
+    records = queue.Queue(maxsize=maxsize)
+    queueHandler = logger.BoundedQueueHandler(records, overflow)
+    stream = io.StringIO()
+    fileHandler = logging.StreamHandler(stream)
+    fileHandler.setFormatter(logger.BatchFormatter())
+    listener = logger.BatchingQueueListener(records, fileHandler, queueHandler=queueHandler, batchSize=batchSize)
+    log = logging.getLogger(f'test-logger-{id(listener)}')
+    log.propagate = False
+    log.setLevel(logging.DEBUG)
+    log.addHandler(queueHandler)
+    return log, listener, stream
+
+
+def test_listener_writes_batches_and_drains_on_stop():
+    log, listener, stream = make_listener(maxsize=5, batchSize=3)
+    listener.start()
+    for i in range(20):
+        log.info(f'line {i}')
+    listener.stop()
+    assert stream.getvalue().splitlines() == [f'line {i}' for i in range(20)]
+
+
+def test_count_dropped_reports_dropped_records():
+    log, listener, stream = make_listener(maxsize=5, overflow='count-dropped')
+    for i in range(8):
+        log.info(f'line {i}')
+    listener.start()
+    listener.stop()
+    lines = stream.getvalue().splitlines()
+    assert lines[:5] == [f'line {i}' for i in range(5)]
+    assert lines[5] == 'Logging queue full: dropped 3 records'
+
+
+def test_drop_debug_keeps_warnings():
+    log, listener, stream = make_listener(maxsize=2, overflow='drop-debug')
+    log.info('a')
+    log.info('b')
+    log.info('dropped')
+    listener.start()
+    log.warning('kept')
+    listener.stop()
+    lines = stream.getvalue().splitlines()
+    assert 'dropped' not in lines and 'kept' in lines
+
+
+def test_imports_without_fork_support(tmp_path):
+    # Windows has no os.register_at_fork; stdlib modules that use it are imported before it is removed
+    src = os.path.dirname(logger.__file__)
+    code = ("import os, random, concurrent_log_handler; del os.register_at_fork\n"
+            "import logger; logger.mainLog.info('hello'); logger.stop()")
+    result = subprocess.run([sys.executable, '-c', code], cwd=tmp_path, capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=src))
+    assert result.returncode == 0, result.stderr
+    assert 'hello' in (tmp_path / 'ArtificianWorld' / 'logging' / 'main.log').read_text()
+
+
+def test_main_log_is_timestamped_and_not_echoed_to_console(tmp_path):
+    src = os.path.dirname(logger.__file__)
+    code = ("import logger; logger.mainLog.info('queued'); logger.flush(); logger.stop()\n"
+            "logger.mainLog.info('direct')")
+    result = subprocess.run([sys.executable, '-c', code], cwd=tmp_path, capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=src))
+    assert result.returncode == 0, result.stderr
+    assert 'queued' not in result.stderr and 'direct' not in result.stderr
+    lines = (tmp_path / 'ArtificianWorld' / 'logging' / 'main.log').read_text().splitlines()
+    assert [line.split(' - ', 1)[1] for line in lines] == ['INFO - queued', 'INFO - direct']
+
+
+def test_import_leaves_the_root_logger_alone(tmp_path):
+    src = os.path.dirname(logger.__file__)
+    code = "import logging, logger; assert logging.getLogger().handlers == [], logging.getLogger().handlers"
+    result = subprocess.run([sys.executable, '-c', code], cwd=tmp_path, capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=src))
+    assert result.returncode == 0, result.stderr
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_forked_child_starts_its_pipeline_on_first_record(tmp_path):
+    src = os.path.dirname(logger.__file__)
+    code = ("import os, threading, logger\n"
+            "logger.mainLog.info('parent'); logger.flush()\n"
+            "pid = os.fork()\n"
+            "if pid == 0:\n"
+            "    writers = lambda: [t for t in threading.enumerate() if t.name == 'log-writer']\n"
+            "    idle = not writers()\n"
+            "    logger.mainLog.info('child'); logger.stop()\n"
+            "    os._exit(0 if idle else 1)\n"
+            "_, status = os.waitpid(pid, 0)\n"
+            "logger.mainLog.info('parent again'); logger.stop()\n"
+            "raise SystemExit(os.WEXITSTATUS(status))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=tmp_path, capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=src))
+    assert result.returncode == 0, result.stderr
+    lines = (tmp_path / 'ArtificianWorld' / 'logging' / 'main.log').read_text().splitlines()
+    assert sorted(line.split(' - ', 2)[2] for line in lines) == ['child', 'parent', 'parent again']
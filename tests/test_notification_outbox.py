@@ -0,0 +1,112 @@
+import time
+import threading
+import pytest
+import notification_outbox
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingSink:
+    def __init__(self, fail=False):
+        self.messages = []
+        self.fail = fail
+        self.sent = threading.Event()
+
+    def send(self, message):
+        if self.fail:
+            raise ConnectionError('sink unavailable')
+        self.messages.append(message)
+        self.sent.set()
+
+
+@pytest.fixture
+def manual():
+    """An outbox that only delivers on flush(): its clock never reaches the batch delay."""
+    sink = RecordingSink()
+    outbox = notification_outbox.Outbox(sink, window=60, batchDelay=3600, minInterval=0, clock=Clock())
+    yield outbox, sink
+    outbox.stop()
+
+
+def test_repeats_are_counted_in_one_message(manual):
+    outbox, sink = manual
+    for _ in range(3):
+        outbox.send('disk full')
+    outbox.flush()
+    assert sink.messages == ['disk full (x3)']
+
+
+def test_messages_are_combined_into_a_digest(manual):
+    outbox, sink = manual
+    outbox.send('a')
+    outbox.send('b')
+    outbox.send('a')
+    outbox.flush()
+    assert sink.messages == ['3 alerts:\n- a (x2)\n- b']
+    assert outbox.stats()['sent'] == 1 and outbox.stats()['received'] == 3
+
+
+def test_repeats_within_the_window_are_dropped(manual):
+    outbox, sink = manual
+    outbox.send('a')
+    outbox.flush()
+    outbox.clock.now += 59
+    outbox.send('a')
+    outbox.flush()
+    outbox.clock.now += 1
+    outbox.send('a')
+    outbox.flush()
+    assert sink.messages == ['a', 'a']
+    assert outbox.stats()['deduplicated'] == 1
+
+
+def test_long_digests_are_truncated(manual):
+    outbox, sink = manual
+    for n in range(25):
+        outbox.send(f'alert {n}')
+    outbox.flush()
+    lines = sink.messages[0].split('\n')
+    assert lines[0] == '25 alerts:' and lines[-1] == '...and 5 more'
+    assert len(lines) == 22
+
+
+def test_sink_errors_are_counted_not_raised():
+    outbox = notification_outbox.Outbox(RecordingSink(fail=True), batchDelay=3600, clock=Clock())
+    outbox.send('a')
+    outbox.stop()
+    assert outbox.stats()['failed'] == 1 and outbox.stats()['pending'] == 0
+
+
+def test_background_thread_delivers_after_the_batch_delay():
+    sink = RecordingSink()
+    outbox = notification_outbox.Outbox(sink, window=60, batchDelay=0.1, minInterval=0)
+    start = time.monotonic()
+    outbox.send('a')
+    outbox.send('b')
+    assert sink.sent.wait(5)
+    assert time.monotonic() - start >= 0.1
+    outbox.stop()
+    assert sink.messages == ['2 alerts:\n- a\n- b']
+
+
+def test_sink_is_created_on_first_delivery(tmp_path):
+    created = []
+
+    def factory():
+        created.append(1)
+        return notification_outbox.createSink(f'file:{tmp_path / "alerts.log"}')
+
+    outbox = notification_outbox.Outbox(factory, batchDelay=3600, clock=Clock())
+    outbox.send('a')
+    assert not created
+    outbox.stop()
+    assert created == [1]
+    assert (tmp_path / 'alerts.log').read_text().endswith('] a\n')
+    with pytest.raises(ValueError):
+        notification_outbox.createSink('carrier-pigeon')
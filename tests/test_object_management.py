@@ -0,0 +1,247 @@
+import re
+import types
+import random
+import logging
+import traceback
+import pytest
+import logger
+import file_management
+import object_management as om
+
+
+# stringFormatter as it was before templates were compiled, kept verbatim as the reference
+def legacy_stringFormatter(string: str) -> str:
+    max_passes = 5  # limit to avoid infinite recursion loops
+    pass_num = 0
+
+    if not isinstance(string, str):
+        mainLog.debug("stringFormatter received non-str input; converting to str")
+        string = str(string)
+
+    func_pattern = re.compile(r'\{([^{}]+)\}')
+    lookup_pattern = re.compile(r'\[([^\[\]]+)\]')
+
+    def _format_value(val):
+        """Normalize various types to a safe string representation."""
+        if val is None:
+            return ''
+        if isinstance(val, bool):
+            return str(val).lower()
+        if isinstance(val, (int, float)):
+            return str(val)
+        if isinstance(val, list):
+            return ', '.join(str(x) for x in val)
+        if isinstance(val, dict):
+            return ', '.join(f"{k}: {v}" for k, v in val.items())
+        # other types -> string, sanitize whitespace/newlines/tabs
+        s = str(val)
+        return s.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
+
+    def _replace_function(match):
+        name = match.group(1).strip()
+        func_name = name.split('(')[0].strip()
+        func = globals().get(func_name)
+        if not callable(func):
+            mainLog.warning(f"stringFormatter: function '{func_name}' not found or not callable")
+            return match.group(0)  # leave the original placeholder intact
+        try:
+            result = func()
+            formatted = _format_value(result)
+            mainLog.debug(f"stringFormatter: replaced function {{{name}}} -> '{formatted}'")
+            return formatted
+        except Exception as e:
+            mainLog.error(f"stringFormatter: error calling function '{func_name}': {e}")
+            mainLog.error(traceback.format_exc())
+            return match.group(0)  # safe fallback
+
+    def _resolve_dict_lookup(dict_name: str, keys):
+        """Load a JSON file and traverse nested keys."""
+        try:
+            jsonData = file_management.getJsonDict(f"{dict_name}.json")
+        except Exception as e:
+            mainLog.error(f"stringFormatter: error loading JSON '{dict_name}.json': {e}")
+            return None
+        data = jsonData
+        for k in keys:
+            if isinstance(data, dict):
+                data = data.get(k, None)
+            else:
+                return None
+        return data
+
+    def _resolve_global_lookup(parts):
+        """Resolve nested lookups in globals (dict keys or attributes)."""
+        obj = globals().get(parts[0])
+        if obj is None:
+            return None
+        for p in parts[1:]:
+            if isinstance(obj, dict):
+                obj = obj.get(p, None)
+            else:
+                # try attribute access
+                obj = getattr(obj, p, None)
+            if obj is None:
+                return None
+        return obj
+
+    def _replace_lookup(match):
+        content = match.group(1).strip()
+        try:
+            if content.startswith('DICT.'):
+                # DICT.filename.key1.key2...
+                rest = content[len('DICT.'):].strip()
+                parts = rest.split('.')
+                dict_name = parts[0]
+                keys = parts[1:] if len(parts) > 1 else []
+                val = _resolve_dict_lookup(dict_name, keys)
+            else:
+                parts = content.split('.')
+                val = _resolve_global_lookup(parts)
+            formatted = _format_value(val)
+            mainLog.debug(f"stringFormatter: replaced lookup [{content}] -> '{formatted}'")
+            return formatted
+        except Exception as e:
+            mainLog.error(f"stringFormatter: error resolving lookup '[{content}]': {e}")
+            mainLog.error(traceback.format_exc())
+            return match.group(0)  # safe fallback
+
+    # Iteratively replace until stable or max_passes reached
+    previous = None
+    while pass_num < max_passes and string != previous:
+        previous = string
+        # Replace function placeholders
+        try:
+            string = func_pattern.sub(_replace_function, string)
+        except Exception as e:
+            mainLog.error(f"stringFormatter: error during function replacements: {e}")
+            mainLog.error(traceback.format_exc())
+            break
+        # Replace lookup placeholders
+        try:
+            string = lookup_pattern.sub(_replace_lookup, string)
+        except Exception as e:
+            mainLog.error(f"stringFormatter: error during lookup replacements: {e}")
+            mainLog.error(traceback.format_exc())
+            break
+        pass_num += 1
+
+    if pass_num == max_passes:
+        mainLog.warning("stringFormatter: maximum passes reached; result may still contain unresolved placeholders")
+
+    return string
+
+
+def _returning(value):
+    def func():
+        if value == 'RAISE':
+            raise ValueError('placeholder failed')
+        return value
+    return func
+
+FUNCTIONS = {'f1': _returning('one'), 'f2': _returning('[DICT.d.k]'), 'f3': _returning('{f1}'),
+             'f4': _returning('RAISE'), 'f5': _returning('a['), 'f6': _returning(']z'), 'f7': _returning('{'),
+             'f8': _returning('}'), 'f9': _returning(None), 'f10': _returning('{f10}')}
+
+
+@pytest.fixture
+def legacy(monkeypatch):
+    # The names the original module had, plus the placeholder functions in both modules
+    namespace = {'traceback': traceback, 're': re, 'logger': logger, 'file_management': file_management,
+                 'mainLog': om.mainLog}
+    for name in ('make_list_comma_separated', 'list2csv', 'makeTextJson', 'getValuesFromJson',
+                 'stringFormatter', 'executeFunctionInString'):
+        namespace[name] = getattr(om, name)
+    namespace.update(FUNCTIONS)
+    monkeypatch.setattr(om, '_TEMPLATE_NAMES', om._TEMPLATE_NAMES | set(FUNCTIONS))
+    for name, func in FUNCTIONS.items():
+        monkeypatch.setattr(om, name, func, raising=False)
+    file_management.updateJsonFile({'k': 'v', 'n': {'a': '[DICT.d.k]'}, 'b': '{f1}', 'l': [1, 2]}, 'd.json')
+    level = om.mainLog.level
+    om.mainLog.setLevel(logging.CRITICAL)
+    yield types.FunctionType(legacy_stringFormatter.__code__, namespace)
+    om.mainLog.setLevel(level)
+
+
+def test_compiled_templates_match_legacy_formatter(legacy):
+    fixed = ['[os.sep]', '[value_setter.mainDir]', '[json]', '{thaw}', '{KeyPathExtractor}', '[function_registry.registry]',
+             '[mainLog.name]', '[re.I]', '{list2csv}', '[DICT.d.n.a] and [DICT.d.l]', 'plain text', '']
+    tokens = ['{', '}', '[', ']', 'f1', 'f2', 'f3', 'f4', 'f5', 'f6', 'f7', 'f8', 'f9', 'f10', 'DICT.d.k', 'DICT.d.n.a',
+              'DICT.d.b', 'DICT.d', 'mainLog.name', 'os.sep', 'x', ' ', '(', '.', 'DICT.', 'zz']
+    rng = random.Random(7)
+    generated = [''.join(rng.choice(tokens) for _ in range(rng.randint(0, 12))) for _ in range(3000)]
+    for template in fixed + generated:
+        assert om.compile_template(template).render() == legacy(template), template
+        assert om.stringFormatter(template) == legacy(template), template
+
+
+def test_modules_imported_since_are_not_resolvable(legacy):
+    assert om.stringFormatter('[os.sep][value_setter.mainDir]') == ''
+    assert om.stringFormatter('{ThreadPoolExecutor}') == '{ThreadPoolExecutor}'
+    assert om.stringFormatter('[mainLog.name]') == om.mainLog.name
+
+
+@pytest.fixture
+def document():
+    file_management.updateJsonFile({'a': {'b': 1}, 'status': 'ok', 'items': [1, 2]}, 'doc.json')
+    return 'doc.json'
+
+
+def test_values_from_json_keys_and_paths(document):
+    values = om.getValuesFromJson(['status', ['a', 'b'], ['a', 'missing'], 'missing', ['status', 'x']], document)
+    assert values == ('ok', 1, None, None, None)
+    # Each call gets its own copy of the values
+    items, = om.getValuesFromJson(['items'], document)
+    items.append(3)
+    assert om.getValuesFromJson(['items'], document) == ([1, 2],)
+
+
+def test_tuple_key_is_a_single_literal_key(document):
+    assert om.getValuesFromJson([('a', 'b'), ['a', 'b']], document) == (None, 1)
+
+
+def test_unhashable_keys_are_looked_up_uncached(document):
+    assert om.getValuesFromJson([['status', ['x']], 'status'], document) == (None, 'ok')
+    with pytest.raises(TypeError):
+        om.getValuesFromJson([['a', ['b']]], document)
+
+
+def test_key_path_extractor_shares_prefixes():
+    extractor = om.KeyPathExtractor(['status', ['user', 'name'], ['user', 'email']])
+    assert extractor.extract({'status': 'ok', 'user': {'name': 'Ann'}}) == ('ok', 'Ann', None)
+    assert extractor.extract_many([{'user': 'flat'}, {'status': 1}], workers=2) == [(None, None, None), (1, None, None)]
+
+
+def test_streamed_and_parsed_reads_agree_on_duplicate_keys(document):
+    filename = file_management.storage.localPath('dup.json')
+    with open(filename, 'w') as f:
+        f.write('{"status": "old", "a": {"b": 1}, "status": "new", "a": {"c": 2}}')
+    keys = ['status', ['a', 'b'], ['a', 'c']]
+    assert om.getValuesFromJson(keys, 'dup.json', stream=True) == ('new', None, 2)
+    assert om.getValuesFromJson(keys, 'dup.json', stream=False) == ('new', None, 2)
+
+
+def test_makeTextJson_spans_the_outermost_braces():
+    assert om.makeTextJson('Sure: {"a": {"b": 1}} and {"c": 2}. Done') == '{"a": {"b": 1}} and {"c": 2}'
+    assert om.makeTextJson('no object here') == ''
+    assert om.makeTextJson('} backwards {') == ''
+
+
+def test_extractor_returns_objects_split_across_chunks():
+    text = 'Here: {"a": "x}{\\"", "n": {"m": [1]}} then {"b": 2} and {"c": '
+    for size in (1, 3, len(text)):
+        extractor = om.JsonObjectExtractor()
+        found = []
+        for i in range(0, len(text), size):
+            found.extend(extractor.feed(text[i:i + size]))
+        assert found == ['{"a": "x}{\\"", "n": {"m": [1]}}', '{"b": 2}']
+        assert extractor.pending
+        assert extractor.feed('3}') == ['{"c": 3}']
+        assert not extractor.pending
+
+
+def test_extractor_parses_and_drops_invalid_objects():
+    extractor = om.JsonObjectExtractor(parse=True)
+    assert extractor.feed('{"a": 1} {not json} {"b": [2]}') == [{'a': 1}, {'b': [2]}]
+    extractor.feed('{"partial": ')
+    extractor.reset()
+    assert extractor.feed('"x"} {"c": 3}') == [{'c': 3}]
@@ -0,0 +1,8 @@
+import artificial_world
+import audio
+
+
+def test_submodules_are_imported_on_access():
+    assert {'listener', 'audio', 'logger'} <= set(artificial_world.__all__)
+    assert artificial_world.audio is audio
+    assert 'audio' in dir(artificial_world)
@@ -0,0 +1,87 @@
+import pickle
+import pytest
+import schedule_management as sm
+from schedule_management import MinuteOfDay, MinuteOfDayArray
+
+
+def legacy_shift(curtime, mins):
+    hour, minute = map(int, curtime.split(':'))
+    total_mins = (hour * 60 + minute + mins) % (24 * 60)
+    return f"{total_mins // 60}:{str(total_mins % 60).zfill(2)}"
+
+
+def legacy_ampm(militaryTime):
+    hour = int(militaryTime.split(':')[0])
+    minute = int(militaryTime.split(':')[1])
+    ampm = 'am'
+    if hour >= 12:
+        if hour == 24:
+            ampm = 'am'
+        else:
+            ampm = 'pm'
+    if hour > 12:
+        hour -= 12
+    return str(hour) + ':' + str(minute).zfill(2) + ampm
+
+
+TIMES = ['0:00', '00:00', '9:05', '09:05', '12:00', '12:30', '13:01', '23:59', '24:00', '7:75', '025:10']
+
+
+@pytest.mark.parametrize('time', TIMES)
+def test_string_helpers_match_the_original_formulas(time):
+    for mins in (0, 1, 59, 61, 1439, 1440, 3000, -5):
+        assert sm.laterTime(time, mins) == legacy_shift(time, mins)
+        assert sm.earlierTime(time, mins) == legacy_shift(time, -mins)
+    assert sm.ampmTime(time) == legacy_ampm(time)
+
+
+def test_ampm_keeps_formatting_times_with_seconds():
+    assert sm.ampmTime('14:30:15') == legacy_ampm('14:30:15') == '2:30pm'
+
+
+def test_every_minute_formats_like_the_original_helpers():
+    for m in range(sm.MINUTES_PER_DAY):
+        text = f'{m // 60}:{m % 60:02d}'
+        t = MinuteOfDay.parse(text)
+        assert t.format() == legacy_shift(text, 0)
+        assert t.ampm() == legacy_ampm(text)
+        assert MinuteOfDay.parse(f'{m // 60:02d}:{m % 60:02d}') is t
+
+
+def test_arithmetic_wraps_around_midnight():
+    t = MinuteOfDay.parse('23:50')
+    assert t + 20 == MinuteOfDay.of(0, 10)
+    assert 20 + t == t.shift(20)
+    assert t - 1440 is t
+    assert MinuteOfDay.of(0, 10) - t == 20
+    assert t - MinuteOfDay.of(0, 10) == 1420
+    assert (t.hour, t.minute, int(t)) == (23, 50, 1430)
+    assert repr(t) == "MinuteOfDay('23:50')"
+
+
+def test_values_are_immutable_interned_and_ordered():
+    t = MinuteOfDay(75)
+    assert t is MinuteOfDay.parse('1:15') is MinuteOfDay.parse(t)
+    assert pickle.loads(pickle.dumps(t)) is t
+    with pytest.raises(AttributeError):
+        t.value = 3
+    assert MinuteOfDay.of(9) < MinuteOfDay.of(10) <= MinuteOfDay.of(10)
+    assert len({MinuteOfDay.of(9), MinuteOfDay.parse('09:00')}) == 1
+
+
+def test_passed_compares_against_the_given_time():
+    now = MinuteOfDay.parse('12:00')
+    assert MinuteOfDay.parse('11:59').passed(now)
+    assert MinuteOfDay.parse('12:00').passed(now)
+    assert not MinuteOfDay.parse('12:01').passed(now)
+
+
+def test_array_bulk_operations():
+    times = MinuteOfDayArray(['23:30', '0:15', 600, MinuteOfDay.of(12)])
+    assert times.format() == ['23:30', '0:15', '10:00', '12:00']
+    assert times.shift(45).format() == ['0:15', '1:00', '10:45', '12:45']
+    assert times.shift(-30).format() == ['23:00', '23:45', '9:30', '11:30']
+    assert times.ampm() == ['11:30pm', '0:15am', '10:00am', '12:00pm']
+    assert times.passed(MinuteOfDay.of(11)) == [False, True, True, False]
+    assert times[1:3].format() == ['0:15', '10:00']
+    assert list(times)[0] is MinuteOfDay.of(23, 30)
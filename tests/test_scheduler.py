@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+from concurrent.futures import wait
+import pytest
+import scheduler as scheduler_module
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, **kwargs):
+        self.now += timedelta(**kwargs)
+
+
+@pytest.fixture
+def clock():
+    # A Monday
+    return FakeClock(datetime(2024, 1, 1, 8, 0))
+
+
+@pytest.fixture
+def sched(clock):
+    s = scheduler_module.Scheduler(clock=clock, workers=2)
+    yield s
+    s.stop()
+
+
+def run(sched):
+    futures = sched.run_pending()
+    wait(futures)
+    return len(futures)
+
+
+def test_once_runs_at_its_time_and_only_once(sched, clock):
+    calls = []
+    sched.once('08:30', calls.append, 'x')
+    assert run(sched) == 0
+    clock.advance(minutes=30)
+    assert run(sched) == 1
+    clock.advance(days=1)
+    assert run(sched) == 0
+    assert calls == ['x']
+    assert sched.jobs() == []
+
+
+def test_daily_moves_to_next_day(sched, clock):
+    calls = []
+    job = sched.daily('09:00', calls.append, 1)
+    assert job.next_run == datetime(2024, 1, 1, 9, 0)
+    clock.advance(hours=1)
+    run(sched)
+    assert job.next_run == datetime(2024, 1, 2, 9, 0)
+    assert calls == [1]
+
+
+def test_offset_wraps_around_midnight(sched):
+    job = sched.once('00:10', lambda: None, offset=-20)
+    assert job.next_run == datetime(2024, 1, 1, 23, 50)
+
+
+def test_on_days_skips_other_days(sched, clock):
+    job = sched.on_days(['Saturday'], '10:00', lambda: None)
+    assert job.next_run == datetime(2024, 1, 6, 10, 0)
+    job = sched.on_days(scheduler_module.WEEKDAYS, '07:00', lambda: None)
+    assert job.next_run == datetime(2024, 1, 2, 7, 0)
+
+
+def test_missed_deadlines_fire_once(sched, clock):
+    calls = []
+    sched.daily('09:00', calls.append, 1)
+    clock.advance(days=3)
+    assert run(sched) == 1
+    assert calls == [1]
+
+
+def test_cancel_and_next_deadline(sched, clock):
+    first = sched.once('09:00', lambda: None)
+    sched.once('10:00', lambda: None)
+    assert sched.next_deadline() == datetime(2024, 1, 1, 9, 0)
+    sched.cancel(first)
+    assert sched.next_deadline() == datetime(2024, 1, 1, 10, 0)
+    clock.advance(hours=1, minutes=30)
+    assert run(sched) == 0
+
+
+def test_failing_callback_does_not_stop_others(sched, clock):
+    calls = []
+
+    def fail():
+        raise RuntimeError('boom')
+    sched.once('08:05', fail)
+    sched.once('08:05', calls.append, 'ok')
+    clock.advance(minutes=5)
+    assert run(sched) == 2
+    assert calls == ['ok']
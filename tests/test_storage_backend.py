@@ -0,0 +1,58 @@
+import os
+import pytest
+import storage_backend
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return storage_backend.SQLiteBackend(str(tmp_path / 'documents.sqlite3'))
+
+
+def test_failed_nested_write_is_undone_inside_a_batch(backend):
+    with backend.batch():
+        backend.write('a.json', b'1')
+        with pytest.raises(ValueError):
+            with backend.lock('b.json'):
+                backend.write('b.json', b'2')
+                backend.append('a.json', b'half-applied')
+                raise ValueError('update failed')
+        backend.write('c.json', b'3')
+    assert backend.read('a.json') == b'1'
+    assert backend.read('c.json') == b'3'
+    with pytest.raises(FileNotFoundError):
+        backend.read('b.json')
+
+
+def test_failed_batch_is_rolled_back(backend):
+    with pytest.raises(ValueError):
+        with backend.batch():
+            backend.write('a.json', b'1')
+            raise ValueError('batch failed')
+    with pytest.raises(FileNotFoundError):
+        backend.read('a.json')
+
+
+def test_connections_are_opened_on_first_use(tmp_path):
+    dbPath = tmp_path / 'lazy.sqlite3'
+    backend = storage_backend.SQLiteBackend(str(dbPath))
+    assert not dbPath.exists()
+    backend.write('a.json', b'1')
+    assert backend.read('a.json') == b'1'
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_forked_child_opens_its_own_connection(backend):
+    backend.write('parent.json', b'1')
+    parentConnection = backend._connection()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            ok = backend._connection() is not parentConnection and backend.read('parent.json') == b'1'
+            backend.write('child.json', b'2')
+        except BaseException:
+            ok = False
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    assert backend._connection() is parentConnection
+    assert backend.read('child.json') == b'2'
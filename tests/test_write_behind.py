@@ -0,0 +1,75 @@
+import time
+import contextlib
+import threading
+import write_behind
+
+
+def test_documents_stay_visible_while_being_written():
+    stored = {}
+    started = threading.Event()
+
+    def slow_writer(data, filepath):
+        started.set()
+        time.sleep(0.3)
+        stored[filepath] = data
+        return True
+
+    buffer = write_behind.WriteBehindBuffer(slow_writer)
+    buffer.stage('a.json', 'a.json', {'v': 1})
+    flusher = threading.Thread(target=buffer.flush)
+    flusher.start()
+    started.wait(5)
+    assert buffer.pending('a.json') == ('a.json', {'v': 1})
+    flusher.join()
+    assert buffer.pending('a.json') is None
+    assert stored == {'a.json': {'v': 1}}
+
+
+def test_newer_version_staged_during_flush_wins():
+    started = threading.Event()
+
+    def slow_writer(data, filepath):
+        started.set()
+        time.sleep(0.2)
+        return True
+
+    buffer = write_behind.WriteBehindBuffer(slow_writer)
+    buffer.stage('a.json', 'a.json', {'v': 1})
+    flusher = threading.Thread(target=buffer.flush)
+    flusher.start()
+    started.wait(5)
+    buffer.stage('a.json', 'a.json', {'v': 2})
+    assert buffer.pending('a.json') == ('a.json', {'v': 2})
+    flusher.join()
+    assert buffer.pending('a.json') == ('a.json', {'v': 2})
+
+
+def test_failed_write_is_retried():
+    results = [False, True]
+    buffer = write_behind.WriteBehindBuffer(lambda data, filepath: results.pop(0))
+    buffer.stage('a.json', 'a.json', {'v': 1})
+    assert buffer.flush() is False
+    assert buffer.pending('a.json') == ('a.json', {'v': 1})
+    assert buffer.flush() is True
+    assert buffer.pending('a.json') is None
+
+
+def test_idle_flushes_open_no_batch():
+    batches = []
+
+    @contextlib.contextmanager
+    def batch():
+        batches.append(1)
+        yield
+
+    buffer = write_behind.WriteBehindBuffer(lambda data, filepath: True, interval=0.01, batch=batch)
+    buffer.start()
+    try:
+        time.sleep(0.1)
+        assert batches == [] and buffer.flush() is True
+        buffer.stage('a.json', 'a.json', {'v': 1})
+        assert buffer.flush() is True
+        assert batches == [1]
+    finally:
+        buffer.stop()
+    assert batches == [1] and buffer.stats()['flushes'] == 1
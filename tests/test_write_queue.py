@@ -0,0 +1,83 @@
+import time
+import threading
+import pytest
+import write_queue
+
+
+def recording_writer(events, delay=0.05):
+    def write(name):
+        events.append(('start', name))
+        time.sleep(delay)
+        events.append(('end', name))
+        return True
+    return write
+
+
+def test_same_path_writes_run_in_order_one_at_a_time():
+    events = []
+    queue = write_queue.WriteQueue(recording_writer(events), workers=4)
+    for n in range(4):
+        queue.submit('a.json', n)
+    assert queue.join(5)
+    queue.stop()
+    assert events == [(edge, n) for n in range(4) for edge in ('start', 'end')]
+
+
+def test_different_paths_are_written_in_parallel():
+    events = []
+    queue = write_queue.WriteQueue(recording_writer(events, delay=0.2), workers=2)
+    queue.submit('a.json', 'a')
+    queue.submit('b.json', 'b')
+    assert queue.join(5)
+    queue.stop()
+    assert [edge for edge, _ in events[:2]] == ['start', 'start']
+
+
+def test_statuses_follow_each_write():
+    release = threading.Event()
+
+    def writer(result):
+        release.wait(5)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    queue = write_queue.WriteQueue(writer, workers=1)
+    ok = queue.submit('a.json', True)
+    refused = queue.submit('a.json', False)
+    raised = queue.submit('b.json', ValueError('disk full'))
+    assert queue.status(raised)['state'] == 'queued'
+    release.set()
+    assert queue.join(5)
+    queue.stop()
+    assert queue.status(ok)['state'] == 'done'
+    assert queue.status(refused)['state'] == 'failed' and queue.status(refused)['error'] == 'write failed'
+    assert queue.status(raised)['error'] == 'disk full'
+    assert queue.status('unknown') is None
+    stats = queue.stats()
+    assert (stats['completed'], stats['failed'], stats['depth'], stats['running']) == (1, 2, 0, 0)
+
+
+def test_full_queue_refuses_writes():
+    release = threading.Event()
+    queue = write_queue.WriteQueue(lambda: release.wait(5), workers=1, maxSize=2)
+    queue.submit('a.json')
+    deadline = time.monotonic() + 5
+    while queue.depth() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    queue.submit('a.json')
+    queue.submit('b.json')
+    with pytest.raises(write_queue.QueueFull):
+        queue.submit('c.json')
+    release.set()
+    queue.stop()
+    with pytest.raises(RuntimeError):
+        queue.submit('a.json')
+
+
+def test_old_finished_statuses_age_out():
+    queue = write_queue.WriteQueue(lambda: True, workers=1, retain=2)
+    ids = [queue.submit('a.json') for _ in range(4)]
+    assert queue.join(5)
+    queue.stop()
+    assert [queue.status(requestId) is not None for requestId in ids] == [False, False, True, True]